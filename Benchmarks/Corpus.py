@@ -0,0 +1,325 @@
+import argparse
+import os
+import sys
+import zlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common.ProjectIO import ProjectStreamWriter
+
+""" Génération de corpus synthétiques pour les bancs d'essai.
+
+    Chaque enregistrement est une fonction déterministe de son indice : le serveur de bancs d'essai
+    (FixtureServer) peut ainsi servir n'importe quelle page sans garder le corpus en mémoire,
+    et deux exécutions sur le même corpus sont comparables.
+    Formats générés :
+    - hal_doc : document brut de l'API de recherche HAL ;
+    - github_repo / github_user : réponses brutes de l'API GitHub ;
+    - gitlab_project : projet brut de l'API GitLab ;
+    - sh_visit / sh_snapshot / sh_revision : réponses brutes de l'API Software Heritage ;
+    - project / github_project : projets au format commun (sorties des collecteurs), pour la fusion et la base.
+
+    Utilisation :
+        python Benchmarks/Corpus.py --sizes 10000 100000 1000000 --output-dir Benchmarks/corpora """
+
+LANGUAGES = ['Python', 'C++', 'Java', 'R', 'Julia', 'Fortran', 'C', 'JavaScript', 'MATLAB', 'Rust']
+DOMAINS = [
+    'info_FacetSep_Informatique [cs]',
+    'phys_FacetSep_Physique [physics]',
+    'math_FacetSep_Mathématiques [math]',
+    'sdv_FacetSep_Sciences du Vivant [q-bio]',
+    'sde_FacetSep_Sciences de l\'environnement',
+]
+KEYWORDS = ['simulation', 'machine learning', 'bioinformatics', 'hpc', 'visualisation', 'statistics', 'optimisation', 'imaging']
+INSTITUTIONS = ['CNRS', 'Inria', 'Université Paris-Saclay', 'Sorbonne Université', 'INRAE', 'CEA']
+NUMBER_OF_LABS = 300
+
+def owner_name(i):
+    # Environ trois dépôts par propriétaire
+    return f"owner{i // 3}"
+
+def repo_name(i):
+    return f"project-{i}"
+
+def repo_url(i):
+    return f"https://github.com/{owner_name(i)}/{repo_name(i)}"
+
+def lab_name(i):
+    return f"LAB{i % NUMBER_OF_LABS:03d}"
+
+def date(i, year=2015):
+    return f"{year + i % 9}-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00Z"
+
+def swh_hash(i, salt):
+    # Empreinte de 40 caractères hexadécimaux dont on peut retrouver l'indice (voir swh_index)
+    return f"{salt:08x}{i:032x}"
+
+def swh_index(swh_hash_hex):
+    return int(swh_hash_hex[8:], 16)
+
+def hal_doc(i):
+    """
+    Document brut de l'API de recherche HAL.
+
+    Args:
+        i (int): Indice du document.
+
+    Returns:
+        dict: Document.
+    """
+    authors = [f"Auteur {(i + k) % 5000}" for k in range(1 + i % 4)]
+    doc = {
+        "title_s": [f"Logiciel {i}"],
+        "authFullName_s": authors,
+        "authIdHal_s": [f"auteur-{(i + k) % 5000}" for k in range(len(authors))],
+        "authIdHal_i": [(i + k) % 5000 for k in range(len(authors))],
+        "producedDate_s": date(i)[:10],
+        "submittedDate_s": date(i, 2018)[:10],
+        "docType_s": "SOFTWARE",
+        "labStructName_s": [lab_name(i)],
+        "fr_domainAllCodeLabel_fs": [DOMAINS[i % len(DOMAINS)]],
+        "abstract_s": [f"Résumé du logiciel {i}."],
+        "keyword_s": [KEYWORDS[i % len(KEYWORDS)], KEYWORDS[(i // 3) % len(KEYWORDS)]],
+        "halId_s": f"hal-{i:08d}",
+        "structName_s": [lab_name(i), "CNRS"],
+        "language_s": ["en"],
+        "softProgrammingLanguage_s": [LANGUAGES[i % len(LANGUAGES)]],
+        "rgrpInstStructName_s": [INSTITUTIONS[i % len(INSTITUTIONS)]],
+    }
+    # Un tiers avec SWHID, un tiers avec dépôt seul, un tiers sans dépôt
+    if i % 3 == 0:
+        # Ancré sur une révision ou, une fois sur deux, sur une version publiée
+        anchor = f"swh:1:rev:{swh_hash(i, 3)}" if i % 2 == 0 else f"swh:1:rel:{swh_hash(i, 4)}"
+        doc["swhidId_s"] = [f"swh:1:dir:{swh_hash(i, 1)};origin={repo_url(i)};visit=swh:1:snp:{swh_hash(i, 2)};anchor={anchor};path=/"]
+    if i % 3 != 2:
+        doc["softCodeRepository_s"] = [repo_url(i)]
+    return doc
+
+def github_repo(i):
+    """
+    Réponse brute de l'API GitHub pour un dépôt.
+
+    Args:
+        i (int): Indice du dépôt.
+
+    Returns:
+        dict: Dépôt.
+    """
+    owner, name = owner_name(i), repo_name(i)
+    api = f"https://api.github.com/repos/{owner}/{name}"
+    return {
+        "id": 100000 + i,
+        "name": name,
+        "full_name": f"{owner}/{name}",
+        "owner": {"login": owner, "id": 5000 + i // 3},
+        "organization": {"login": lab_name(i)},
+        "description": f"Dépôt du logiciel {i}",
+        "html_url": repo_url(i),
+        "stargazers_count": i % 500,
+        "forks_count": i % 50,
+        "subscribers_count": i % 20,
+        "open_issues_count": i % 30,
+        "contributors_url": f"{api}/contributors",
+        "pulls_url": f"{api}/pulls{{/number}}",
+        "commits_url": f"{api}/commits{{/sha}}",
+        "releases_url": f"{api}/releases{{/id}}",
+        "language": LANGUAGES[i % len(LANGUAGES)],
+        "topics": [KEYWORDS[i % len(KEYWORDS)]],
+        "created_at": date(i),
+        "updated_at": date(i, 2020),
+        "pushed_at": date(i, 2021),
+        "homepage": "",
+    }
+
+def github_user(login):
+    """
+    Réponse brute de l'API GitHub pour un utilisateur.
+
+    Args:
+        login (str): Identifiant de l'utilisateur.
+
+    Returns:
+        dict: Utilisateur.
+    """
+    return {"login": login, "id": zlib.crc32(login.encode()), "email": f"{login}@example.org" if len(login) % 2 else None}
+
+def github_contributors(i):
+    """
+    Réponse brute de l'API GitHub pour les contributeurs d'un dépôt.
+
+    Args:
+        i (int): Indice du dépôt.
+
+    Returns:
+        list: Contributeurs.
+    """
+    logins = [f"dev{(i + k) % 2000}" for k in range(1 + i % 3)]
+    return [{"login": login, "id": 9000 + (i + k) % 2000, "url": f"https://api.github.com/users/{login}"} for k, login in enumerate(logins)]
+
+def gitlab_project(i):
+    """
+    Projet brut de l'API GitLab.
+
+    Args:
+        i (int): Indice du projet.
+
+    Returns:
+        dict: Projet.
+    """
+    return {
+        "id": i + 1,
+        "name": f"gitlab-project-{i}",
+        "namespace": {"id": 700 + i % 200, "name": f"groupe-{i % 200}", "kind": "group" if i % 4 else "user"},
+        "created_at": date(i),
+        "last_activity_at": date(i, 2022),
+        "topics": [KEYWORDS[i % len(KEYWORDS)]],
+        "description": f"Projet GitLab {i}",
+        "tag_list": [KEYWORDS[(i // 2) % len(KEYWORDS)]],
+        "web_url": f"https://gitlab.example.org/groupe-{i % 200}/gitlab-project-{i}",
+        "readme_url": f"https://gitlab.example.org/groupe-{i % 200}/gitlab-project-{i}/-/blob/main/README.md",
+        "star_count": i % 40,
+        "forks_count": i % 7,
+    }
+
+def sh_visit(i):
+    return {"origin": repo_url(i), "date": date(i, 2023), "status": "full", "snapshot": swh_hash(i, 2)}
+
+def sh_snapshot(i):
+    return {"id": swh_hash(i, 2), "branches": {
+        "HEAD": {"target": "refs/heads/main", "target_type": "alias"},
+        "refs/heads/main": {"target": swh_hash(i, 3), "target_type": "revision"},
+    }}
+
+def sh_revision(i):
+    return {"id": swh_hash(i, 3), "author": {"name": f"Auteur {i % 5000}", "email": f"auteur{i % 5000}@example.org"},
+            "message": f"Commit du logiciel {i}", "date": date(i, 2021), "committer_date": date(i, 2022)}
+
+def sh_release(i):
+    return {"id": swh_hash(i, 4), "name": f"v{1 + i % 9}.0", "target": swh_hash(i, 3), "target_type": "revision",
+            "author": {"name": f"Auteur {i % 5000}", "email": f"auteur{i % 5000}@example.org"},
+            "message": f"Version du logiciel {i}", "date": date(i, 2022)}
+
+def project(i, source='HAL'):
+    """
+    Projet au format commun, tel qu'écrit par les collecteurs.
+
+    Args:
+        i (int): Indice du projet.
+        source (str): Source du projet.
+
+    Returns:
+        dict: Projet.
+    """
+    return {
+        "project_number": i + 1,
+        "title": f"Logiciel {i}",
+        "authors": [{"name": f"Auteur {(i + k) % 5000}", "authIdHal_s": f"auteur-{(i + k) % 5000}", "authIdHal_i": (i + k) % 5000} for k in range(1 + i % 4)],
+        "submitted_date": date(i)[:10],
+        "updated_date": date(i, 2018)[:10],
+        "laboratory": lab_name(i),
+        "domain": DOMAINS[i % len(DOMAINS)].split('_FacetSep_')[-1],
+        "abstract": f"Résumé du logiciel {i}.",
+        "keywords": f"{KEYWORDS[i % len(KEYWORDS)]}, {KEYWORDS[(i // 3) % len(KEYWORDS)]}",
+        "hal_id": f"hal-{i:08d}" if source == 'HAL' else "",
+        "structures": f"{lab_name(i)}, CNRS",
+        "softCodeRepository": repo_url(i),
+        "forge": "github.com",
+        "softProgrammingLanguage": [LANGUAGES[i % len(LANGUAGES)]],
+        "source": source,
+        "institution": INSTITUTIONS[i % len(INSTITUTIONS)],
+    }
+
+def github_project(i):
+    """
+    Projet au format de sortie de GitJSON (informations GitHub d'un dépôt).
+
+    Args:
+        i (int): Indice du projet.
+
+    Returns:
+        dict: Projet.
+    """
+    repo = github_repo(i)
+    return {
+        "project_number": i + 1,
+        "title": f"Logiciel {i}",
+        "repo_source": "softCodeRepository",
+        "repo_url": repo_url(i),
+        "repo_info": {
+            "name": repo["name"],
+            "full_name": repo["full_name"],
+            "description": repo["description"],
+            "stars": repo["stargazers_count"],
+            "forks": repo["forks_count"],
+            "owner": repo["owner"]["login"],
+            "subscribers": repo["subscribers_count"],
+            "open_issues": repo["open_issues_count"],
+            "contributors_url": repo["contributors_url"],
+            "pulls_url": repo["pulls_url"],
+            "commits_url": repo["commits_url"],
+            "releases_url": repo["releases_url"],
+            "language": repo["language"],
+            "created_at": repo["created_at"],
+            "updated_at": repo["updated_at"],
+            "pushed_at": repo["pushed_at"],
+            "homepage": repo["homepage"],
+            "repo_url": repo["html_url"],
+        },
+    }
+
+GENERATORS = {
+    'projects': project,
+    'github': github_project,
+    # Projets d'une seconde source, dont les deux tiers ont le même dépôt qu'un projet HAL (pour la fusion)
+    'github_owners': lambda i: project(3 * i // 2, source='Github_modality_1'),
+}
+
+def write_corpus(kind, size, file_path):
+    """
+    Écrit un corpus synthétique en flux (la taille n'est pas limitée par la mémoire).
+
+    Args:
+        kind (str): Type de corpus (clé de GENERATORS).
+        size (int): Nombre de projets.
+        file_path (str): Fichier de sortie (.json ou .jsonl.gz).
+
+    Returns:
+        str: Chemin du fichier écrit.
+    """
+    generator = GENERATORS[kind]
+    with ProjectStreamWriter(file_path) as writer:
+        for i in range(size):
+            writer.write(generator(i))
+    return file_path
+
+def corpus_file(output_dir, kind, size):
+    """
+    Retourne le chemin d'un corpus, en le générant s'il n'existe pas encore.
+
+    Args:
+        output_dir (str): Répertoire des corpus.
+        kind (str): Type de corpus.
+        size (int): Nombre de projets.
+
+    Returns:
+        str: Chemin du corpus.
+    """
+    file_path = os.path.join(output_dir, f"{kind}_{size}.jsonl.gz")
+    if not os.path.exists(file_path):
+        os.makedirs(output_dir, exist_ok=True)
+        write_corpus(kind, size, file_path)
+    return file_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère les corpus synthétiques des bancs d'essai.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--kinds', nargs='+', default=sorted(GENERATORS), choices=sorted(GENERATORS))
+    parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora'))
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for kind in args.kinds:
+            print(f"{corpus_file(args.output_dir, kind, size)} ({size} projets)")
+
+if __name__ == "__main__":
+    main()
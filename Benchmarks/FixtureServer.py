@@ -0,0 +1,420 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import Corpus
+
+""" Serveur local remplaçant les API HAL, Software Heritage, GitHub et GitLab pendant les bancs d'essai.
+
+    Les réponses viennent d'abord d'un fichier de réponses enregistrées (voir record_fixtures), puis,
+    à défaut, sont générées à partir du corpus synthétique (voir Corpus) de la taille demandée.
+    La latence de chaque réponse et une limite de taux par API et par jeton (requêtes par fenêtre) sont configurables :
+    au-delà de la limite, le serveur répond comme l'API réelle (403 et X-RateLimit-Reset pour GitHub, 429 sinon).
+
+    Les collecteurs sont redirigés vers le serveur par Common.Metrics (set_url_overrides, ou CARTO_URL_OVERRIDES).
+    Les instances GitLab n'ont pas d'URL fixe : celles à rediriger vers /gitlab sont passées avec --gitlab-url
+    (par défaut DEFAULT_GITLAB_URLS, l'instance du corpus synthétique).
+
+    Utilisation :
+        python Benchmarks/FixtureServer.py serve --port 8765 --size 10000 --latency 0.05
+        python Benchmarks/FixtureServer.py serve --gitlab-url https://gitlab.example.org --gitlab-url https://forge.example.org/gitlab
+        python Benchmarks/FixtureServer.py record urls.txt Benchmarks/fixtures.json --gitlab-url https://gitlab.example.org """
+
+# Préfixe des URL de chaque API, remplacé par http://hôte:port/<api>
+API_PREFIXES = {
+    'github': 'https://api.github.com',
+    'sh': 'https://archive.softwareheritage.org',
+    'hal': 'https://api.archives-ouvertes.fr',
+}
+# Instances GitLab redirigées vers /gitlab par défaut (celle des projets de Corpus.gitlab_project)
+DEFAULT_GITLAB_URLS = ['https://gitlab.example.org']
+# En-têtes conservés dans les réponses enregistrées (pagination GitHub et GitLab)
+RECORDED_HEADERS = ('Link', 'X-Total', 'X-Total-Pages', 'X-Next-Page', 'X-Page', 'X-Per-Page')
+
+INDEX = re.compile(r'project-(\d+)')
+
+def project_index(text):
+    match = INDEX.search(text)
+    return int(match.group(1)) if match else None
+
+def api_prefixes(gitlab_urls=None):
+    """
+    Args:
+        gitlab_urls (list): URL de base des instances GitLab (par défaut, DEFAULT_GITLAB_URLS).
+
+    Returns:
+        list: Couples (API, préfixe des URL), y compris une entrée 'gitlab' par instance.
+    """
+    return list(API_PREFIXES.items()) + [('gitlab', url.rstrip('/')) for url in (gitlab_urls or DEFAULT_GITLAB_URLS)]
+
+def paginate(items_for_range, total, page, per_page):
+    start = (page - 1) * per_page
+    return [items_for_range(i) for i in range(start, min(start + per_page, total))]
+
+class FixtureServer:
+    """
+    Serveur HTTP de bancs d'essai, exécuté dans un thread.
+    """
+
+    def __init__(self, corpus_size=1000, latency=0.0, rate_limit=None, rate_window=60.0, fixtures_file=None, host='127.0.0.1', port=0,
+                 gitlab_urls=None):
+        """
+        Args:
+            corpus_size (int): Nombre d'enregistrements du corpus synthétique servi par chaque API.
+            latency (float): Latence ajoutée à chaque réponse, en secondes.
+            rate_limit (int): Nombre de requêtes autorisées par API, par jeton et par fenêtre (None : pas de limite).
+            rate_window (float): Durée de la fenêtre de limite de taux, en secondes.
+            fixtures_file (str): Fichier JSON de réponses enregistrées (optionnel).
+            host (str): Adresse d'écoute.
+            port (int): Port d'écoute (0 : port libre choisi par le système).
+            gitlab_urls (list): URL de base des instances GitLab à rediriger (par défaut, DEFAULT_GITLAB_URLS).
+        """
+        self.corpus_size = corpus_size
+        self.gitlab_urls = list(gitlab_urls or DEFAULT_GITLAB_URLS)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.fixtures = {}
+        if fixtures_file:
+            with open(fixtures_file, 'r', encoding='utf-8') as f:
+                self.fixtures = json.load(f)
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.request_count = 0
+        self.routes = []
+        self.add_default_routes()
+
+        self.httpd = ThreadingHTTPServer((host, port), FixtureRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fixture_server = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_overrides(self):
+        """
+        Returns:
+            dict: Redirections à passer à Common.Metrics.set_url_overrides (ou CARTO_URL_OVERRIDES).
+        """
+        return {prefix: f"{self.url}/{api}" for api, prefix in api_prefixes(self.gitlab_urls)}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add_route(self, method, api, pattern, handler):
+        """
+        Ajoute une route synthétique.
+
+        Args:
+            method (str): Méthode HTTP.
+            api (str): API concernée ('github', 'sh', 'hal', 'gitlab').
+            pattern (str): Expression régulière du chemin (sans le préfixe /<api>).
+            handler (callable): Fonction (match, query, body) -> (statut, en-têtes, corps JSON).
+        """
+        self.routes.append((method, api, re.compile(pattern + '$'), handler))
+
+    def add_default_routes(self):
+        size = self.corpus_size
+
+        def in_corpus(i):
+            return i is not None and i < size
+
+        def github_repo(match, query, body):
+            i = project_index(match.group(2))
+            if not in_corpus(i):
+                return 404, {}, {"message": "Not Found"}
+            return 200, {}, Corpus.github_repo(i)
+
+        def github_commits(match, query, body):
+            i = project_index(match.group(2))
+            if not in_corpus(i):
+                return 404, {}, {"message": "Not Found"}
+            commits = 1 + i % 300
+            link = f'<{API_PREFIXES["github"]}/repos/{match.group(1)}/{match.group(2)}/commits?per_page=1&page={commits}>; rel="last"'
+            return 200, {'Link': link} if commits > 1 else {}, [{"sha": Corpus.swh_hash(i, 3)}]
+
+        def github_graphql(match, query, body):
+            # Seules les requêtes de CommitCounts (history.totalCount par alias) sont reconnues
+            data = {}
+            for alias, owner, name in re.findall(r'(r\d+): repository\(owner: "([^"]*)", name: "([^"]*)"\)', (body or {}).get("query", "")):
+                i = project_index(name)
+                if not in_corpus(i):
+                    data[alias] = None
+                    continue
+                data[alias] = {"defaultBranchRef": {"target": {"oid": Corpus.swh_hash(i, 3), "history": {"totalCount": 1 + i % 300}}}}
+            return 200, {}, {"data": data}
+
+        def github_contributors(match, query, body):
+            i = project_index(match.group(2))
+            if not in_corpus(i):
+                return 404, {}, {"message": "Not Found"}
+            return 200, {}, Corpus.github_contributors(i)
+
+        def github_user_repos(match, query, body):
+            owner = int(match.group(1)[len('owner'):]) if match.group(1).startswith('owner') else None
+            if owner is None:
+                return 404, {}, {"message": "Not Found"}
+            indexes = [i for i in range(3 * owner, 3 * owner + 3) if in_corpus(i)]
+            if query.get('sort') in ('updated', 'pushed'):
+                indexes.sort(key=lambda i: Corpus.github_repo(i)[query['sort'] + '_at'], reverse=query.get('direction', 'desc') == 'desc')
+            page, per_page = int(query.get('page', 1)), int(query.get('per_page', 30))
+            return 200, {}, paginate(lambda k: Corpus.github_repo(indexes[k]), len(indexes), page, per_page)
+
+        def github_user(match, query, body):
+            return 200, {}, Corpus.github_user(match.group(1))
+
+        def sh_origin_search(match, query, body):
+            per_page = int(query.get('limit', query.get('per_page', 100)))
+            offset = int(query.get('page_token', 0))
+            origins = [{"url": Corpus.repo_url(i), "visit_types": ["git"], "has_visits": True,
+                        "origin_visits_url": f"{API_PREFIXES['sh']}/api/1/origin/{Corpus.repo_url(i)}/visits/",
+                        "metadata_authorities_url": f"{API_PREFIXES['sh']}/api/1/raw-extrinsic-metadata/swhid/"}
+                       for i in range(offset, min(offset + per_page, size))]
+            headers = {}
+            if offset + per_page < size:
+                headers['Link'] = f'<{API_PREFIXES["sh"]}/api/1/origin/search/{quote(match.group(1), safe="")}/?limit={per_page}&page_token={offset + per_page}>; rel="next"'
+            return 200, headers, origins
+
+        def sh_visit_latest(match, query, body):
+            i = project_index(match.group(1))
+            if not in_corpus(i):
+                return 404, {}, {"exception": "NotFoundExc"}
+            return 200, {}, Corpus.sh_visit(i)
+
+        def sh_snapshot(match, query, body):
+            return 200, {}, Corpus.sh_snapshot(Corpus.swh_index(match.group(1)))
+
+        def sh_revision(match, query, body):
+            return 200, {}, Corpus.sh_revision(Corpus.swh_index(match.group(1)))
+
+        def sh_release(match, query, body):
+            return 200, {}, Corpus.sh_release(Corpus.swh_index(match.group(1)))
+
+        def sh_graphql(match, query, body):
+            # Seules les requêtes par lot de ShAllProjInfoJSON (origine -> dernière visite -> branche HEAD) sont reconnues
+            data = {}
+            for alias, origin_url in re.findall(r'(o\d+): origin\(url: "([^"]*)"\)', (body or {}).get("query", "")):
+                i = project_index(origin_url.rstrip('/').split('/')[-1])
+                if not in_corpus(i):
+                    data[alias] = None
+                    continue
+                revision = Corpus.sh_revision(i)
+                data[alias] = {"latestVisit": {"date": Corpus.sh_visit(i)["date"], "latestStatus": {"snapshot": {"headBranch": {"target": {
+                    "type": "revision",
+                    "node": {"swhid": f"swh:1:rev:{revision['id']}", "message": {"text": revision["message"]},
+                             "date": {"date": revision["date"]}, "committerDate": {"date": revision["committer_date"]},
+                             "author": [{"name": {"text": revision["author"]["name"]}, "email": {"text": revision["author"]["email"]}}]},
+                }}}}}}
+            return 200, {}, {"data": data}
+
+        def sh_known(match, query, body):
+            return 200, {}, {swhid: {"known": in_corpus(Corpus.swh_index(swhid.split(':')[-1]))} for swhid in body or []}
+
+        def hal_search(match, query, body):
+            start, rows = int(query.get('start', 0)), int(query.get('rows', 30))
+            docs = [Corpus.hal_doc(i) for i in range(start, min(start + rows, size))]
+            return 200, {}, {"response": {"numFound": size, "start": start, "docs": docs}}
+
+        def gitlab_projects(match, query, body):
+            page, per_page = int(query.get('page', 1)), int(query.get('per_page', 20))
+            headers = {'X-Total': str(size), 'X-Total-Pages': str(max(1, -(-size // per_page)))}
+            return 200, headers, paginate(Corpus.gitlab_project, size, page, per_page)
+
+        self.add_route('GET', 'github', r'/repos/([^/]+)/([^/]+)', github_repo)
+        self.add_route('GET', 'github', r'/repos/([^/]+)/([^/]+)/commits', github_commits)
+        self.add_route('GET', 'github', r'/repos/([^/]+)/([^/]+)/contributors', github_contributors)
+        self.add_route('POST', 'github', r'/graphql', github_graphql)
+        self.add_route('GET', 'github', r'/users/([^/]+)/repos', github_user_repos)
+        self.add_route('GET', 'github', r'/users/([^/]+)', github_user)
+        self.add_route('GET', 'sh', r'/api/1/origin/search/([^/]+)/?', sh_origin_search)
+        self.add_route('GET', 'sh', r'/api/1/origin/(.+)/visit/latest/?', sh_visit_latest)
+        self.add_route('GET', 'sh', r'/api/1/snapshot/([0-9a-f]{40})/?', sh_snapshot)
+        self.add_route('GET', 'sh', r'/api/1/revision/([0-9a-f]{40})/?', sh_revision)
+        self.add_route('GET', 'sh', r'/api/1/release/([0-9a-f]{40})/?', sh_release)
+        self.add_route('POST', 'sh', r'/api/1/known/?', sh_known)
+        self.add_route('POST', 'sh', r'/graphql/?', sh_graphql)
+        self.add_route('GET', 'hal', r'/search/?', hal_search)
+        self.add_route('GET', 'gitlab', r'/api/v4/projects', gitlab_projects)
+
+    def check_rate_limit(self, api):
+        """
+        Compte une requête pour une API (ou un couple API, jeton).
+
+        Returns:
+            tuple: (requête autorisée, requêtes restantes, fin de la fenêtre en secondes depuis l'epoch).
+        """
+        with self.lock:
+            self.request_count += 1
+            now = time.time()
+            window_start, used = self.windows.get(api, (now, 0))
+            if now - window_start >= self.rate_window:
+                window_start, used = now, 0
+            used += 1
+            self.windows[api] = (window_start, used)
+        reset = int(window_start + self.rate_window) + 1
+        if self.rate_limit is None:
+            return True, 5000, reset
+        return used <= self.rate_limit, max(self.rate_limit - used, 0), reset
+
+    def respond(self, method, raw_path, body, authorization=None):
+        """
+        Calcule la réponse à une requête.
+
+        Args:
+            method (str): Méthode HTTP.
+            raw_path (str): Chemin et paramètres de la requête.
+            body (dict): Corps JSON de la requête (ou None).
+            authorization (str): En-tête Authorization ; chaque jeton a sa propre limite de taux.
+
+        Returns:
+            tuple: (statut, en-têtes, corps JSON).
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(raw_path)
+        api, _, path = parts.path.lstrip('/').partition('/')
+        path = '/' + unquote(path)
+
+        allowed, remaining, reset = self.check_rate_limit((api, authorization))
+        headers = {'X-RateLimit-Limit': str(self.rate_limit or 5000), 'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Reset': str(reset)}
+        if not allowed:
+            if api == 'github':
+                return 403, headers, {"message": "API rate limit exceeded"}
+            return 429, dict(headers, **{'Retry-After': str(max(reset - int(time.time()), 1))}), {"exception": "RateLimitExceeded"}
+
+        recorded = self.fixtures.get(f"{method} {raw_path}")
+        if recorded:
+            return recorded["status"], dict(headers, **recorded.get("headers", {})), recorded["body"]
+
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        for route_method, route_api, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if route_method == method and route_api == api and match:
+                status, extra_headers, payload = handler(match, query, body)
+                return status, dict(headers, **extra_headers), payload
+        return 404, headers, {"message": f"Aucune réponse pour {method} {raw_path}"}
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def handle_request(self, method):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, headers, payload = self.server.fixture_server.respond(method, self.path, body, self.headers.get('Authorization'))
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+def record_fixtures(urls, output_file, headers=None, gitlab_urls=None):
+    """
+    Enregistre les réponses réelles des API pour une liste d'URL, au format lu par FixtureServer.
+    Les réponses déjà présentes dans output_file sont conservées.
+
+    Args:
+        urls (list): URL à interroger (préfixes de API_PREFIXES ou d'une instance GitLab).
+        output_file (str): Fichier JSON des réponses enregistrées.
+        headers (dict): En-têtes HTTP (ex. jeton d'authentification).
+        gitlab_urls (list): URL de base des instances GitLab (par défaut, DEFAULT_GITLAB_URLS).
+
+    Returns:
+        int: Nombre de réponses enregistrées.
+    """
+    import requests
+
+    fixtures = {}
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            fixtures = json.load(f)
+
+    prefixes = api_prefixes(gitlab_urls)
+    recorded = 0
+    for url in urls:
+        api, prefix = next(((name, prefix) for name, prefix in prefixes if url.startswith(prefix)), (None, None))
+        if api is None:
+            print(f"URL ignorée (API inconnue) : {url}")
+            continue
+        response = requests.get(url, headers=headers or {})
+        kept_headers = {key: value for key, value in response.headers.items() if key in RECORDED_HEADERS}
+        fixtures[f"GET /{api}{url[len(prefix):]}"] = {"status": response.status_code, "headers": kept_headers, "body": response.json()}
+        recorded += 1
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(fixtures, f, ensure_ascii=False, indent=2)
+    return recorded
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur local des API pour les bancs d'essai.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help="Démarre le serveur.")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--size', type=int, default=1000, help="Taille du corpus synthétique.")
+    serve.add_argument('--latency', type=float, default=0.0, help="Latence par réponse, en secondes.")
+    serve.add_argument('--rate-limit', type=int, default=None, help="Requêtes autorisées par API, par jeton et par fenêtre.")
+    serve.add_argument('--rate-window', type=float, default=60.0, help="Durée de la fenêtre, en secondes.")
+    serve.add_argument('--fixtures', default=None, help="Fichier de réponses enregistrées.")
+    serve.add_argument('--gitlab-url', action='append', default=None, help="Instance GitLab à rediriger (répétable).")
+
+    record = subparsers.add_parser('record', help="Enregistre les réponses réelles d'une liste d'URL.")
+    record.add_argument('urls_file', help="Fichier texte, une URL par ligne.")
+    record.add_argument('output_file')
+    record.add_argument('--token', default=None, help="Jeton GitHub (en-tête Authorization).")
+    record.add_argument('--gitlab-url', action='append', default=None, help="Instance GitLab des URL à enregistrer (répétable).")
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        with open(args.urls_file, 'r', encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip()]
+        headers = {'Authorization': f'token {args.token}'} if args.token else None
+        print(f"{record_fixtures(urls, args.output_file, headers, args.gitlab_url)} réponses enregistrées dans {args.output_file}")
+        return
+
+    server = FixtureServer(corpus_size=args.size, latency=args.latency, rate_limit=args.rate_limit, rate_window=args.rate_window,
+                           fixtures_file=args.fixtures, host=args.host, port=args.port, gitlab_urls=args.gitlab_url)
+    print(f"Serveur démarré sur {server.url}")
+    print(f"export CARTO_URL_OVERRIDES='{json.dumps(server.url_overrides())}'")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
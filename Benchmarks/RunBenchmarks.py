@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(ROOT_DIR)
+for directory in ('Hal', 'Github', 'SH', 'Gitlab', 'DB'):
+    sys.path.append(os.path.join(ROOT_DIR, directory))
+sys.path.append(BENCH_DIR)
+
+import Corpus
+from Common import Metrics
+from Common.ProjectIO import load_projects_file
+from FixtureServer import FixtureServer
+
+""" Bancs d'essai des collecteurs et du chargement de la base.
+
+    Les collecteurs interrogent le serveur local FixtureServer (latence et limite de taux configurables)
+    au lieu des API réelles ; la fusion et la base travaillent sur des corpus synthétiques (voir Corpus),
+    la base étant une base embarquée SQLite (voir DB/EmbeddedDB.py).
+    Les attentes dues aux limites de taux sont raccourcies (--sleep-scale, 0 par défaut) mais leur durée
+    nominale est reportée dans les résultats.
+
+    Chaque exécution écrit un fichier JSON de résultats dans Benchmarks/results/ ; --compare affiche
+    l'écart avec un fichier de résultats précédent.
+
+    Utilisation :
+        python Benchmarks/RunBenchmarks.py
+        python Benchmarks/RunBenchmarks.py --sizes 10000 100000 --api-size 1000 --latency 0.02
+        python Benchmarks/RunBenchmarks.py --only json_merger fill_database --compare Benchmarks/results/ancien.json """
+
+def bench_collect_hal_data(context):
+    import HalJSON
+    HalJSON.collect_hal_data('CNRS', 'SOFTWARE')
+
+def bench_github_process_projects(context):
+    import GitJSON
+    projects = [Corpus.project(i) for i in range(context["size"])]
+    GitJSON.GitHubRepoInfoCollector(token=context["github_tokens"]).process_projects(projects)
+
+def bench_github_fetch_repos(context):
+    import GitOwnersRepoJSON
+    owners = [Corpus.owner_name(i) for i in range(0, context["size"], 3)]
+    fetcher = GitOwnersRepoJSON.GitHubRepoFetcher(context["github_tokens"], state_file=os.path.join(context["work_dir"], 'owner_state.json'))
+    fetcher.fetch_repos(owners)
+
+def bench_sh_get_project_info(context):
+    import ShAllProjInfoJSON
+    headers = {"Authorization": "Bearer benchmark"}
+    for i in range(context["size"]):
+        ShAllProjInfoJSON.get_project_info(Corpus.repo_url(i), headers)
+
+def bench_sh_get_projects_info_graphql(context):
+    import ShAllProjInfoJSON
+    headers = {"Authorization": "Bearer benchmark"}
+    urls = [Corpus.repo_url(i) for i in range(context["size"])]
+    for start in range(0, len(urls), ShAllProjInfoJSON.GRAPHQL_BATCH_SIZE):
+        ShAllProjInfoJSON.get_projects_info_graphql(urls[start:start + ShAllProjInfoJSON.GRAPHQL_BATCH_SIZE], headers)
+
+def prepare_transform_projects(context):
+    size = context["size"]
+    labs = 10
+    return [[{
+        "laboratory_name": f"LAB{lab:03d}",
+        "number_of_projects": len(range(lab, size, labs)),
+        "projects": [Corpus.gitlab_project(i) for i in range(lab, size, labs)],
+    } for lab in range(labs)]]
+
+def bench_transform_projects(context, input_json):
+    import GitlabJSON
+    GitlabJSON.transform_projects(input_json)
+
+def prepare_json_merger(context):
+    return [[Corpus.corpus_file(context["corpus_dir"], kind, context["size"]) for kind in ('projects', 'github_owners')]]
+
+def bench_json_merger(context, json_files):
+    from ConcatenateJson import JsonMerger
+    JsonMerger(output_file=os.path.join(context["work_dir"], 'merged.jsonl.gz')).merge_and_save(json_files)
+
+def bench_json_merger_external(context, json_files):
+    from ConcatenateJson import JsonMerger
+    # Budget volontairement faible pour forcer plusieurs runs triés
+    merger = JsonMerger(output_file=os.path.join(context["work_dir"], 'merged_external.jsonl.gz'),
+                        memory_budget=16 * 1024 * 1024, spill_dir=context["work_dir"])
+    merger.merge_and_save(json_files)
+
+def prepare_fill_database(context):
+    projects = load_projects_file(Corpus.corpus_file(context["corpus_dir"], 'projects', context["size"]))["projects"]
+    projects_github = load_projects_file(Corpus.corpus_file(context["corpus_dir"], 'github', context["size"]))["projects"]
+    database = os.path.join(context["work_dir"], 'benchmark.db')
+    if os.path.exists(database):
+        os.remove(database)
+    return [projects, projects_github, database]
+
+def bench_fill_database(context, projects, projects_github, database):
+    from DataBase import DatabaseManager
+    db_manager = DatabaseManager({'backend': 'sqlite', 'database': database}, store_dir=os.path.join(context["work_dir"], 'github_store'))
+    db_manager.connect()
+    db_manager.fill_database(projects, projects_github)
+    db_manager.close()
+
+def prepare_stream_database(context):
+    json_files = [Corpus.corpus_file(context["corpus_dir"], kind, context["size"]) for kind in ('projects', 'github_owners')]
+    github_file = Corpus.corpus_file(context["corpus_dir"], 'github', context["size"])
+    database = os.path.join(context["work_dir"], 'benchmark_stream.db')
+    if os.path.exists(database):
+        os.remove(database)
+    return [json_files, github_file, database]
+
+def bench_stream_database(context, json_files, github_file, database):
+    # Fusion et chargement en flux, à comparer à json_merger + fill_database
+    from StreamLoader import StreamLoader
+    loader = StreamLoader({'backend': 'sqlite', 'database': database}, store_dir=os.path.join(context["work_dir"], 'github_store_stream')).start()
+    for json_file in json_files:
+        loader.feed_file(json_file)
+    loader.feed_file(github_file, 'github')
+    loader.close()
+
+# kind 'api' : taille --api-size, interroge le serveur local ; kind 'corpus' : une mesure par taille de --sizes.
+# prepare (optionnel) construit les arguments hors du temps mesuré.
+BENCHMARKS = [
+    {"name": "collect_hal_data", "kind": "api", "run": bench_collect_hal_data},
+    {"name": "github_process_projects", "kind": "api", "run": bench_github_process_projects},
+    {"name": "github_fetch_repos", "kind": "api", "run": bench_github_fetch_repos},
+    {"name": "sh_get_project_info", "kind": "api", "run": bench_sh_get_project_info},
+    {"name": "sh_get_projects_info_graphql", "kind": "api", "run": bench_sh_get_projects_info_graphql},
+    {"name": "transform_projects", "kind": "corpus", "prepare": prepare_transform_projects, "run": bench_transform_projects},
+    {"name": "json_merger", "kind": "corpus", "prepare": prepare_json_merger, "run": bench_json_merger},
+    {"name": "json_merger_external", "kind": "corpus", "prepare": prepare_json_merger, "run": bench_json_merger_external},
+    {"name": "fill_database", "kind": "corpus", "prepare": prepare_fill_database, "run": bench_fill_database},
+    {"name": "stream_database", "kind": "corpus", "prepare": prepare_stream_database, "run": bench_stream_database},
+]
+
+def counter_total(snapshot, name):
+    return sum(counter["value"] for counter in snapshot["counters"] if counter["name"] == name)
+
+def run_benchmark(benchmark, context, repeat):
+    """
+    Exécute un banc d'essai et retourne sa meilleure mesure.
+
+    Args:
+        benchmark (dict): Description du banc d'essai (voir BENCHMARKS).
+        context (dict): Taille, répertoires de travail et des corpus.
+        repeat (int): Nombre de répétitions.
+
+    Returns:
+        dict: Résultat (durée minimale, débit et mesures de Common.Metrics de la meilleure répétition).
+    """
+    best = None
+    for repetition in range(repeat):
+        # Stockage des réponses vide à chaque mesure (voir Common.ResponseStore)
+        os.environ['CARTO_RESPONSE_STORE'] = os.path.join(context["work_dir"], f"responses_{benchmark['name']}_{context['size']}_{repetition}.db")
+        args = benchmark["prepare"](context) if "prepare" in benchmark else []
+        Metrics.reset()
+        start = time.perf_counter()
+        benchmark["run"](context, *args)
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best[0]:
+            best = (seconds, Metrics.snapshot())
+
+    seconds, snapshot = best
+    return {
+        "benchmark": benchmark["name"],
+        "size": context["size"],
+        "seconds": round(seconds, 4),
+        "items_per_second": round(context["size"] / seconds, 1) if seconds else None,
+        "http_requests": counter_total(snapshot, 'http_requests_total'),
+        "http_bytes": counter_total(snapshot, 'http_response_bytes_total'),
+        "rate_limit_sleep_seconds": counter_total(snapshot, 'rate_limit_sleep_seconds_total'),
+        "db_rows_inserted": counter_total(snapshot, 'db_rows_inserted_total'),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous_file, results):
+    """
+    Affiche l'écart de durée avec un fichier de résultats précédent.
+
+    Args:
+        previous_file (str): Fichier de résultats précédent.
+        results (list): Résultats de l'exécution courante.
+    """
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = {(result["benchmark"], result["size"]): result for result in json.load(f)["results"]}
+    print(f"\nComparaison avec {previous_file} :")
+    for result in results:
+        before = previous.get((result["benchmark"], result["size"]))
+        if before and before["seconds"]:
+            change = (result["seconds"] - before["seconds"]) / before["seconds"] * 100
+            print(f"  {result['benchmark']:<26} {result['size']:>9} : {before['seconds']:.3f}s -> {result['seconds']:.3f}s ({change:+.1f} %)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bancs d'essai des collecteurs et du chargement de la base.")
+    parser.add_argument('--only', nargs='+', choices=[benchmark["name"] for benchmark in BENCHMARKS], help="Bancs d'essai à exécuter.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000], help="Tailles des corpus (10000, 100000, 1000000...).")
+    parser.add_argument('--api-size', type=int, default=300, help="Nombre d'enregistrements servis par les API simulées.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latence des API simulées, en secondes.")
+    parser.add_argument('--rate-limit', type=int, default=None, help="Requêtes autorisées par API, par jeton et par fenêtre.")
+    parser.add_argument('--github-tokens', type=int, default=1, help="Nombre de jetons GitHub simulés (pool de jetons).")
+    parser.add_argument('--rate-window', type=float, default=60.0, help="Durée de la fenêtre de limite de taux, en secondes.")
+    parser.add_argument('--sleep-scale', type=float, default=0.0, help="Facteur appliqué aux attentes des limites de taux.")
+    parser.add_argument('--fixtures', default=None, help="Fichier de réponses enregistrées (voir FixtureServer record).")
+    parser.add_argument('--repeat', type=int, default=1, help="Répétitions par mesure (la meilleure est retenue).")
+    parser.add_argument('--corpus-dir', default=os.path.join(BENCH_DIR, 'corpora'))
+    parser.add_argument('--output', default=None, help="Fichier de résultats (par défaut dans Benchmarks/results/).")
+    parser.add_argument('--compare', default=None, help="Fichier de résultats précédent à comparer.")
+    args = parser.parse_args()
+
+    os.environ['CARTO_SLEEP_SCALE'] = str(args.sleep_scale)
+    selected = [benchmark for benchmark in BENCHMARKS if not args.only or benchmark["name"] in args.only]
+    started_at = datetime.now()
+    results = []
+
+    server = FixtureServer(corpus_size=args.api_size, latency=args.latency, rate_limit=args.rate_limit,
+                           rate_window=args.rate_window, fixtures_file=args.fixtures)
+    with server, tempfile.TemporaryDirectory() as work_dir:
+        Metrics.set_url_overrides(server.url_overrides())
+        for benchmark in selected:
+            sizes = [args.api_size] if benchmark["kind"] == "api" else args.sizes
+            for size in sizes:
+                context = {"size": size, "work_dir": work_dir, "corpus_dir": args.corpus_dir, "server_url": server.url,
+                           "github_tokens": [f"benchmark-{k}" for k in range(args.github_tokens)]}
+                result = run_benchmark(benchmark, context, args.repeat)
+                results.append(result)
+                print(f"{result['benchmark']:<26} {result['size']:>9} : {result['seconds']:.3f}s ({result['items_per_second']} /s, {result['http_requests']:.0f} requêtes)")
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"bench_{started_at.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    report = {
+        "started_at": started_at.isoformat(timespec='seconds'),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        "results": results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"Résultats écrits dans {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()
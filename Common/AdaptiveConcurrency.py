@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Common import Metrics
+
+""" Contrôle adaptatif du nombre de requêtes simultanées envoyées à une API (AIMD).
+
+    Le nombre de requêtes en cours autorisées augmente d'une unité par « aller-retour » (+1/limite à chaque réponse)
+    tant que les réponses arrivent sans erreur et sans hausse de latence, et il est divisé par deux dès qu'une réponse
+    429 ou 5xx arrive ou que la latence lissée dépasse latency_tolerance fois la latence de référence (la plus faible
+    observée). Au plus une réduction par aller-retour : les réponses aux requêtes parties avant la dernière réduction
+    ne la répètent pas. Chaque collecte se stabilise ainsi près du débit maximal que l'API supporte.
+    Pendant l'attente demandée par une réponse 429, aucune nouvelle requête n'est envoyée à l'API.
+
+    La limite choisie est affichée toutes les log_interval secondes, conservée dans history et enregistrée
+    dans Common.Metrics (histogramme concurrency_limit, compteur concurrency_decreases_total).
+
+    Les collecteurs partagent un contrôleur par API ou par instance (get_controller). Le maximum est fixé par
+    CARTO_MAX_CONCURRENCY (16 par défaut). """
+
+DEFAULT_MAXIMUM = int(os.environ.get('CARTO_MAX_CONCURRENCY', 16))
+CONCURRENCY_BUCKETS = (1, 2, 4, 8, 16, 32, 64, float('inf'))
+
+class AdaptiveConcurrency:
+    def __init__(self, name, initial=2, minimum=1, maximum=None, latency_tolerance=2.0, retry_after=60, log_interval=10.0):
+        """
+        Initialise le contrôleur.
+        Args:
+            name (str): Nom de l'API (ex. "hal", "sh", ou l'URL d'une instance GitLab), utilisé dans les mesures.
+            initial (int): Nombre de requêtes simultanées au départ.
+            minimum (int): Nombre minimal de requêtes simultanées.
+            maximum (int): Nombre maximal de requêtes simultanées (par défaut, DEFAULT_MAXIMUM).
+            latency_tolerance (float): Hausse de latence, par rapport à la référence, considérée comme une surcharge.
+            retry_after (float): Attente en secondes après une réponse 429 sans en-tête Retry-After.
+            log_interval (float): Intervalle en secondes entre deux affichages de la limite.
+        """
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum or DEFAULT_MAXIMUM
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.latency_tolerance = latency_tolerance
+        self.retry_after = retry_after
+        self.log_interval = log_interval
+        self.in_flight = 0
+        self.pausing = 0
+        self.latency = None
+        self.base_latency = None
+        self.last_decrease = 0.0
+        self.last_log = 0.0
+        self.history = []
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Attend qu'une place soit libre sous la limite (et la fin des attentes dues à une réponse 429) et la réserve.
+        Returns:
+            float: Instant de départ de la requête (à transmettre à release).
+        """
+        with self.condition:
+            while self.pausing or self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started, overloaded=False):
+        """
+        Libère une place et ajuste la limite d'après le résultat de la requête.
+        Args:
+            started (float): Instant de départ retourné par acquire.
+            overloaded (bool): True si l'API a signalé une surcharge (429, 5xx, erreur réseau).
+        """
+        now = time.monotonic()
+        with self.condition:
+            self.in_flight -= 1
+            if not overloaded:
+                latency = now - started
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                # La référence remonte lentement, pour suivre un changement durable du temps de réponse
+                self.base_latency = self.latency if self.base_latency is None else min(self.base_latency * 1.001, self.latency)
+                overloaded = self.latency > self.base_latency * self.latency_tolerance
+            if overloaded:
+                if started >= self.last_decrease:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_decrease = now
+                    Metrics.count('concurrency_decreases_total', source=self.name)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+            if now - self.last_log >= self.log_interval:
+                self.last_log = now
+                self.log()
+
+    def log(self):
+        self.history.append({"time": time.time(), "limit": int(self.limit), "latency": self.latency})
+        Metrics.observe('concurrency_limit', int(self.limit), buckets=CONCURRENCY_BUCKETS, source=self.name)
+        latency = f"{self.latency:.2f} s" if self.latency is not None else "inconnue"
+        print(f"[{self.name}] concurrence adaptative : {int(self.limit)} requêtes simultanées (latence lissée {latency})")
+
+    def request(self, method, url, endpoint, **kwargs):
+        """
+        Effectue une requête HTTP sous le contrôle de la limite (voir Metrics.http_request). Une réponse 429 réduit
+        la limite, puis la requête est rejouée après l'attente demandée par l'API.
+        Args:
+            method (str): Méthode HTTP.
+            url (str): URL de la requête.
+            endpoint (str): Nom du point d'accès pour les mesures.
+            **kwargs: Paramètres transmis à requests.
+        Returns:
+            requests.Response: Réponse HTTP (autre que 429).
+        """
+        while True:
+            started = self.acquire()
+            try:
+                response = Metrics.http_request(method, url, endpoint, **kwargs)
+            except Exception:
+                self.release(started, overloaded=True)
+                raise
+            self.release(started, overloaded=response.status_code == 429 or response.status_code >= 500)
+            if response.status_code != 429:
+                return response
+            wait = float(response.headers.get('Retry-After', self.retry_after))
+            with self.condition:
+                self.pausing += 1
+                if self.pausing == 1:
+                    print(f"[{self.name}] limite de taux atteinte, attente de {wait:.0f} secondes avant de réessayer...")
+            try:
+                Metrics.rate_limit_sleep(wait, self.name)
+            finally:
+                with self.condition:
+                    self.pausing -= 1
+                    self.condition.notify_all()
+
+    def get(self, url, endpoint, **kwargs):
+        return self.request('GET', url, endpoint, **kwargs)
+
+    def post(self, url, endpoint, **kwargs):
+        return self.request('POST', url, endpoint, **kwargs)
+
+    def map(self, function, items):
+        """
+        Applique une fonction à chaque élément dans des threads ; le nombre de requêtes réellement simultanées
+        est réglé par la limite si la fonction passe par request.
+        Args:
+            function (callable): Fonction à appliquer.
+            items (iterable): Éléments.
+        Yields:
+            Résultats, dans l'ordre des éléments.
+        """
+        with ThreadPoolExecutor(max_workers=self.maximum) as executor:
+            yield from executor.map(function, items)
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+def get_controller(name, **kwargs):
+    """
+    Retourne le contrôleur partagé d'une API (créé au premier appel).
+    Args:
+        name (str): Nom de l'API ou URL de l'instance.
+        **kwargs: Paramètres de AdaptiveConcurrency, utilisés à la création.
+    Returns:
+        AdaptiveConcurrency: Contrôleur.
+    """
+    with _controllers_lock:
+        if name not in _controllers:
+            _controllers[name] = AdaptiveConcurrency(name, **kwargs)
+        return _controllers[name]
@@ -0,0 +1,311 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+""" Instrumentation commune aux collecteurs et au chargement de la base de données.
+
+    Les mesures (compteurs et histogrammes, avec des étiquettes) sont accumulées dans le processus courant :
+    - requêtes HTTP par point d'accès et code de retour, latence, octets reçus (http_get / http_post) ;
+    - temps passé à attendre à cause des limites de taux (rate_limit_sleep) ;
+    - succès et échecs des caches (cache_lookup) ;
+    - lignes insérées par table (rows_inserted) ;
+    - durée de chaque phase (phase).
+    write_run_report écrit un rapport JSON de l'exécution (et, en option, au format texte Prometheus)
+    et l'ajoute à un historique pour comparer les exécutions successives.
+
+    Pour les bancs d'essai (voir Benchmarks/), les URL des API peuvent être redirigées vers un serveur local
+    (set_url_overrides ou variable d'environnement CARTO_URL_OVERRIDES, un objet JSON {préfixe: remplacement})
+    et les attentes dues aux limites de taux raccourcies (CARTO_SLEEP_SCALE, facteur appliqué aux durées). """
+
+# Bornes des histogrammes de latence, en secondes
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_started_at = datetime.now()
+_start = time.perf_counter()
+_url_overrides = json.loads(os.environ.get('CARTO_URL_OVERRIDES', '{}'))
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def count(name, value=1, **labels):
+    """
+    Incrémente un compteur.
+
+    Args:
+        name (str): Nom du compteur.
+        value (float): Valeur à ajouter.
+        **labels: Étiquettes du compteur (ex. endpoint="github:repos").
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """
+    Ajoute une observation à un histogramme.
+
+    Args:
+        name (str): Nom de l'histogramme.
+        value (float): Valeur observée.
+        buckets (tuple): Bornes supérieures des classes.
+        **labels: Étiquettes de l'histogramme.
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "count": 0, "sum": 0.0}
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram["counts"][index] += 1
+                break
+        histogram["count"] += 1
+        histogram["sum"] += value
+
+def reset():
+    """
+    Remet les mesures à zéro (un processus réutilisé pour plusieurs étapes produit un rapport par étape).
+    """
+    global _started_at, _start
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _started_at = datetime.now()
+        _start = time.perf_counter()
+
+@contextmanager
+def phase(name):
+    """
+    Mesure la durée d'une phase (bloc with).
+
+    Args:
+        name (str): Nom de la phase.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        count('phase_seconds_total', time.perf_counter() - start, phase=name)
+
+def set_url_overrides(overrides):
+    """
+    Redirige les requêtes dont l'URL commence par un préfixe donné (ex. vers un serveur de bancs d'essai).
+
+    Args:
+        overrides (dict): Remplacement par préfixe, ex. {"https://api.github.com": "http://127.0.0.1:8765/github"}.
+    """
+    global _url_overrides
+    _url_overrides = dict(overrides)
+
+def resolve_url(url):
+    """
+    Applique les redirections configurées à une URL.
+
+    Args:
+        url (str): URL d'origine.
+
+    Returns:
+        str: URL à interroger.
+    """
+    for prefix, target in _url_overrides.items():
+        if url.startswith(prefix):
+            return target + url[len(prefix):]
+    return url
+
+def http_request(method, url, endpoint, session=None, **kwargs):
+    """
+    Effectue une requête HTTP avec requests et enregistre nombre, latence, code de retour et octets reçus.
+
+    Args:
+        method (str): Méthode HTTP ("GET", "POST"...).
+        url (str): URL de la requête.
+        endpoint (str): Nom du point d'accès, sans paramètres (ex. "github:repos"), pour regrouper les mesures.
+        session (requests.Session): Session à utiliser (optionnelle).
+        **kwargs: Paramètres transmis à requests.
+
+    Returns:
+        requests.Response: Réponse HTTP.
+    """
+    import requests
+
+    start = time.perf_counter()
+    try:
+        response = (session or requests).request(method, resolve_url(url), **kwargs)
+    except requests.exceptions.RequestException:
+        count('http_requests_total', endpoint=endpoint, status='error')
+        observe('http_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+        raise
+    observe('http_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+    count('http_requests_total', endpoint=endpoint, status=str(response.status_code))
+    count('http_response_bytes_total', len(response.content), endpoint=endpoint)
+    return response
+
+def http_get(url, endpoint, session=None, **kwargs):
+    return http_request('GET', url, endpoint, session=session, **kwargs)
+
+def http_post(url, endpoint, session=None, **kwargs):
+    return http_request('POST', url, endpoint, session=session, **kwargs)
+
+def rate_limit_sleep(seconds, source):
+    """
+    Attend à cause d'une limite de taux et enregistre le temps d'attente.
+
+    Args:
+        seconds (float): Durée d'attente en secondes.
+        source (str): API concernée (ex. "github", "sh").
+    """
+    if seconds <= 0:
+        return
+    count('rate_limit_sleep_seconds_total', seconds, source=source)
+    count('rate_limit_sleeps_total', source=source)
+    time.sleep(seconds * float(os.environ.get('CARTO_SLEEP_SCALE', '1')))
+
+def cache_lookup(cache, hit, value=1):
+    """
+    Enregistre des accès à un cache.
+
+    Args:
+        cache (str): Nom du cache.
+        hit (bool): True si la donnée était en cache.
+        value (int): Nombre d'accès.
+    """
+    count('cache_requests_total', value, cache=cache, result='hit' if hit else 'miss')
+
+def rows_inserted(table, rows):
+    """
+    Enregistre des lignes insérées dans une table.
+
+    Args:
+        table (str): Nom de la table.
+        rows (int): Nombre de lignes insérées.
+    """
+    if rows and rows > 0:
+        count('db_rows_inserted_total', rows, table=table)
+
+INSERT_TABLE = re.compile(r'^\s*INSERT\s+(?:IGNORE\s+|OR\s+IGNORE\s+)?INTO\s+`?(\w+)', re.IGNORECASE)
+
+class InstrumentedCursor:
+    """
+    Enveloppe un curseur DB-API : mesure la durée des requêtes par type (INSERT, SELECT...)
+    et compte les lignes réellement insérées par table (rowcount, donc hors lignes ignorées).
+    Les autres attributs sont délégués au curseur d'origine.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        start = time.perf_counter()
+        result = self._cursor.execute(query, params) if params is not None else self._cursor.execute(query)
+        statement = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+        observe('db_query_seconds', time.perf_counter() - start, statement=statement)
+        match = INSERT_TABLE.match(query)
+        if match:
+            rows_inserted(match.group(1), self._cursor.rowcount)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+def snapshot():
+    """
+    Retourne l'état courant des mesures.
+
+    Returns:
+        dict: Compteurs, histogrammes et ratios de succès des caches.
+    """
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(_counters.items())]
+        histograms = [
+            {
+                "name": name,
+                "labels": dict(labels),
+                "count": histogram["count"],
+                "sum": histogram["sum"],
+                "buckets": [{"le": '+Inf' if bound == float('inf') else bound, "count": bucket} for bound, bucket in zip(histogram["buckets"], histogram["counts"])],
+            }
+            for (name, labels), histogram in sorted(_histograms.items())
+        ]
+
+    cache_totals = {}
+    for counter in counters:
+        if counter["name"] == 'cache_requests_total':
+            totals = cache_totals.setdefault(counter["labels"]["cache"], {"hit": 0, "miss": 0})
+            totals[counter["labels"]["result"]] += counter["value"]
+    cache_hit_ratio = {cache: totals["hit"] / (totals["hit"] + totals["miss"]) for cache, totals in cache_totals.items() if totals["hit"] + totals["miss"]}
+    return {"counters": counters, "histograms": histograms, "cache_hit_ratio": cache_hit_ratio}
+
+def prometheus_text(stage):
+    """
+    Formate les mesures au format texte d'exposition Prometheus.
+
+    Args:
+        stage (str): Nom de l'étape, ajouté en étiquette à chaque mesure.
+
+    Returns:
+        str: Texte Prometheus.
+    """
+    def format_labels(labels):
+        labels = dict(labels, stage=stage)
+        return '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}'
+
+    data = snapshot()
+    lines = []
+    for counter in data["counters"]:
+        lines.append(f'cartography_{counter["name"]}{format_labels(counter["labels"])} {counter["value"]}')
+    for histogram in data["histograms"]:
+        cumulative = 0
+        for bucket in histogram["buckets"]:
+            cumulative += bucket["count"]
+            lines.append(f'cartography_{histogram["name"]}_bucket{format_labels(dict(histogram["labels"], le=bucket["le"]))} {cumulative}')
+        lines.append(f'cartography_{histogram["name"]}_count{format_labels(histogram["labels"])} {histogram["count"]}')
+        lines.append(f'cartography_{histogram["name"]}_sum{format_labels(histogram["labels"])} {histogram["sum"]}')
+    return '\n'.join(lines) + '\n'
+
+def write_run_report(stage, output_dir=None, prometheus=None):
+    """
+    Écrit le rapport de l'exécution courante et l'ajoute à l'historique des exécutions.
+
+    Fichiers écrits dans output_dir (variable d'environnement CARTO_METRICS_DIR, ou le répertoire courant) :
+    - metrics_<stage>.json : rapport de la dernière exécution ;
+    - metrics_history.jsonl : une ligne par exécution, toutes étapes confondues ;
+    - metrics_<stage>.prom : format texte Prometheus, si prometheus est vrai (ou CARTO_METRICS_PROMETHEUS=1).
+
+    Args:
+        stage (str): Nom de l'étape (ex. "hal", "github_owners").
+        output_dir (str): Répertoire des rapports.
+        prometheus (bool): Écrit aussi le format texte Prometheus.
+
+    Returns:
+        dict: Rapport écrit.
+    """
+    output_dir = output_dir or os.environ.get('CARTO_METRICS_DIR', '.')
+    if prometheus is None:
+        prometheus = os.environ.get('CARTO_METRICS_PROMETHEUS') == '1'
+    os.makedirs(output_dir, exist_ok=True)
+
+    report = {
+        "stage": stage,
+        "started_at": _started_at.isoformat(timespec='seconds'),
+        "finished_at": datetime.now().isoformat(timespec='seconds'),
+        "wall_seconds": round(time.perf_counter() - _start, 3),
+        **snapshot(),
+    }
+    with open(os.path.join(output_dir, f'metrics_{stage}.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4, default=str)
+    with open(os.path.join(output_dir, 'metrics_history.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(report, ensure_ascii=False, default=str) + '\n')
+    if prometheus:
+        with open(os.path.join(output_dir, f'metrics_{stage}.prom'), 'w', encoding='utf-8') as f:
+            f.write(prometheus_text(stage))
+    return report
@@ -0,0 +1,205 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from html import escape
+
+""" Mode de profilage commun à tous les points d'entrée.
+
+    Activé par la variable d'environnement CARTO_PROFILE, liste de modes séparés par des virgules :
+    - CARTO_PROFILE=cprofile : profil déterministe (cProfile). Écrit profile_<étape>.prof (lisible par pstats,
+      snakeviz...) et profile_<étape>.txt (fonctions les plus coûteuses en temps cumulé) ;
+    - CARTO_PROFILE=sample : échantillonnage des piles de tous les threads (sys._current_frames) toutes les
+      CARTO_PROFILE_INTERVAL secondes (0.005 par défaut), faible surcoût, utilisable en production.
+      Écrit profile_<étape>.collapsed (format « piles repliées » de flamegraph.pl, speedscope...)
+      et profile_<étape>.svg (flamegraph autonome).
+    - CARTO_PROFILE=memory : suivi des allocations (tracemalloc). Écrit memory_<étape>.txt : lignes qui allouent
+      le plus de mémoire à la fin de l'étape, celles dont l'allocation a le plus augmenté, et le pic de mémoire.
+      tracemalloc ralentit fortement le code qui alloue beaucoup : à combiner avec un profil de temps
+      (ex. CARTO_PROFILE=sample,memory) seulement pour chercher une consommation mémoire.
+    cprofile et sample sont exclusifs (cProfile fausserait les piles échantillonnées) : si les deux sont demandés,
+    seul cprofile est utilisé et un avertissement est affiché.
+
+    Les fichiers sont écrits dans CARTO_PROFILE_DIR (ou CARTO_METRICS_DIR, ou le répertoire courant).
+    Seul le processus principal est profilé (pas les processus d'un ProcessPoolExecutor).
+
+    Utilisation :
+        CARTO_PROFILE=sample python HalJSON.py
+        CARTO_PROFILE=cprofile,memory python Pipeline.py --stages database """
+
+TOP_ALLOCATORS = 25
+TRACEMALLOC_FRAMES = 10
+
+class SamplingProfiler:
+    """
+    Profileur par échantillonnage : un thread relève périodiquement la pile de chaque thread.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='SamplingProfiler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, file_path):
+        """
+        Écrit les piles au format replié : une ligne « cadre1;cadre2;... nombre_d'échantillons ».
+        """
+        with open(file_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+    def write_flamegraph(self, file_path, title, width=1200, row_height=16):
+        """
+        Écrit un flamegraph SVG autonome (sans dépendance) à partir des piles échantillonnées.
+        """
+        # Arbre des cadres : {nom: [nombre, enfants]}
+        root = [0, {}]
+        for stack, count in self.stacks.items():
+            node = root
+            node[0] += count
+            for frame in stack.split(';'):
+                node = node[1].setdefault(frame, [0, {}])
+                node[0] += count
+
+        rects = []
+        def layout(children, x, depth):
+            for name, (count, grandchildren) in sorted(children.items()):
+                rect_width = count / root[0] * width
+                if rect_width >= 0.5:
+                    rects.append((x, depth, rect_width, name, count))
+                    layout(grandchildren, x, depth + 1)
+                x += rect_width
+        if root[0]:
+            layout(root[1], 0.0, 0)
+
+        depth = max((rect[1] for rect in rects), default=0) + 1
+        height = (depth + 2) * row_height
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">\n')
+            f.write(f'<text x="4" y="{row_height - 4}">{escape(title)} ({root[0]} échantillons)</text>\n')
+            for x, level, rect_width, name, count in rects:
+                y = height - (level + 1) * row_height
+                hue = 20 + zlib.crc32(name.split(" (")[0].encode()) % 40
+                label = escape(name) if rect_width > 40 else ''
+                f.write(f'<g><title>{escape(name)} : {count} ({count / root[0]:.1%})</title>'
+                        f'<rect x="{x:.1f}" y="{y}" width="{rect_width:.1f}" height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+                        f'<svg x="{x + 2:.1f}" y="{y}" width="{max(rect_width - 4, 0):.1f}" height="{row_height}">'
+                        f'<text y="{row_height - 4}">{label}</text></svg></g>\n')
+            f.write('</svg>\n')
+
+def write_memory_report(start_snapshot, end_snapshot, file_path):
+    """
+    Écrit le rapport tracemalloc d'une étape.
+
+    Args:
+        start_snapshot (tracemalloc.Snapshot): Allocations au début de l'étape.
+        end_snapshot (tracemalloc.Snapshot): Allocations à la fin de l'étape.
+        file_path (str): Fichier du rapport.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(f"Mémoire tracée : {current / 1e6:.1f} Mo, pic : {peak / 1e6:.1f} Mo\n\n")
+        f.write("Lignes allouant le plus de mémoire à la fin de l'étape :\n")
+        for stat in end_snapshot.statistics('lineno')[:TOP_ALLOCATORS]:
+            f.write(f"  {stat}\n")
+        f.write("\nPlus fortes augmentations pendant l'étape :\n")
+        for stat in end_snapshot.compare_to(start_snapshot, 'lineno')[:TOP_ALLOCATORS]:
+            f.write(f"  {stat}\n")
+        f.write(f"\nPiles des {min(5, TOP_ALLOCATORS)} plus gros allocateurs :\n")
+        for stat in end_snapshot.statistics('traceback')[:5]:
+            f.write(f"  {stat.size / 1e6:.1f} Mo en {stat.count} blocs\n")
+            for line in stat.traceback.format():
+                f.write(f"    {line}\n")
+
+@contextmanager
+def profile_stage(stage, mode=None, output_dir=None):
+    """
+    Profile le bloc with si le profilage est activé (sinon, ne fait rien).
+
+    Args:
+        stage (str): Nom de l'étape, utilisé dans le nom des fichiers.
+        mode (str): Modes séparés par des virgules parmi 'cprofile', 'sample' et 'memory'
+            (par défaut, la variable d'environnement CARTO_PROFILE).
+        output_dir (str): Répertoire des fichiers (par défaut, CARTO_PROFILE_DIR, CARTO_METRICS_DIR ou '.').
+    """
+    modes = {value.strip() for value in (mode or os.environ.get('CARTO_PROFILE', '')).lower().split(',')}
+    if {'cprofile', 'sample'} <= modes:
+        print(f"Avertissement : profils cprofile et sample demandés pour l'étape {stage}, seul cprofile est utilisé.")
+        modes.discard('sample')
+    mode = 'cprofile' if 'cprofile' in modes else 'sample' if 'sample' in modes else None
+    memory = 'memory' in modes
+    if mode is None and not memory:
+        yield
+        return
+
+    output_dir = output_dir or os.environ.get('CARTO_PROFILE_DIR') or os.environ.get('CARTO_METRICS_DIR', '.')
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f'profile_{stage}')
+
+    tracemalloc_started = memory and not tracemalloc.is_tracing()
+    if tracemalloc_started:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    if memory:
+        tracemalloc.reset_peak()
+        start_snapshot = tracemalloc.take_snapshot()
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif mode == 'sample':
+        profiler = SamplingProfiler(float(os.environ.get('CARTO_PROFILE_INTERVAL', '0.005')))
+        profiler.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if mode == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(base + '.prof')
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(50)
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(report.getvalue())
+        elif mode == 'sample':
+            profiler.stop()
+            profiler.write_collapsed(base + '.collapsed')
+            profiler.write_flamegraph(base + '.svg', f"{stage} ({elapsed:.1f} s)")
+
+        if memory:
+            write_memory_report(start_snapshot, tracemalloc.take_snapshot(), os.path.join(output_dir, f'memory_{stage}.txt'))
+        if tracemalloc_started:
+            tracemalloc.stop()
+        print(f"Profil de l'étape {stage} ({', '.join(sorted(modes & {'cprofile', 'sample', 'memory'}))}, {elapsed:.1f} s) écrit dans {output_dir}")
@@ -0,0 +1,245 @@
+import argparse
+import gzip
+import json
+import os
+import time
+
+""" Lecture et écriture des fichiers de projets au format {"number_of_projects": N, "projects": [...]}.
+
+    Deux formats sont reconnus d'après l'extension du fichier :
+    - .json : le format historique, un document JSON (indenté par défaut) ;
+    - .jsonl.gz : le format compact d'échange entre les étapes, un projet JSON par ligne compressé en gzip.
+    Les fonctions de ce module choisissent le format automatiquement, et permettent de lire et d'écrire
+    en flux, sans charger l'ensemble des projets en mémoire. """
+
+COMPACT_EXTENSION = '.jsonl.gz'
+
+def is_compact(file_path):
+    """
+    Indique si un fichier utilise le format compact.
+
+    Args:
+        file_path (str): Chemin du fichier.
+
+    Returns:
+        bool: True pour un fichier .jsonl.gz.
+    """
+    return file_path.endswith(COMPACT_EXTENSION)
+
+class ProjectStreamWriter:
+    def __init__(self, file_path):
+        """
+        Ouvre un fichier de projets en écriture. Les projets sont écrits un par un,
+        le nombre de projets est ajouté à la fermeture du fichier (format .json uniquement).
+
+        Args:
+            file_path (str): Chemin du fichier de sortie (.json ou .jsonl.gz).
+        """
+        self.file_path = file_path
+        self.compact = is_compact(file_path)
+        if self.compact:
+            # Niveau de compression faible : l'écriture reste rapide et le gain de taille est déjà important
+            self.file = gzip.open(file_path, 'wt', encoding='utf-8', compresslevel=5)
+        else:
+            self.file = open(file_path, 'w', encoding='utf-8')
+            self.file.write('{"projects": [')
+        self.count = 0
+
+    def write(self, project):
+        """
+        Écrit un projet dans le fichier.
+
+        Args:
+            project (dict): Projet à écrire.
+        """
+        if self.compact:
+            self.file.write(json.dumps(project, ensure_ascii=False, separators=(',', ':')))
+            self.file.write('\n')
+        else:
+            if self.count:
+                self.file.write(',')
+            self.file.write('\n')
+            json.dump(project, self.file, ensure_ascii=False)
+        self.count += 1
+
+    def close(self):
+        """
+        Termine la liste des projets, écrit le nombre de projets et ferme le fichier.
+        """
+        if self.file.closed:
+            return
+        if not self.compact:
+            self.file.write(f'\n], "number_of_projects": {self.count}}}\n')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def iter_projects(file_path, chunk_size=1 << 16):
+    """
+    Parcourt en flux les projets d'un fichier de projets.
+
+    Args:
+        file_path (str): Chemin du fichier (.json contenant une clé "projects", ou .jsonl.gz).
+        chunk_size (int): Taille des blocs lus dans un fichier .json.
+
+    Yields:
+        dict: Chaque projet du fichier, dans l'ordre.
+    """
+    if is_compact(file_path):
+        with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        # Se positionner juste après le crochet ouvrant de la liste "projects"
+        while True:
+            chunk = f.read(chunk_size)
+            buffer += chunk
+            key_index = buffer.find('"projects"')
+            if key_index != -1:
+                list_index = buffer.find('[', key_index)
+                if list_index != -1:
+                    buffer = buffer[list_index + 1:]
+                    break
+            if not chunk:
+                return
+
+        position = 0
+        while True:
+            # Ignorer les espaces et virgules entre deux projets
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                project, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield project
+            position = end
+            if position > chunk_size:
+                buffer = buffer[position:]
+                position = 0
+
+def load_projects_file(file_path):
+    """
+    Charge entièrement un fichier de projets, quel que soit son format.
+
+    Args:
+        file_path (str): Chemin du fichier (.json ou .jsonl.gz).
+
+    Returns:
+        dict: Données au format {"number_of_projects": N, "projects": [...]} (pour un .json, le document tel quel).
+    """
+    if is_compact(file_path):
+        # Un seul appel au décodeur JSON est bien plus rapide qu'un appel par ligne ;
+        # les lignes vides (fin de fichier, fins de ligne CRLF) sont ignorées comme dans iter_projects
+        with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+            lines = [line for line in f.read().splitlines() if line.strip()]
+        projects = json.loads('[' + ','.join(lines) + ']')
+        return {"number_of_projects": len(projects), "projects": projects}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_projects_file(data, file_path, indent=4):
+    """
+    Sauvegarde des données de projets, dans le format correspondant à l'extension du fichier.
+
+    Args:
+        data (dict): Données contenant une clé "projects".
+        file_path (str): Chemin du fichier (.json ou .jsonl.gz).
+        indent (int): Indentation du format .json (None pour un fichier sur une ligne).
+    """
+    if is_compact(file_path):
+        with ProjectStreamWriter(file_path) as writer:
+            for project in data["projects"]:
+                writer.write(project)
+        return
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+
+def convert(source_file, target_file):
+    """
+    Convertit en flux un fichier de projets d'un format à l'autre (d'après les extensions).
+
+    Args:
+        source_file (str): Fichier source (.json ou .jsonl.gz).
+        target_file (str): Fichier cible (.json ou .jsonl.gz).
+
+    Returns:
+        int: Nombre de projets convertis.
+    """
+    with ProjectStreamWriter(target_file) as writer:
+        for project in iter_projects(source_file):
+            writer.write(project)
+        return writer.count
+
+def benchmark(source_file, work_dir='.'):
+    """
+    Compare la taille et le temps d'écriture et de chargement d'un fichier de projets
+    au format .json indenté (historique), .json compact et .jsonl.gz.
+
+    Args:
+        source_file (str): Fichier de projets de référence (.json ou .jsonl.gz).
+        work_dir (str): Répertoire où écrire les fichiers de test.
+
+    Returns:
+        dict: Résultats par format : taille en octets, temps d'écriture et de chargement en secondes.
+    """
+    data = load_projects_file(source_file)
+    base_name = os.path.join(work_dir, 'benchmark_projects')
+    variants = {
+        'json_indent': (base_name + '_indent.json', 4),
+        'json_compact': (base_name + '_compact.json', None),
+        'jsonl_gz': (base_name + COMPACT_EXTENSION, None),
+    }
+    results = {}
+    for name, (file_path, indent) in variants.items():
+        start = time.perf_counter()
+        save_projects_file(data, file_path, indent=indent)
+        write_time = time.perf_counter() - start
+        start = time.perf_counter()
+        load_projects_file(file_path)
+        load_time = time.perf_counter() - start
+        results[name] = {
+            "size_bytes": os.path.getsize(file_path),
+            "write_seconds": round(write_time, 4),
+            "load_seconds": round(load_time, 4),
+        }
+        os.remove(file_path)
+    return results
+
+def main():
+    """
+    Point d'entrée en ligne de commande : conversion entre formats et mesure des performances.
+    """
+    parser = argparse.ArgumentParser(description="Conversion et comparaison des formats de fichiers de projets.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help="Convertit un fichier .json en .jsonl.gz ou inversement.")
+    convert_parser.add_argument('source')
+    convert_parser.add_argument('target')
+    benchmark_parser = subparsers.add_parser('benchmark', help="Compare taille et temps de chargement des formats.")
+    benchmark_parser.add_argument('source')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        count = convert(args.source, args.target)
+        print(f"{count} projets convertis de {args.source} vers {args.target}.")
+    else:
+        print(json.dumps(benchmark(args.source), indent=4))
+
+if __name__ == "__main__":
+    main()
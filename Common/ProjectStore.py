@@ -0,0 +1,415 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+from Common.ProjectIO import ProjectStreamWriter, iter_projects
+from Common.RepoUrl import canonical_repo_key
+
+""" Stockage persistant de projets avec accès direct par URL de dépôt ou par identifiant (hal_id, github_id, sh_id).
+
+    Les projets sont ajoutés à la fin d'un fichier d'enregistrements (un projet JSON par ligne).
+    Chaque champ indexé dispose d'une table de hachage sur disque (adressage ouvert, sondage linéaire),
+    projetée en mémoire avec mmap : une recherche ou un test d'existence ne lit qu'une case de l'index
+    et un enregistrement, sans désérialiser l'ensemble des projets.
+    Remplacer un projet ajoute une nouvelle version à la fin du fichier : compact réécrit le fichier
+    avec la dernière version de chaque projet, quand needs_compaction constate qu'il a trop grossi. """
+
+INDEX_MAGIC = b'PIDX'
+INDEX_VERSION = 1
+HEADER = struct.Struct('<4sIQQ')  # magic, version, capacité, nombre d'entrées
+SLOT = struct.Struct('<QQ')  # empreinte 64 bits, position de l'enregistrement + 1 (0 = case vide)
+INITIAL_CAPACITY = 1024
+MAX_LOAD_FACTOR = 0.6
+# Nombre maximal de versions enregistrées par projet avant de compacter le fichier d'enregistrements
+COMPACTION_RATIO = 2
+
+DEFAULT_FIELDS = ('url', 'hal_id', 'github_id', 'sh_id')
+
+def field_key(field, value):
+    """
+    Calcule la clé d'indexation d'une valeur : clé canonique du dépôt pour "url", la valeur en texte sinon.
+
+    Args:
+        field (str): Nom du champ indexé.
+        value: Valeur recherchée.
+
+    Returns:
+        str: Clé d'indexation, ou None si la valeur est vide.
+    """
+    if value is None or value == '':
+        return None
+    if field == 'url':
+        return canonical_repo_key(value)
+    return str(value)
+
+def project_field_key(project, field):
+    """
+    Calcule la clé d'indexation d'un projet pour un champ donné.
+
+    Args:
+        project (dict): Projet.
+        field (str): Nom du champ indexé ("url" désigne softCodeRepository, ou repo_url pour les informations GitHub).
+
+    Returns:
+        str: Clé d'indexation, ou None si le projet n'a pas ce champ.
+    """
+    if field == 'url':
+        return field_key(field, project.get('softCodeRepository') or project.get('repo_url'))
+    return field_key(field, project.get(field))
+
+def key_hash(key):
+    """
+    Calcule l'empreinte 64 bits non nulle d'une clé.
+    """
+    value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+class HashIndex:
+    def __init__(self, file_path):
+        """
+        Ouvre (ou crée) un index sur disque projeté en mémoire.
+
+        Args:
+            file_path (str): Chemin du fichier d'index.
+        """
+        self.file_path = file_path
+        if not os.path.exists(file_path):
+            self.create(file_path, INITIAL_CAPACITY)
+        self.open()
+
+    @staticmethod
+    def create(file_path, capacity):
+        with open(file_path, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, capacity, 0))
+            f.truncate(HEADER.size + capacity * SLOT.size)
+
+    def open(self):
+        self.file = open(self.file_path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, version, self.capacity, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Fichier d'index invalide : {self.file_path}")
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def slots(self, key):
+        """
+        Parcourt les cases candidates pour une clé (sondage linéaire à partir de son empreinte).
+
+        Yields:
+            tuple: (numéro de case, empreinte stockée, position stockée + 1).
+        """
+        digest = key_hash(key)
+        slot = digest % self.capacity
+        for _ in range(self.capacity):
+            stored_hash, stored_offset = SLOT.unpack_from(self.map, HEADER.size + slot * SLOT.size)
+            yield slot, digest, stored_hash, stored_offset
+            if stored_offset == 0:
+                return
+            slot = (slot + 1) % self.capacity
+
+    def lookup(self, key, matches):
+        """
+        Recherche les positions d'enregistrements candidates pour une clé.
+
+        Args:
+            key (str): Clé recherchée.
+            matches (callable): Fonction vérifiant qu'un enregistrement (par sa position) correspond bien à la clé,
+                pour écarter les collisions d'empreintes.
+
+        Returns:
+            int: Position de l'enregistrement, ou None.
+        """
+        for _, digest, stored_hash, stored_offset in self.slots(key):
+            if stored_offset == 0:
+                return None
+            if stored_hash == digest and matches(stored_offset - 1):
+                return stored_offset - 1
+        return None
+
+    def insert(self, key, offset, matches):
+        """
+        Associe une clé à la position d'un enregistrement (remplace l'association existante).
+
+        Args:
+            key (str): Clé.
+            offset (int): Position de l'enregistrement dans le fichier d'enregistrements.
+            matches (callable): Voir lookup.
+
+        Returns:
+            bool: True si la clé était nouvelle.
+        """
+        if (self.count + 1) > self.capacity * MAX_LOAD_FACTOR:
+            self.grow()
+        for slot, digest, stored_hash, stored_offset in self.slots(key):
+            if stored_offset == 0 or (stored_hash == digest and matches(stored_offset - 1)):
+                SLOT.pack_into(self.map, HEADER.size + slot * SLOT.size, digest, offset + 1)
+                if stored_offset == 0:
+                    self.count += 1
+                    HEADER.pack_into(self.map, 0, INDEX_MAGIC, INDEX_VERSION, self.capacity, self.count)
+                    return True
+                return False
+        raise RuntimeError("Index plein")
+
+    def grow(self):
+        """
+        Double la capacité de l'index en recopiant les entrées dans un nouveau fichier.
+        Les empreintes sont conservées, il n'est donc pas nécessaire de relire les enregistrements.
+        """
+        new_capacity = self.capacity * 2
+        entries = []
+        for slot in range(self.capacity):
+            stored_hash, stored_offset = SLOT.unpack_from(self.map, HEADER.size + slot * SLOT.size)
+            if stored_offset:
+                entries.append((stored_hash, stored_offset))
+        self.close()
+
+        temp_path = self.file_path + '.tmp'
+        self.create(temp_path, new_capacity)
+        with open(temp_path, 'r+b') as f:
+            new_map = mmap.mmap(f.fileno(), 0)
+            for stored_hash, stored_offset in entries:
+                slot = stored_hash % new_capacity
+                while SLOT.unpack_from(new_map, HEADER.size + slot * SLOT.size)[1]:
+                    slot = (slot + 1) % new_capacity
+                SLOT.pack_into(new_map, HEADER.size + slot * SLOT.size, stored_hash, stored_offset)
+            HEADER.pack_into(new_map, 0, INDEX_MAGIC, INDEX_VERSION, new_capacity, len(entries))
+            new_map.flush()
+            new_map.close()
+        os.replace(temp_path, self.file_path)
+        self.open()
+
+class ProjectStore:
+    def __init__(self, store_dir, fields=DEFAULT_FIELDS):
+        """
+        Ouvre (ou crée) un stockage de projets.
+
+        Args:
+            store_dir (str): Répertoire du stockage.
+            fields (tuple): Champs indexés ("url", "hal_id", "github_id", "sh_id"...).
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.fields = fields
+        self.records_path = os.path.join(store_dir, 'records.jsonl')
+        self.meta_path = os.path.join(store_dir, 'meta.json')
+        self.records = open(self.records_path, 'a+b')
+        self.indexes = {field: HashIndex(os.path.join(store_dir, f'index_{field}.bin')) for field in fields}
+
+    def close(self):
+        """
+        Ferme le fichier d'enregistrements et les index.
+        """
+        self.records.close()
+        for index in self.indexes.values():
+            index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_empty(self):
+        return os.path.getsize(self.records_path) == 0
+
+    def read_meta(self):
+        """
+        Lit les métadonnées du stockage (ex. le fichier de projets dont il est la source).
+
+        Returns:
+            dict: Métadonnées, vide si elles n'ont jamais été écrites.
+        """
+        if not os.path.exists(self.meta_path):
+            return {}
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_meta(self, meta):
+        """
+        Remplace les métadonnées du stockage.
+
+        Args:
+            meta (dict): Métadonnées (sérialisables en JSON).
+        """
+        with open(self.meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+
+    def reset_indexes(self):
+        for index in self.indexes.values():
+            index.close()
+            HashIndex.create(index.file_path, INITIAL_CAPACITY)
+            index.open()
+
+    def clear(self):
+        """
+        Vide le stockage : supprime les enregistrements, les index et les métadonnées.
+        """
+        self.records.truncate(0)
+        self.reset_indexes()
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+    def read_record(self, offset):
+        """
+        Lit l'enregistrement situé à une position du fichier d'enregistrements.
+
+        Args:
+            offset (int): Position de l'enregistrement.
+
+        Returns:
+            dict: Projet.
+        """
+        self.records.seek(offset)
+        return json.loads(self.records.readline())
+
+    def put(self, project):
+        """
+        Ajoute (ou remplace) un projet. Les index pointent ensuite vers cette nouvelle version.
+
+        Args:
+            project (dict): Projet à stocker.
+        """
+        self.records.seek(0, os.SEEK_END)
+        offset = self.records.tell()
+        self.records.write(json.dumps(project, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.records.flush()
+        for field, index in self.indexes.items():
+            key = project_field_key(project, field)
+            if key is not None:
+                index.insert(key, offset, lambda stored, field=field, key=key: project_field_key(self.read_record(stored), field) == key)
+
+    def get(self, field, value):
+        """
+        Recherche un projet par URL de dépôt ou par identifiant.
+
+        Args:
+            field (str): Champ indexé ("url", "hal_id", "github_id", "sh_id").
+            value: Valeur recherchée (une URL quelconque du dépôt pour "url").
+
+        Returns:
+            dict: Dernière version du projet, ou None.
+        """
+        key = field_key(field, value)
+        if key is None:
+            return None
+        offset = self.indexes[field].lookup(key, lambda stored: project_field_key(self.read_record(stored), field) == key)
+        if offset is None:
+            return None
+        project = self.read_record(offset)
+        if field != 'url' and 'url' in self.indexes:
+            # Une version plus récente du même dépôt a pu perdre cet identifiant : on renvoie la version courante
+            url_key = project_field_key(project, 'url')
+            if url_key is not None:
+                current = self.indexes['url'].lookup(url_key, lambda stored: project_field_key(self.read_record(stored), 'url') == url_key)
+                if current is not None and current != offset:
+                    project = self.read_record(current)
+        return project
+
+    def contains(self, field, value):
+        """
+        Indique si un projet est présent pour une URL de dépôt ou un identifiant.
+        """
+        return self.get(field, value) is not None
+
+    def iter_projects(self):
+        """
+        Parcourt la dernière version de chaque projet, dans l'ordre d'ajout.
+        Une version est ignorée si l'index "url" (ou, à défaut, le premier champ renseigné) désigne une version plus récente.
+
+        Yields:
+            dict: Projet.
+        """
+        self.records.seek(0)
+        offset = 0
+        for line in iter(self.records.readline, b''):
+            project = json.loads(line)
+            current = True
+            for field, index in self.indexes.items():
+                key = project_field_key(project, field)
+                if key is not None:
+                    current = index.lookup(key, lambda stored: project_field_key(self.read_record(stored), field) == key) == offset
+                    self.records.seek(offset + len(line))
+                    break
+            if current:
+                yield project
+            offset += len(line)
+
+    def needs_compaction(self, max_ratio=COMPACTION_RATIO):
+        """
+        Indique si le fichier d'enregistrements contient plus de max_ratio versions par projet en moyenne.
+
+        Returns:
+            bool: True si compact libérerait une part importante du fichier.
+        """
+        projects = max((index.count for index in self.indexes.values()), default=0)
+        self.records.seek(0)
+        versions = sum(chunk.count(b'\n') for chunk in iter(lambda: self.records.read(1 << 20), b''))
+        return versions > max_ratio * max(projects, 1)
+
+    def compact(self):
+        """
+        Réécrit le fichier d'enregistrements avec la dernière version de chaque projet, puis reconstruit les index.
+
+        Returns:
+            int: Nombre de projets conservés.
+        """
+        temp_path = self.records_path + '.tmp'
+        count = 0
+        with open(temp_path, 'wb') as f:
+            for project in self.iter_projects():
+                f.write(json.dumps(project, ensure_ascii=False).encode('utf-8') + b'\n')
+                count += 1
+        self.records.close()
+        os.replace(temp_path, self.records_path)
+        self.records = open(self.records_path, 'a+b')
+
+        self.reset_indexes()
+        self.records.seek(0)
+        offset = 0
+        for line in iter(self.records.readline, b''):
+            project = json.loads(line)
+            for field, index in self.indexes.items():
+                key = project_field_key(project, field)
+                if key is not None:
+                    index.insert(key, offset, lambda stored, field=field, key=key: project_field_key(self.read_record(stored), field) == key)
+            offset += len(line)
+            self.records.seek(offset)
+        return count
+
+    def import_file(self, file_path):
+        """
+        Ajoute au stockage tous les projets d'un fichier de projets (.json ou .jsonl.gz).
+
+        Args:
+            file_path (str): Chemin du fichier.
+
+        Returns:
+            int: Nombre de projets ajoutés.
+        """
+        count = 0
+        for project in iter_projects(file_path):
+            self.put(project)
+            count += 1
+        return count
+
+    def export_file(self, file_path):
+        """
+        Écrit la dernière version de chaque projet dans un fichier de projets (.json ou .jsonl.gz).
+
+        Args:
+            file_path (str): Chemin du fichier de sortie.
+
+        Returns:
+            int: Nombre de projets écrits.
+        """
+        with ProjectStreamWriter(file_path) as writer:
+            for project in self.iter_projects():
+                writer.write(project)
+            return writer.count
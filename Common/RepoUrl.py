@@ -0,0 +1,50 @@
+import hashlib
+from urllib.parse import urlsplit
+
+""" Normalisation des URLs de dépôts de code, pour comparer et dédoublonner les projets issus de sources différentes. """
+
+def normalize_repo_url(url):
+    """
+    Normalise l'URL d'un dépôt de code : espaces, schéma en https, hôte en minuscules sans "www.",
+    sans identifiants, paramètres, ancre, barre finale ni suffixe .git.
+
+    Args:
+        url (str): URL du dépôt de code.
+
+    Returns:
+        str: URL normalisée, ou chaîne vide si l'URL est vide.
+    """
+    url = (url or '').strip()
+    if not url:
+        return ''
+    if '://' not in url:
+        url = 'https://' + url
+    parts = urlsplit(url)
+    host = parts.netloc.rsplit('@', 1)[-1].lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parts.path.rstrip('/')
+    if path.endswith('.git'):
+        path = path[:-4]
+    return f"https://{host}{path}"
+
+# Forges dont les chemins de dépôts ne sont pas sensibles à la casse
+CASE_INSENSITIVE_FORGES = ('github.com', 'bitbucket.org')
+
+def canonical_repo_key(url):
+    """
+    Calcule la clé canonique d'un dépôt : son URL normalisée, en minuscules pour les forges
+    insensibles à la casse, réduite à une empreinte SHA-1.
+
+    Args:
+        url (str): URL du dépôt de code.
+
+    Returns:
+        str: Empreinte hexadécimale de l'URL canonique, ou None si l'URL est vide.
+    """
+    normalized = normalize_repo_url(url)
+    if not normalized:
+        return None
+    if normalized.split('/')[2] in CASE_INSENSITIVE_FORGES:
+        normalized = normalized.lower()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
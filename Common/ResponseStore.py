@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics
+
+""" Stockage persistant des réponses des API, partagé par les collecteurs GitHub.
+
+    GitJSON, GitOwnersRepoJSON et GitOwnersRepoInfoJSON demandent souvent les mêmes dépôts (/repos/{owner}/{name})
+    au cours d'une même mise à jour. Les réponses sont conservées dans une base SQLite, indexées par l'URL canonique
+    de l'appel, et réutilisées tant qu'elles ont moins de ttl secondes : chaque dépôt n'est demandé qu'une fois
+    par mise à jour, quel que soit le script qui le demande en premier.
+    Seules les réponses 200 et 404 sont conservées (les erreurs temporaires et limites de taux ne le sont pas) ;
+    une réponse 404 ne reste valable que negative_ttl secondes, un dépôt pouvant être créé ou rendu public entre-temps.
+    Les réponses sont rangées par portée (identité du pool de jetons, voir TokenPool.identity) : une réponse obtenue
+    avec un jeton n'est pas resservie à un collecteur utilisant d'autres jetons, dont les droits d'accès diffèrent.
+    Le nombre d'appels évités est affiché à la fermeture et cumulé dans la base.
+
+    Base : CARTO_RESPONSE_STORE (par défaut github_responses.db à la racine du dépôt).
+    Durée de fraîcheur : CARTO_RESPONSE_TTL, en secondes (par défaut 12 heures, soit la durée d'une mise à jour),
+    et CARTO_RESPONSE_NEGATIVE_TTL pour les réponses 404 (par défaut 15 minutes).
+
+    Utilisation :
+        python Common/ResponseStore.py stats
+        python Common/ResponseStore.py purge """
+
+DEFAULT_STORE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'github_responses.db')
+DEFAULT_TTL = 12 * 3600
+DEFAULT_NEGATIVE_TTL = 15 * 60
+CACHEABLE_STATUS = (200, 404)
+# En-têtes conservés avec le corps de la réponse
+KEPT_HEADERS = ('Link', 'ETag', 'Last-Modified')
+
+def canonical_api_url(url, params=None):
+    """
+    Calcule l'URL canonique d'un appel d'API : hôte en minuscules, chemin sans barre finale (en minuscules pour
+    api.github.com, dont les noms sont insensibles à la casse), paramètres triés.
+
+    Args:
+        url (str): URL de l'appel.
+        params (dict): Paramètres de la requête (ajoutés à ceux de l'URL).
+
+    Returns:
+        str: URL canonique.
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    path = parts.path.rstrip('/') or '/'
+    if host == 'api.github.com':
+        path = path.lower()
+    query = parse_qsl(parts.query) + [(key, str(value)) for key, value in (params or {}).items()]
+    return f"{parts.scheme.lower()}://{host}{path}" + (f"?{urlencode(sorted(query))}" if query else '')
+
+def response_key(url, params=None, scope=None):
+    """
+    Calcule la clé d'une réponse conservée : URL canonique de l'appel, précédée de sa portée.
+
+    Args:
+        url (str): URL de l'appel.
+        params (dict): Paramètres de la requête.
+        scope (str): Portée de la réponse (ex. TokenPool.identity), None pour une réponse publique.
+
+    Returns:
+        str: Clé de la réponse.
+    """
+    key = canonical_api_url(url, params)
+    return f"{scope} {key}" if scope else key
+
+class CachedResponse:
+    """
+    Réponse lue dans le stockage, avec l'interface de requests.Response utilisée par les collecteurs.
+    """
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = True
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} (réponse conservée)", response=self)
+
+class ResponseStore:
+    def __init__(self, db_file=None, ttl=None, negative_ttl=None):
+        """
+        Ouvre (ou crée) le stockage des réponses.
+        Args:
+            db_file (str): Fichier SQLite (par défaut, CARTO_RESPONSE_STORE ou DEFAULT_STORE_FILE).
+            ttl (float): Durée de fraîcheur des réponses, en secondes (par défaut, CARTO_RESPONSE_TTL ou DEFAULT_TTL).
+            negative_ttl (float): Durée de fraîcheur des réponses 404, en secondes
+                (par défaut, CARTO_RESPONSE_NEGATIVE_TTL ou DEFAULT_NEGATIVE_TTL).
+        """
+        self.db_file = db_file or os.environ.get('CARTO_RESPONSE_STORE', DEFAULT_STORE_FILE)
+        self.ttl = ttl if ttl is not None else float(os.environ.get('CARTO_RESPONSE_TTL', DEFAULT_TTL))
+        self.negative_ttl = negative_ttl if negative_ttl is not None else float(os.environ.get('CARTO_RESPONSE_NEGATIVE_TTL', DEFAULT_NEGATIVE_TTL))
+        self.lock = threading.Lock()
+        self.saved_calls = 0
+        # Plusieurs collecteurs peuvent utiliser la base en même temps (processus du pipeline)
+        self.conn = sqlite3.connect(self.db_file, timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS Response
+                             (Url TEXT PRIMARY KEY, Status INTEGER, Headers TEXT, Body BLOB, Fetched_At REAL)''')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS Stats (Name TEXT PRIMARY KEY, Value INTEGER)')
+        self.conn.commit()
+
+    def lookup(self, url, params=None, scope=None):
+        """
+        Retourne la réponse conservée pour un appel si elle est encore fraîche.
+        Args:
+            url (str): URL de l'appel.
+            params (dict): Paramètres de la requête.
+            scope (str): Portée de la réponse (voir response_key).
+        Returns:
+            CachedResponse: Réponse conservée, ou None.
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT Status, Headers, Body, Fetched_At FROM Response WHERE Url = ?',
+                                    (response_key(url, params, scope),)).fetchone()
+        if row is None or time.time() - row[3] > (self.ttl if row[0] == 200 else self.negative_ttl):
+            return None
+        return CachedResponse(row[0], json.loads(row[1]), row[2])
+
+    def store(self, url, response, params=None, scope=None):
+        """
+        Conserve une réponse si son code de retour le permet.
+        Args:
+            url (str): URL de l'appel.
+            response (requests.Response): Réponse obtenue.
+            params (dict): Paramètres de la requête.
+            scope (str): Portée de la réponse (voir response_key).
+        """
+        if response.status_code not in CACHEABLE_STATUS:
+            return
+        headers = {key: response.headers[key] for key in KEPT_HEADERS if key in response.headers}
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO Response (Url, Status, Headers, Body, Fetched_At) VALUES (?, ?, ?, ?, ?)',
+                              (response_key(url, params, scope), response.status_code, json.dumps(headers), response.content, time.time()))
+            self.conn.commit()
+
+    def fetch(self, url, request, params=None, scope=None):
+        """
+        Retourne la réponse conservée pour un appel, ou effectue l'appel et conserve sa réponse.
+        Args:
+            url (str): URL de l'appel.
+            request (callable): Fonction sans argument qui effectue l'appel et retourne la réponse.
+            params (dict): Paramètres de la requête (pour la clé ; request doit les transmettre lui-même).
+            scope (str): Portée de la réponse, ex. l'identité du pool de jetons qui effectue l'appel (voir response_key).
+        Returns:
+            requests.Response | CachedResponse: Réponse.
+        """
+        cached = self.lookup(url, params, scope)
+        Metrics.cache_lookup('responses', hit=cached is not None)
+        if cached is not None:
+            with self.lock:
+                self.saved_calls += 1
+            return cached
+        response = request()
+        self.store(url, response, params, scope)
+        return response
+
+    def purge(self):
+        """
+        Supprime les réponses qui ne sont plus fraîches.
+        Returns:
+            int: Nombre de réponses supprimées.
+        """
+        with self.lock:
+            deleted = self.conn.execute('DELETE FROM Response WHERE Fetched_At < ? OR (Status != 200 AND Fetched_At < ?)',
+                                        (time.time() - self.ttl, time.time() - self.negative_ttl)).rowcount
+            self.conn.commit()
+        return deleted
+
+    def stats(self):
+        """
+        Returns:
+            dict: Nombre de réponses conservées, de réponses fraîches, et d'appels évités (session et cumul).
+        """
+        with self.lock:
+            total, fresh = self.conn.execute('SELECT COUNT(*), SUM(Fetched_At >= (CASE Status WHEN 200 THEN ? ELSE ? END)) FROM Response',
+                                             (time.time() - self.ttl, time.time() - self.negative_ttl)).fetchone()
+            row = self.conn.execute("SELECT Value FROM Stats WHERE Name = 'saved_calls'").fetchone()
+        return {"responses": total, "fresh_responses": fresh or 0, "saved_calls": self.saved_calls,
+                "saved_calls_total": (row[0] if row else 0) + self.saved_calls}
+
+    def close(self):
+        """
+        Cumule les appels évités dans la base, les affiche et ferme la base.
+        """
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO Stats (Name, Value) VALUES ('saved_calls', 0)")
+            self.conn.execute("UPDATE Stats SET Value = Value + ? WHERE Name = 'saved_calls'", (self.saved_calls,))
+            self.conn.commit()
+            self.conn.close()
+        print(f"{self.saved_calls} appels d'API évités grâce aux réponses conservées ({self.db_file}).")
+        self.saved_calls = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stockage persistant des réponses des API.")
+    parser.add_argument('command', choices=['stats', 'purge'])
+    parser.add_argument('--db-file', default=None)
+    args = parser.parse_args()
+
+    store = ResponseStore(args.db_file)
+    if args.command == 'purge':
+        print(f"{store.purge()} réponses périmées supprimées.")
+    print(json.dumps(store.stats(), indent=4))
+    store.close()
+
+if __name__ == "__main__":
+    main()
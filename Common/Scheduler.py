@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics
+
+""" Planification des mises à jour d'après l'ancienneté des enregistrements (dépôts GitHub, origines Software Heritage).
+
+    Pour chaque enregistrement, le planificateur conserve la date de sa dernière collecte, le dernier signal de
+    changement observé (pushed_at de GitHub, date de visite de Software Heritage, last_activity_at de GitLab) et
+    la date de ce changement, ainsi qu'un intervalle de revisite :
+    - à la première observation, l'intervalle est une fraction (AGE_FACTOR) de l'ancienneté du dernier changement :
+      un dépôt inactif depuis des années est revisité rarement, un dépôt modifié hier l'est vite ;
+    - si le signal n'a pas changé à la collecte suivante, l'intervalle double (jusqu'à max_interval) ;
+    - s'il a changé, l'intervalle revient à min_interval.
+    Une mise à jour collecte toujours les enregistrements nouveaux, puis dépense son budget sur les enregistrements
+    dus les plus en retard (temps écoulé depuis la collecte / intervalle) ; les autres reprennent la collecte précédente.
+
+    Base : CARTO_SCHEDULE (par défaut refresh_schedule.db à la racine du dépôt).
+
+    Utilisation :
+        python Common/Scheduler.py stats """
+
+DEFAULT_SCHEDULE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'refresh_schedule.db')
+MIN_INTERVAL = 12 * 3600
+MAX_INTERVAL = 120 * 86400
+GROWTH = 2.0
+AGE_FACTOR = 0.25
+
+def parse_time(value):
+    """
+    Convertit une date ISO 8601 (ex. "2024-03-01T12:00:00Z") en horodatage.
+
+    Args:
+        value (str): Date.
+
+    Returns:
+        float: Horodatage en secondes, ou None si la date est absente ou invalide.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed.timestamp()
+
+class RefreshScheduler:
+    def __init__(self, source, db_file=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, growth=GROWTH):
+        """
+        Ouvre (ou crée) la planification d'une source.
+        Args:
+            source (str): Nom de la source (ex. "github_repos", "sh_origins").
+            db_file (str): Fichier SQLite (par défaut, CARTO_SCHEDULE ou DEFAULT_SCHEDULE_FILE).
+            min_interval (float): Intervalle minimal entre deux collectes d'un enregistrement, en secondes.
+            max_interval (float): Intervalle maximal, en secondes.
+            growth (float): Facteur appliqué à l'intervalle quand l'enregistrement n'a pas changé.
+        """
+        self.source = source
+        self.db_file = db_file or os.environ.get('CARTO_SCHEDULE', DEFAULT_SCHEDULE_FILE)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.growth = growth
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_file, timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS Schedule
+                             (Source TEXT, Record_Key TEXT, Last_Fetched REAL, Signal TEXT, Last_Changed REAL, Interval REAL,
+                              PRIMARY KEY (Source, Record_Key))''')
+        self.conn.commit()
+
+    def clamp(self, interval):
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def records(self):
+        """
+        Returns:
+            dict: Clé -> (dernière collecte, intervalle) pour tous les enregistrements de la source.
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT Record_Key, Last_Fetched, Interval FROM Schedule WHERE Source = ?', (self.source,)).fetchall()
+        return {key: (last_fetched, interval) for key, last_fetched, interval in rows}
+
+    def observe(self, key, signal, changed_at=None, now=None):
+        """
+        Enregistre la collecte d'un enregistrement et ajuste son intervalle de revisite.
+        Args:
+            key (str): Clé de l'enregistrement (URL du dépôt, de l'origine...).
+            signal: Signal de changement observé (ex. pushed_at) ; toute différence avec le précédent est un changement.
+            changed_at (str): Date ISO 8601 du dernier changement, si la source la fournit (par défaut, maintenant).
+            now (float): Horodatage de la collecte (par défaut, maintenant).
+        """
+        with self.lock:
+            self.update(key, signal, changed_at, now or time.time())
+            self.conn.commit()
+
+    def seed(self, observations, now=None):
+        """
+        Enregistre d'un coup les enregistrements déjà collectés avant la mise en place du planificateur
+        (ex. présents dans la sortie précédente), sans les recollecter. Les clés déjà connues sont ignorées.
+        Args:
+            observations (iterable): Triplets (clé, signal, date ISO 8601 du dernier changement).
+            now (float): Horodatage de la collecte (par défaut, maintenant).
+        Returns:
+            int: Nombre d'enregistrements ajoutés.
+        """
+        known = self.records()
+        count = 0
+        with self.lock:
+            for key, signal, changed_at in observations:
+                if key and key not in known:
+                    self.update(key, signal, changed_at, now or time.time())
+                    count += 1
+            self.conn.commit()
+        return count
+
+    def update(self, key, signal, changed_at, now):
+        # Appelée avec le verrou ; la transaction est validée par l'appelant
+        signal = json.dumps(signal)
+        changed = min(parse_time(changed_at) or now, now)
+        row = self.conn.execute('SELECT Signal, Last_Changed, Interval FROM Schedule WHERE Source = ? AND Record_Key = ?',
+                                (self.source, key)).fetchone()
+        if row is None:
+            interval = self.clamp((now - changed) * AGE_FACTOR)
+        elif row[0] != signal:
+            interval = self.min_interval
+            Metrics.count('scheduler_changes_total', source=self.source)
+        else:
+            # Enregistrement inchangé : il sera revisité de plus en plus rarement
+            changed, interval = row[1], self.clamp(row[2] * self.growth)
+        self.conn.execute('INSERT OR REPLACE INTO Schedule (Source, Record_Key, Last_Fetched, Signal, Last_Changed, Interval) VALUES (?, ?, ?, ?, ?, ?)',
+                          (self.source, key, now, signal, changed, interval))
+
+    def plan(self, keys, budget=None, required=(), now=None):
+        """
+        Choisit les enregistrements à collecter lors de cette mise à jour.
+        Args:
+            keys (iterable): Clés de tous les enregistrements candidats.
+            budget (int): Nombre maximal d'enregistrements déjà connus à recollecter (None : tous ceux qui sont dus).
+            required (iterable): Clés à collecter en tout cas (ex. absentes de la collecte précédente).
+            now (float): Horodatage de référence (par défaut, maintenant).
+        Returns:
+            set: Clés à collecter : les clés nouvelles ou requises, puis les clés dues les plus en retard.
+        """
+        now = now or time.time()
+        records = self.records()
+        keys = [key for key in dict.fromkeys(keys) if key]
+        required = set(required)
+        selected = {key for key in keys if key in required or key not in records}
+        due = sorted(((now - records[key][0]) / records[key][1], key) for key in keys
+                     if key not in selected and now - records[key][0] >= records[key][1])
+        due.reverse()
+        refreshed = [key for overdue, key in (due if budget is None else due[:max(budget, 0)])]
+        selected.update(refreshed)
+
+        Metrics.count('scheduler_records_total', len(selected) - len(refreshed), source=self.source, decision='new')
+        Metrics.count('scheduler_records_total', len(refreshed), source=self.source, decision='refresh')
+        Metrics.count('scheduler_records_total', len(due) - len(refreshed), source=self.source, decision='deferred')
+        Metrics.count('scheduler_records_total', len(keys) - len(selected) - (len(due) - len(refreshed)), source=self.source, decision='fresh')
+        print(f"Planification {self.source} : {len(selected) - len(refreshed)} nouveaux, {len(refreshed)} à rafraîchir "
+              f"sur {len(due)} dus, {len(keys) - len(selected)} repris de la collecte précédente.")
+        return selected
+
+    def stats(self):
+        """
+        Returns:
+            dict: Par source, nombre d'enregistrements, intervalle médian en jours et nombre d'enregistrements dus.
+        """
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute('SELECT Source, Last_Fetched, Interval FROM Schedule').fetchall()
+        stats = {}
+        for source, last_fetched, interval in rows:
+            entry = stats.setdefault(source, {"records": 0, "due": 0, "intervals": []})
+            entry["records"] += 1
+            entry["due"] += now - last_fetched >= interval
+            entry["intervals"].append(interval)
+        for entry in stats.values():
+            intervals = sorted(entry.pop("intervals"))
+            entry["median_interval_days"] = round(intervals[len(intervals) // 2] / 86400, 2)
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Planification des mises à jour selon l'ancienneté des enregistrements.")
+    parser.add_argument('command', choices=['stats'])
+    parser.add_argument('--db-file', default=None)
+    args = parser.parse_args()
+
+    with RefreshScheduler('', args.db_file) as scheduler:
+        print(json.dumps(scheduler.stats(), indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import bisect
+import glob
+import hashlib
+import os
+
+""" Répartition d'une collecte entre plusieurs nœuds (machines ou processus) par hachage cohérent.
+
+    Chaque élément de travail (propriétaire GitHub, origine Software Heritage) est attribué au nœud qui le suit
+    sur un anneau de hachage où chaque nœud occupe VIRTUAL_NODES positions : les nœuds reçoivent des parts
+    équilibrées, et l'ajout ou le retrait d'un nœud ne déplace qu'environ 1/N des éléments (les états et
+    stockages de chaque nœud restent donc en grande partie valables d'une collecte à l'autre).
+
+    Chaque nœud collecte sa part avec ses propres jetons et écrit son propre fichier de partition
+    (partition_file) ; les partitions sont ensuite recombinées par JsonMerger (DB/ConcatenateJson.py,
+    merge_partitions), dans un ordre qui ne dépend ni du nombre de nœuds ni de la répartition. """
+
+VIRTUAL_NODES = 160
+
+def node_names(nodes):
+    """
+    Normalise la liste des nœuds.
+
+    Args:
+        nodes (int | str | list): Nombre de nœuds, noms séparés par des virgules, ou liste de noms.
+
+    Returns:
+        list: Noms des nœuds (node0, node1... pour un nombre).
+    """
+    if isinstance(nodes, int) or (isinstance(nodes, str) and nodes.isdigit()):
+        return [f"node{index}" for index in range(int(nodes))]
+    if isinstance(nodes, str):
+        nodes = nodes.split(',')
+    return [node.strip() for node in nodes if node.strip()]
+
+def ring_position(value):
+    return int.from_bytes(hashlib.sha1(value.encode('utf-8')).digest()[:8], 'big')
+
+class HashRing:
+    def __init__(self, nodes, virtual_nodes=VIRTUAL_NODES):
+        """
+        Construit l'anneau de hachage.
+
+        Args:
+            nodes (int | str | list): Nœuds (voir node_names).
+            virtual_nodes (int): Nombre de positions de chaque nœud sur l'anneau.
+        """
+        self.nodes = node_names(nodes)
+        if not self.nodes:
+            raise ValueError("Aucun nœud")
+        self.ring = sorted((ring_position(f"{node}#{index}"), node) for node in self.nodes for index in range(virtual_nodes))
+        self.positions = [position for position, node in self.ring]
+
+    def node_for(self, key):
+        """
+        Args:
+            key (str): Clé de l'élément (ex. propriétaire en minuscules, URL d'origine normalisée).
+
+        Returns:
+            str: Nœud chargé de l'élément.
+        """
+        index = bisect.bisect(self.positions, ring_position(key)) % len(self.ring)
+        return self.ring[index][1]
+
+    def owns(self, node, key):
+        return self.node_for(key) == node
+
+def split_extension(file_path):
+    if file_path.endswith('.jsonl.gz'):
+        return file_path[:-len('.jsonl.gz')], '.jsonl.gz'
+    return os.path.splitext(file_path)
+
+def partition_file(file_path, node):
+    """
+    Chemin du fichier de partition d'un nœud (ex. SH_CNRS.json -> SH_CNRS.part-node0.json).
+    Sert aussi à séparer les fichiers d'état et stockages des nœuds qui partagent un répertoire.
+
+    Args:
+        file_path (str): Fichier de sortie (ou d'état) de l'étape.
+        node (str): Nom du nœud.
+
+    Returns:
+        str: Chemin de la partition.
+    """
+    root, extension = split_extension(file_path)
+    return f"{root}.part-{node}{extension}"
+
+def partition_files(file_path):
+    """
+    Args:
+        file_path (str): Fichier de sortie de l'étape.
+
+    Returns:
+        list: Fichiers de partition existants, triés par nom.
+    """
+    root, extension = split_extension(file_path)
+    return sorted(glob.glob(f"{glob.escape(root)}.part-*{extension}"))
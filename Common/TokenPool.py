@@ -0,0 +1,219 @@
+import hashlib
+import threading
+import time
+
+from Common import Metrics
+
+""" Pool de jetons d'API GitHub partagé par les collecteurs.
+
+    Chaque jeton a son propre budget de requêtes (5000 par heure pour un jeton, 60 sans jeton).
+    Le pool suit le budget restant de chaque jeton d'après les en-têtes X-RateLimit-Remaining / X-RateLimit-Reset
+    des réponses, et envoie chaque requête au jeton qui a le plus de marge. Une requête n'attend que si tous
+    les jetons sont épuisés, et seulement jusqu'à la réinitialisation du premier d'entre eux : le débit
+    augmente donc linéairement avec le nombre de jetons. Le pool peut être partagé entre threads.
+    Une réponse de limite secondaire (Retry-After, ou message « secondary rate limit » alors que le budget
+    n'est pas épuisé) met le jeton de côté et la requête est rejouée, au lieu d'être traitée comme un refus d'accès.
+
+    Les collecteurs acceptent un jeton, une liste de jetons, une chaîne de jetons séparés par des virgules
+    (ex. variable d'environnement GITHUB_TOKEN="jeton1,jeton2") ou un TokenPool. """
+
+AUTHENTICATED_LIMIT = 5000
+ANONYMOUS_LIMIT = 60
+# Mise à l'écart d'un jeton qui a atteint la limite secondaire sans en-tête Retry-After (au moins une minute selon GitHub)
+SECONDARY_LIMIT_WAIT = 60
+
+def is_secondary_rate_limit(response):
+    """
+    Indique si une réponse 403 ou 429 signale la limite secondaire de GitHub (trop de requêtes simultanées
+    ou trop rapprochées), reconnaissable à son message quand l'en-tête Retry-After est absent.
+    Args:
+        response (requests.Response): Réponse HTTP.
+    Returns:
+        bool: True pour une limite secondaire.
+    """
+    if response.status_code not in (403, 429):
+        return False
+    try:
+        message = str(response.json().get('message', ''))
+    except (ValueError, AttributeError):
+        message = response.text or ''
+    message = message.lower()
+    return 'secondary rate limit' in message or 'abuse' in message
+
+class TokenState:
+    def __init__(self, token):
+        self.token = token
+        self.limit = AUTHENTICATED_LIMIT if token else ANONYMOUS_LIMIT
+        self.remaining = self.limit
+        self.reset = 0.0
+        self.in_flight = 0
+
+    def headroom(self, now):
+        if self.reset and now >= self.reset:
+            # Fenêtre écoulée : le budget est de nouveau complet
+            self.remaining, self.reset = self.limit, 0.0
+        return self.remaining - self.in_flight
+
+class TokenPool:
+    def __init__(self, tokens, source='github'):
+        """
+        Initialise le pool.
+        Args:
+            tokens (list): Jetons d'authentification (une liste vide ou [None] pour des requêtes anonymes).
+            source (str): Nom de l'API, utilisé dans les mesures (Common.Metrics).
+        """
+        tokens = [token for token in tokens if token] or [None]
+        self.states = [TokenState(token) for token in tokens]
+        self.source = source
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """
+        Construit un pool à partir d'un jeton, d'une liste de jetons, d'une chaîne de jetons séparés par
+        des virgules, ou retourne le pool reçu.
+        Args:
+            tokens (str | list | TokenPool): Jetons.
+        Returns:
+            TokenPool: Pool de jetons.
+        """
+        if isinstance(tokens, TokenPool):
+            return tokens
+        if isinstance(tokens, str):
+            tokens = [token.strip() for token in tokens.split(',')]
+        return cls(tokens or [])
+
+    def __len__(self):
+        return len(self.states)
+
+    def acquire(self):
+        """
+        Réserve le jeton qui a le plus de marge ; attend la réinitialisation la plus proche si tous sont épuisés.
+        Returns:
+            TokenState: Jeton réservé, à rendre avec release.
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                best = max(self.states, key=lambda state: state.headroom(now))
+                if best.headroom(now) > 0:
+                    best.in_flight += 1
+                    return best
+                wait = min((state.reset for state in self.states if state.reset), default=now + 1) - now
+            print(f"Tous les jetons sont épuisés, attente de {max(wait, 0) + 1:.0f} secondes")
+            Metrics.rate_limit_sleep(max(wait, 0) + 1, self.source)
+
+    def release(self, state, response=None):
+        """
+        Rend un jeton et met à jour son budget d'après les en-têtes de la réponse.
+        Args:
+            state (TokenState): Jeton réservé par acquire.
+            response (requests.Response): Réponse obtenue avec ce jeton (None si la requête a échoué).
+        Returns:
+            bool: True si la réponse indique que le jeton était épuisé (la requête doit être rejouée).
+        """
+        exhausted = False
+        with self.lock:
+            state.in_flight -= 1
+            if response is None:
+                return False
+            headers = response.headers
+            if 'X-RateLimit-Limit' in headers:
+                state.limit = int(headers['X-RateLimit-Limit'])
+            if 'X-RateLimit-Remaining' in headers:
+                state.remaining = int(headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Reset' in headers:
+                state.reset = float(headers['X-RateLimit-Reset'])
+            if response.status_code in (403, 429):
+                if 'Retry-After' in headers:
+                    # Limite secondaire (trop de requêtes simultanées) : ce jeton est mis de côté
+                    state.remaining, state.reset = 0, time.time() + float(headers['Retry-After'])
+                    exhausted = True
+                elif headers.get('X-RateLimit-Remaining') == '0':
+                    exhausted = True
+                elif is_secondary_rate_limit(response):
+                    # Limite secondaire sans Retry-After : le budget principal n'est pas épuisé, mais ce jeton est mis de côté
+                    print(f"Limite secondaire atteinte, jeton mis de côté {SECONDARY_LIMIT_WAIT} secondes")
+                    state.remaining, state.reset = 0, time.time() + SECONDARY_LIMIT_WAIT
+                    exhausted = True
+            if state.remaining <= 0 and not state.reset:
+                # Pas de date de réinitialisation connue : on réessaiera ce jeton dans une minute
+                state.reset = time.time() + 60
+        return exhausted
+
+    def headers_for(self, state, headers=None):
+        """
+        Ajoute l'en-tête d'authentification d'un jeton.
+        Args:
+            state (TokenState): Jeton.
+            headers (dict): Autres en-têtes.
+        Returns:
+            dict: En-têtes de la requête.
+        """
+        headers = dict(headers or {})
+        if state.token:
+            headers['Authorization'] = f'token {state.token}'
+        return headers
+
+    @property
+    def tokens(self):
+        """
+        Returns:
+            list: Jetons du pool (None pour un pool anonyme).
+        """
+        return [state.token for state in self.states]
+
+    @property
+    def identity(self):
+        """
+        Returns:
+            str: Empreinte des jetons du pool ("anonymous" sans jeton), qui ne révèle pas les jetons ;
+                les réponses conservées (Common.ResponseStore) ne sont partagées qu'entre pools de même identité.
+        """
+        tokens = sorted(state.token for state in self.states if state.token)
+        if not tokens:
+            return 'anonymous'
+        return hashlib.sha256('\n'.join(tokens).encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def authenticated(self):
+        return any(state.token for state in self.states)
+
+    def request(self, method, url, endpoint, headers=None, session=None, **kwargs):
+        """
+        Effectue une requête avec le jeton qui a le plus de marge, et la rejoue avec un autre jeton
+        si celui-ci s'avère épuisé.
+        Args:
+            method (str): Méthode HTTP ("GET", "POST").
+            url (str): URL de la requête.
+            endpoint (str): Nom du point d'accès pour les mesures (ex. "github:repos").
+            headers (dict): En-têtes (hors authentification).
+            session (requests.Session): Session à utiliser (optionnelle).
+            **kwargs: Paramètres transmis à requests.
+        Returns:
+            requests.Response: Réponse HTTP.
+        """
+        while True:
+            state = self.acquire()
+            try:
+                response = Metrics.http_request(method, url, endpoint, session=session, headers=self.headers_for(state, headers), **kwargs)
+            except Exception:
+                self.release(state)
+                raise
+            if not self.release(state, response):
+                return response
+
+    def get(self, url, endpoint, headers=None, session=None, **kwargs):
+        return self.request('GET', url, endpoint, headers=headers, session=session, **kwargs)
+
+    def post(self, url, endpoint, headers=None, session=None, **kwargs):
+        return self.request('POST', url, endpoint, headers=headers, session=session, **kwargs)
+
+    def budget(self):
+        """
+        Returns:
+            int: Nombre total de requêtes restantes sur l'ensemble des jetons.
+        """
+        with self.lock:
+            now = time.time()
+            return sum(max(state.headroom(now), 0) for state in self.states)
@@ -0,0 +1,389 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics
+
+""" File de travail persistante (SQLite) partagée par les processus d'une collecte.
+
+    Chaque élément (un propriétaire GitHub, un dépôt, une origine Software Heritage, des pages d'une instance GitLab) est ajouté
+    une seule fois à la file (enqueue, idempotent : tous les processus d'une collecte peuvent ajouter les mêmes
+    éléments), puis réservé par un processus pour visibility_timeout secondes (lease). Le processus le valide avec
+    son résultat (ack) ou le signale en échec (fail) : l'élément est alors proposé de nouveau après un délai
+    croissant, et placé dans la table des échecs définitifs (Dead_Letter) après max_attempts tentatives.
+    Un élément dont la réservation a expiré (processus arrêté ou bloqué) est proposé à un autre processus ;
+    run_worker prolonge les réservations tant que le traitement d'un lot est en cours.
+
+    Une collecte peut ainsi être répartie entre N processus : chacun exécute le même script avec le même nom de file,
+    et, une fois la file vidée, le premier à appeler claim_output écrit la sortie à partir des résultats de la base.
+    Une collecte interrompue reprend là où elle s'était arrêtée ; une nouvelle collecte utilise un nouveau nom de file
+    (ou vide l'ancienne avec purge).
+
+    Base : CARTO_WORK_QUEUE (par défaut work_queue.db à la racine du dépôt). Pour répartir une collecte entre
+    plusieurs machines, la base doit se trouver sur un partage dont les verrous de fichiers sont fiables, avec
+    CARTO_WORK_QUEUE_JOURNAL=DELETE (le mode WAL exige que tous les processus soient sur la même machine).
+
+    Utilisation :
+        python Common/WorkQueue.py stats
+        python Common/WorkQueue.py dead <file>
+        python Common/WorkQueue.py requeue-dead <file>
+        python Common/WorkQueue.py purge <file> """
+
+DEFAULT_QUEUE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'work_queue.db')
+VISIBILITY_TIMEOUT = 600
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 30
+# Nombre de résultats lus à la fois par results
+RESULTS_PAGE = 100
+
+def default_worker_id():
+    """
+    Returns:
+        str: Identifiant du processus courant ("machine:pid").
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue:
+    def __init__(self, name, db_file=None, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        """
+        Ouvre (ou crée) une file de travail.
+        Args:
+            name (str): Nom de la file (ex. "github_owners_info-2024-03-01") ; il identifie une collecte.
+            db_file (str): Fichier SQLite (par défaut, CARTO_WORK_QUEUE ou DEFAULT_QUEUE_FILE).
+            visibility_timeout (float): Durée d'une réservation, en secondes.
+            max_attempts (int): Nombre de tentatives avant de placer un élément dans les échecs définitifs.
+            retry_delay (float): Délai avant la deuxième tentative, en secondes (doublé à chaque tentative suivante).
+        """
+        self.name = name
+        self.db_file = db_file or os.environ.get('CARTO_WORK_QUEUE', DEFAULT_QUEUE_FILE)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lock = threading.Lock()
+        # Transactions explicites : une réservation doit être atomique entre processus (BEGIN IMMEDIATE)
+        self.conn = sqlite3.connect(self.db_file, timeout=60, check_same_thread=False, isolation_level=None)
+        self.conn.execute(f"PRAGMA journal_mode = {os.environ.get('CARTO_WORK_QUEUE_JOURNAL', 'WAL')}")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS Work_Item
+                             (Queue TEXT, Item_Key TEXT, Payload TEXT, Status TEXT, Attempts INTEGER, Worker TEXT,
+                              Lease_Expires REAL, Available_At REAL, Result TEXT, Error TEXT, Updated_At REAL,
+                              PRIMARY KEY (Queue, Item_Key))''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS Work_Item_Status ON Work_Item (Queue, Status, Available_At)')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS Dead_Letter
+                             (Queue TEXT, Item_Key TEXT, Payload TEXT, Attempts INTEGER, Error TEXT, Failed_At REAL,
+                              PRIMARY KEY (Queue, Item_Key))''')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS Output_Claim (Queue TEXT PRIMARY KEY, Worker TEXT, Claimed_At REAL)')
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def enqueue(self, items):
+        """
+        Ajoute des éléments à la file ; les clés déjà présentes (en attente, réservées, traitées ou en échec définitif)
+        sont ignorées.
+        Args:
+            items (iterable): Couples (clé, données) ; les données doivent être sérialisables en JSON.
+        Returns:
+            int: Nombre d'éléments ajoutés.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            dead = {key for key, in conn.execute('SELECT Item_Key FROM Dead_Letter WHERE Queue = ?', (self.name,))}
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO Work_Item (Queue, Item_Key, Payload, Status, Attempts, Available_At, Updated_At) '
+                             'VALUES (?, ?, ?, \'pending\', 0, ?, ?)',
+                             ((self.name, str(key), json.dumps(payload, ensure_ascii=False), now, now) for key, payload in items if str(key) not in dead))
+            added = conn.total_changes - before
+        Metrics.count('work_queue_items_total', added, queue=self.name, event='enqueued')
+        return added
+
+    def lease(self, worker, count=1):
+        """
+        Réserve des éléments disponibles : en attente, ou dont la réservation a expiré.
+        Args:
+            worker (str): Identifiant du processus (voir default_worker_id).
+            count (int): Nombre maximal d'éléments.
+        Returns:
+            list: Éléments réservés, dans l'ordre d'ajout ({"key", "payload", "attempts"}).
+        """
+        now = time.time()
+        leased = []
+        with self.transaction() as conn:
+            rows = conn.execute('SELECT Item_Key, Payload, Status, Attempts FROM Work_Item WHERE Queue = ? AND '
+                                '((Status = \'pending\' AND Available_At <= ?) OR (Status = \'leased\' AND Lease_Expires <= ?)) '
+                                'ORDER BY rowid LIMIT ?', (self.name, now, now, count)).fetchall()
+            for key, payload, status, attempts in rows:
+                if status == 'leased':
+                    Metrics.count('work_queue_items_total', queue=self.name, event='expired')
+                    if attempts >= self.max_attempts:
+                        # Élément qui arrête ou bloque chaque processus qui le traite
+                        self.bury(conn, key, payload, attempts, 'réservation expirée', now)
+                        continue
+                conn.execute('UPDATE Work_Item SET Status = \'leased\', Worker = ?, Lease_Expires = ?, Attempts = ?, Updated_At = ? '
+                             'WHERE Queue = ? AND Item_Key = ?', (worker, now + self.visibility_timeout, attempts + 1, now, self.name, key))
+                leased.append({"key": key, "payload": json.loads(payload), "attempts": attempts + 1})
+        Metrics.count('work_queue_items_total', len(leased), queue=self.name, event='leased')
+        return leased
+
+    def extend(self, keys, worker):
+        """
+        Prolonge les réservations d'un processus.
+        Args:
+            keys (list): Clés des éléments réservés.
+            worker (str): Identifiant du processus.
+        """
+        expires = time.time() + self.visibility_timeout
+        with self.transaction() as conn:
+            conn.executemany('UPDATE Work_Item SET Lease_Expires = ? WHERE Queue = ? AND Item_Key = ? AND Status = \'leased\' AND Worker = ?',
+                             ((expires, self.name, key, worker) for key in keys))
+
+    def ack(self, key, worker, result=None):
+        """
+        Valide un élément avec son résultat. Un élément dont la réservation a expiré et qui a été repris par un
+        autre processus est validé par le premier des deux qui termine.
+        Args:
+            key (str): Clé de l'élément.
+            worker (str): Identifiant du processus.
+            result: Résultat (sérialisable en JSON).
+        Returns:
+            bool: False si l'élément était déjà traité ou en échec définitif.
+        """
+        with self.transaction() as conn:
+            updated = conn.execute('UPDATE Work_Item SET Status = \'done\', Worker = ?, Result = ?, Error = NULL, Updated_At = ? '
+                                   'WHERE Queue = ? AND Item_Key = ? AND Status != \'done\'',
+                                   (worker, json.dumps(result, ensure_ascii=False), time.time(), self.name, key)).rowcount
+        Metrics.count('work_queue_items_total', queue=self.name, event='acked' if updated else 'duplicate')
+        return bool(updated)
+
+    def fail(self, key, worker, error):
+        """
+        Signale l'échec du traitement d'un élément : il est proposé de nouveau après un délai, ou placé dans les
+        échecs définitifs après max_attempts tentatives.
+        Args:
+            key (str): Clé de l'élément.
+            worker (str): Identifiant du processus.
+            error (str): Description de l'erreur.
+        Returns:
+            bool: True si l'élément sera proposé de nouveau.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute('SELECT Payload, Attempts FROM Work_Item WHERE Queue = ? AND Item_Key = ? AND Status = \'leased\' AND Worker = ?',
+                               (self.name, key, worker)).fetchone()
+            if row is None:
+                # Réservation perdue : l'élément a été repris par un autre processus
+                return False
+            payload, attempts = row
+            if attempts >= self.max_attempts:
+                self.bury(conn, key, payload, attempts, error, now)
+                return False
+            conn.execute('UPDATE Work_Item SET Status = \'pending\', Worker = NULL, Available_At = ?, Error = ?, Updated_At = ? '
+                         'WHERE Queue = ? AND Item_Key = ?', (now + self.retry_delay * 2 ** (attempts - 1), error, now, self.name, key))
+        Metrics.count('work_queue_items_total', queue=self.name, event='retried')
+        return True
+
+    def bury(self, conn, key, payload, attempts, error, now):
+        # Appelée dans une transaction
+        conn.execute('INSERT OR REPLACE INTO Dead_Letter (Queue, Item_Key, Payload, Attempts, Error, Failed_At) VALUES (?, ?, ?, ?, ?, ?)',
+                     (self.name, key, payload, attempts, error, now))
+        conn.execute('DELETE FROM Work_Item WHERE Queue = ? AND Item_Key = ?', (self.name, key))
+        Metrics.count('work_queue_items_total', queue=self.name, event='dead')
+        print(f"[{self.name}] échec définitif de {key} après {attempts} tentatives : {error}")
+
+    def is_drained(self):
+        """
+        Returns:
+            bool: True si aucun élément n'est en attente ni réservé.
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT COUNT(*) FROM Work_Item WHERE Queue = ? AND Status != \'done\'', (self.name,)).fetchone()
+        return row[0] == 0
+
+    def results(self):
+        """
+        Yields:
+            tuple: (clé, résultat) des éléments traités, dans l'ordre d'ajout. Les résultats sont lus par pages
+                de RESULTS_PAGE : seule la page courante est en mémoire.
+        """
+        last_rowid = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute('SELECT rowid, Item_Key, Result FROM Work_Item WHERE Queue = ? AND Status = \'done\' AND rowid > ? '
+                                         'ORDER BY rowid LIMIT ?', (self.name, last_rowid, RESULTS_PAGE)).fetchall()
+            for last_rowid, key, result in rows:
+                yield key, json.loads(result)
+            if len(rows) < RESULTS_PAGE:
+                return
+
+    def result(self, key):
+        """
+        Args:
+            key (str): Clé de l'élément.
+        Returns:
+            Résultat de l'élément, ou None s'il n'est pas traité (absent, en attente ou en échec définitif).
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT Result FROM Work_Item WHERE Queue = ? AND Item_Key = ? AND Status = \'done\'',
+                                    (self.name, str(key))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim_output(self, worker=None):
+        """
+        Désigne le processus qui écrit la sortie de la collecte une fois la file vidée : le premier qui le demande,
+        ou un autre si la dernière demande date de plus de visibility_timeout secondes (processus arrêté pendant
+        l'écriture, ou nouvelle exécution d'une collecte terminée).
+        Args:
+            worker (str): Identifiant du processus (par défaut, default_worker_id()).
+        Returns:
+            bool: True si ce processus doit écrire la sortie.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute('SELECT Worker, Claimed_At FROM Output_Claim WHERE Queue = ?', (self.name,)).fetchone()
+            if row is not None and now - row[1] < self.visibility_timeout:
+                print(f"[{self.name}] la sortie est écrite par {row[0]}.")
+                return False
+            conn.execute('INSERT OR REPLACE INTO Output_Claim (Queue, Worker, Claimed_At) VALUES (?, ?, ?)',
+                         (self.name, worker or default_worker_id(), now))
+        return True
+
+    def dead_letters(self):
+        """
+        Returns:
+            list: Éléments en échec définitif ({"key", "payload", "attempts", "error"}).
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT Item_Key, Payload, Attempts, Error FROM Dead_Letter WHERE Queue = ? ORDER BY Failed_At',
+                                     (self.name,)).fetchall()
+        return [{"key": key, "payload": json.loads(payload), "attempts": attempts, "error": error} for key, payload, attempts, error in rows]
+
+    def requeue_dead(self):
+        """
+        Remet les éléments en échec définitif dans la file, avec un nouveau nombre de tentatives.
+        Returns:
+            int: Nombre d'éléments remis dans la file.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            rows = conn.execute('SELECT Item_Key, Payload FROM Dead_Letter WHERE Queue = ?', (self.name,)).fetchall()
+            conn.executemany('INSERT OR REPLACE INTO Work_Item (Queue, Item_Key, Payload, Status, Attempts, Available_At, Updated_At) '
+                             'VALUES (?, ?, ?, \'pending\', 0, ?, ?)', ((self.name, key, payload, now, now) for key, payload in rows))
+            conn.execute('DELETE FROM Dead_Letter WHERE Queue = ?', (self.name,))
+        return len(rows)
+
+    def purge(self):
+        """
+        Supprime tous les éléments de la file (traités ou non) et ses échecs définitifs.
+        Returns:
+            int: Nombre d'éléments supprimés.
+        """
+        with self.transaction() as conn:
+            count = conn.execute('DELETE FROM Work_Item WHERE Queue = ?', (self.name,)).rowcount
+            count += conn.execute('DELETE FROM Dead_Letter WHERE Queue = ?', (self.name,)).rowcount
+            conn.execute('DELETE FROM Output_Claim WHERE Queue = ?', (self.name,))
+        return count
+
+    def stats(self):
+        """
+        Returns:
+            dict: Par file, nombre d'éléments par état (pending, leased, done, dead).
+        """
+        with self.lock:
+            rows = self.conn.execute('SELECT Queue, Status, COUNT(*) FROM Work_Item GROUP BY Queue, Status').fetchall()
+            rows += self.conn.execute('SELECT Queue, \'dead\', COUNT(*) FROM Dead_Letter GROUP BY Queue').fetchall()
+        stats = {}
+        for queue, status, count in rows:
+            stats.setdefault(queue, {"pending": 0, "leased": 0, "done": 0, "dead": 0})[status] = count
+        return stats
+
+    def run_worker(self, handler, batch_size=1, worker=None, poll_interval=5.0):
+        """
+        Traite les éléments de la file jusqu'à ce qu'elle soit vide. Quand il ne reste que des éléments réservés par
+        d'autres processus, attend leur validation (ou l'expiration de leur réservation) avant de s'arrêter.
+        Args:
+            handler (callable): Fonction appelée avec la liste des données d'un lot, qui retourne la liste des résultats
+                (dans le même ordre). Une exception fait échouer tout le lot.
+            batch_size (int): Nombre d'éléments réservés et traités ensemble.
+            worker (str): Identifiant du processus (par défaut, default_worker_id()).
+            poll_interval (float): Attente en secondes entre deux essais quand aucun élément n'est disponible.
+        Returns:
+            int: Nombre d'éléments validés par ce processus.
+        """
+        worker = worker or default_worker_id()
+        processed = 0
+        while True:
+            items = self.lease(worker, batch_size)
+            if not items:
+                if self.is_drained():
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            keys = [item["key"] for item in items]
+            done = threading.Event()
+
+            def heartbeat():
+                while not done.wait(self.visibility_timeout / 3):
+                    self.extend(keys, worker)
+
+            heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+            heartbeat_thread.start()
+            try:
+                results = handler([item["payload"] for item in items])
+            except Exception as e:
+                print(f"[{self.name}] échec du lot ({len(items)} éléments) : {e!r}")
+                for key in keys:
+                    self.fail(key, worker, repr(e))
+                continue
+            finally:
+                done.set()
+                heartbeat_thread.join()
+            for key, result in zip(keys, results):
+                processed += self.ack(key, worker, result)
+        print(f"[{self.name}] file vide : {processed} éléments traités par {worker}.")
+        return processed
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="File de travail persistante partagée par les collecteurs.")
+    parser.add_argument('command', choices=['stats', 'dead', 'requeue-dead', 'purge'])
+    parser.add_argument('queue', nargs='?', default='')
+    parser.add_argument('--db-file', default=None)
+    args = parser.parse_args()
+
+    with WorkQueue(args.queue, args.db_file) as queue:
+        if args.command == 'dead':
+            print(json.dumps(queue.dead_letters(), ensure_ascii=False, indent=4))
+            return
+        if args.command == 'requeue-dead':
+            print(f"{queue.requeue_dead()} éléments remis dans la file {args.queue}.")
+        elif args.command == 'purge':
+            print(f"{queue.purge()} éléments supprimés de la file {args.queue}.")
+        print(json.dumps(queue.stats(), indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,423 @@
+import heapq
 import json
 import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import ProjectStreamWriter, iter_projects, load_projects_file, save_projects_file
+from Common.RepoUrl import canonical_repo_key
+from Common.Sharding import partition_files
+
+# Ordre de priorité des sources lors de la fusion d'un même dépôt (la première l'emporte)
+SOURCE_PRIORITY = ['HAL', 'Software_heritage', 'Github_modality_1', 'GitHub', 'gitLab', 'external']
+# Champs de date qui indiquent la fraîcheur d'un enregistrement (dans le projet ou dans repo_info)
+FRESHNESS_FIELDS = ('updated_date', 'updated_at', 'pushed_at')
+# Identifiants dont toutes les valeurs distinctes sont conservées lors de la fusion (champ "<id>s")
+ID_FIELDS = ('hal_id', 'sh_id', 'github_id')
+
+def project_repo_url(project):
+    """
+    Retourne l'URL du dépôt d'un projet, quel que soit le format du fichier d'origine.
+
+    Args:
+        project (dict): Projet ou information GitHub.
+
+    Returns:
+        str: URL du dépôt, ou chaîne vide.
+    """
+    return project.get('softCodeRepository') or project.get('softCodeRepository_sh') or project.get('repo_url') or ''
+
+def source_rank(project):
+    """
+    Calcule le rang de priorité de la source d'un projet.
+
+    Args:
+        project (dict): Projet.
+
+    Returns:
+        int: Rang (plus petit = plus prioritaire).
+    """
+    source = project.get('source', '')
+    return SOURCE_PRIORITY.index(source) if source in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+
+def freshness(project):
+    """
+    Calcule la date de dernière mise à jour d'un enregistrement : la plus récente de ses dates (FRESHNESS_FIELDS),
+    y compris celles de repo_info.
+
+    Args:
+        project (dict): Projet ou information GitHub.
+
+    Returns:
+        str: Date normalisée "AAAA-MM-JJ HH:MM:SS" (comparable), ou chaîne vide si elle est inconnue.
+    """
+    repo_info = project.get('repo_info')
+    dates = []
+    for record in (project, repo_info if isinstance(repo_info, dict) else {}):
+        for field in FRESHNESS_FIELDS:
+            value = record.get(field)
+            if isinstance(value, str) and value[:4].isdigit():
+                dates.append(value.replace('T', ' ').rstrip('Z')[:19])
+    return max(dates, default='')
+
+def prefers(candidate, current):
+    """
+    Indique si une valeur candidate l'emporte sur la valeur retenue : source plus prioritaire, puis, à priorité
+    égale, enregistrement plus récent, puis plus petite valeur sérialisée.
+
+    Args:
+        candidate (tuple): (rang de la source, fraîcheur, valeur sérialisée, ...).
+        current (tuple): Valeur retenue, de même forme.
+
+    Returns:
+        bool: True si la candidate l'emporte.
+    """
+    if candidate[0] != current[0]:
+        return candidate[0] < current[0]
+    if candidate[1] != current[1]:
+        return candidate[1] > current[1]
+    return candidate[2:-1] < current[2:-1]
+
+def is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+class MergedProject:
+    def __init__(self):
+        """
+        Accumule les enregistrements d'un même dépôt provenant de plusieurs sources.
+        Pour chaque champ, la valeur non vide de la source la plus prioritaire est conservée ; à priorité égale,
+        celle de l'enregistrement le plus récent (voir freshness), puis la plus petite valeur sérialisée, ce qui rend
+        le résultat indépendant de l'ordre des fichiers. Toutes les valeurs distinctes des identifiants (ID_FIELDS)
+        sont conservées dans le champ "<id>s" quand il y en a plusieurs (ex. plusieurs dépôts HAL d'un même logiciel).
+        """
+        self.fields = {}
+        self.authors = {}
+        self.sources = set()
+        self.ids = {}
+
+    def add(self, project):
+        """
+        Ajoute un enregistrement du dépôt.
+
+        Args:
+            project (dict): Projet à fusionner.
+        """
+        rank = source_rank(project)
+        updated = freshness(project)
+        if project.get('source'):
+            self.sources.add(project['source'])
+        for field, value in project.items():
+            if field == 'authors' or is_empty(value):
+                continue
+            if field in ID_FIELDS and str(value).lower() != 'none':
+                self.ids.setdefault(field, {})[json.dumps(value, ensure_ascii=False)] = value
+            candidate = (rank, updated, json.dumps(value, sort_keys=True, ensure_ascii=False), value)
+            if field not in self.fields or prefers(candidate, self.fields[field]):
+                self.fields[field] = candidate
+        for index, author in enumerate(project.get('authors') or []):
+            # Les auteurs sont réunis par nom ; un auteur sans nom n'est identifié que par son identifiant HAL
+            name = str(author.get('name', '')).strip()
+            key = name or ('', str(author.get('authIdHal_s', '')).strip())
+            if key == ('', ''):
+                continue
+            candidate = (rank, updated, index, json.dumps(author, sort_keys=True, ensure_ascii=False), author)
+            if key not in self.authors or prefers(candidate, self.authors[key]):
+                self.authors[key] = candidate
+
+    def to_dict(self):
+        """
+        Construit le projet fusionné.
+
+        Returns:
+            dict: Projet fusionné, avec la liste des sources dans l'ordre de priorité.
+        """
+        project = {field: candidate[-1] for field, candidate in self.fields.items()}
+        for field, values in self.ids.items():
+            if len(values) > 1:
+                project[f'{field}s'] = [values[serialized] for serialized in sorted(values)]
+        if self.authors:
+            project['authors'] = [candidate[-1] for candidate in sorted(self.authors.values(), key=lambda c: (c[0], c[2], c[3]))]
+        if len(self.sources) > 1:
+            project['sources'] = sorted(self.sources, key=lambda s: source_rank({'source': s}))
+        if 'repo_info' in project:
+            project.pop('error', None)  # Une des sources a pu récupérer les informations du dépôt
+        return project
+
+def read_run(run_file):
+    """
+    Parcourt un fichier de débordement trié, dont chaque ligne est "clé\tprojet JSON".
+
+    Args:
+        run_file (str): Chemin du fichier de débordement.
+
+    Yields:
+        tuple: (clé, ligne complète).
+    """
+    with open(run_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line.split('\t', 1)[0], line
 
 class JsonMerger:
-    def __init__(self, output_file='merged_data.json'):
+    def __init__(self, output_file='merged_data.json', memory_budget=None, spill_dir=None, max_open_runs=64, stable_order=False):
         """
         Initialise la classe avec le fichier de sortie.
 
         Args:
             output_file (str): Le chemin vers le fichier JSON de sortie.
+            memory_budget (int): Budget mémoire en octets ; s'il est fourni, la fusion se fait hors mémoire
+                (fichiers de débordement triés puis fusion k-voies, voir merge_and_save_external).
+            spill_dir (str): Répertoire des fichiers de débordement (par défaut, le répertoire temporaire du système).
+            max_open_runs (int): Nombre maximal de fichiers de débordement fusionnés simultanément.
+            stable_order (bool): Trie aussi les projets sans URL de dépôt d'après leur contenu (hors project_number),
+                au lieu de leur ordre de lecture : la sortie ne dépend plus de l'ordre ni du découpage des fichiers.
         """
         self.output_file = output_file
         self.merged_data = []
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.max_open_runs = max_open_runs
+        self.stable_order = stable_order
 
     def load_json_data(self, json_file):
         """
         Charge les données d'un fichier JSON.
 
         Args:
-            json_file (str): Le chemin vers le fichier JSON.
+            json_file (str): Le chemin vers le fichier JSON (.json ou .jsonl.gz).
 
         Returns:
             dict: Les données JSON.
         """
-        with open(json_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_projects_file(json_file)
 
     def merge_files(self, json_files):
         """
         Merge plusieurs fichiers JSON en une seule structure.
+        Les fichiers sont lus en flux et les projets dédoublonnés sur la clé canonique de leur dépôt :
+        les enregistrements d'un même dépôt sont fusionnés champ par champ (voir MergedProject).
+        Les projets sans URL de dépôt sont conservés tels quels.
 
         Args:
             json_files (list): Liste des chemins vers les fichiers JSON à fusionner.
         """
+        merged_projects = {}
+        total = 0
         for file in json_files:
-            data = self.load_json_data(file)
-            self.merged_data.extend(data["projects"])
+            for project in iter_projects(file):
+                total += 1
+                key = canonical_repo_key(project_repo_url(project))
+                if key is None:
+                    merged_projects[('no_repo', total)] = project
+                    continue
+                if key not in merged_projects:
+                    merged_projects[key] = MergedProject()
+                merged_projects[key].add(project)
+
+        for index, merged in enumerate(merged_projects.values(), start=1):
+            project = merged.to_dict() if isinstance(merged, MergedProject) else merged
+            if 'project_number' in project:
+                project['project_number'] = index
+            self.merged_data.append(project)
+        print(f"{total} projets lus, {len(self.merged_data)} après dédoublonnage.")
 
     def save_merged_data(self):
         """
         Sauvegarde les données fusionnées dans un fichier JSON.
         """
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            json.dump({"projects": self.merged_data}, f, ensure_ascii=False, indent=4)
+        save_projects_file({"projects": self.merged_data}, self.output_file)
+
+    def write_run(self, lines, work_dir, runs):
+        """
+        Trie les lignes en mémoire et les écrit dans un nouveau fichier de débordement.
+
+        Args:
+            lines (list): Lignes "clé\tprojet JSON".
+            work_dir (str): Répertoire des fichiers de débordement.
+            runs (list): Liste des fichiers de débordement, complétée par le nouveau fichier.
+        """
+        lines.sort()
+        run_file = os.path.join(work_dir, f"run_{len(runs):06d}.txt")
+        with open(run_file, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        runs.append(run_file)
+
+    def spill_sorted_runs(self, json_files, work_dir):
+        """
+        Lit les fichiers en flux et les découpe en fichiers de débordement triés par clé canonique,
+        chacun tenant dans le budget mémoire.
+
+        Args:
+            json_files (list): Liste des chemins vers les fichiers JSON à fusionner.
+            work_dir (str): Répertoire des fichiers de débordement.
+
+        Returns:
+            tuple: (liste des fichiers de débordement, nombre de projets lus).
+        """
+        runs = []
+        lines = []
+        used = 0
+        total = 0
+        for file in json_files:
+            for project in iter_projects(file):
+                total += 1
+                key = canonical_repo_key(project_repo_url(project))
+                if key is None and self.stable_order:
+                    # Après toutes les empreintes hexadécimales, dans l'ordre de leur contenu
+                    key = "~" + json.dumps({field: value for field, value in project.items() if field != 'project_number'},
+                                           sort_keys=True, ensure_ascii=False)
+                elif key is None:
+                    # Après toutes les empreintes hexadécimales, dans l'ordre de lecture
+                    key = f"~{total:012d}"
+                line = f"{key}\t{json.dumps(project, ensure_ascii=False)}\n"
+                lines.append(line)
+                used += sys.getsizeof(line)
+                if self.memory_budget and used >= self.memory_budget:
+                    self.write_run(lines, work_dir, runs)
+                    lines = []
+                    used = 0
+        if lines:
+            self.write_run(lines, work_dir, runs)
+        return runs, total
+
+    def reduce_runs(self, runs, work_dir):
+        """
+        Fusionne les fichiers de débordement par paquets tant qu'il y en a plus que max_open_runs.
+
+        Args:
+            runs (list): Fichiers de débordement triés.
+            work_dir (str): Répertoire des fichiers de débordement.
+
+        Returns:
+            list: Au plus max_open_runs fichiers triés.
+        """
+        generation = 0
+        while len(runs) > self.max_open_runs:
+            merged_runs = []
+            for start in range(0, len(runs), self.max_open_runs):
+                group = runs[start:start + self.max_open_runs]
+                run_file = os.path.join(work_dir, f"merge_{generation:03d}_{len(merged_runs):06d}.txt")
+                with open(run_file, 'w', encoding='utf-8') as f:
+                    for _, line in heapq.merge(*(read_run(run) for run in group)):
+                        f.write(line)
+                for run in group:
+                    os.remove(run)
+                merged_runs.append(run_file)
+            runs = merged_runs
+            generation += 1
+        return runs
+
+    def merge_and_save_external(self, json_files):
+        """
+        Fusionne plusieurs fichiers JSON hors mémoire et écrit le résultat en flux.
+        Les projets sont triés par clé canonique dans des fichiers de débordement bornés par memory_budget
+        (un seul fichier sans budget),
+        puis fusionnés k-voies : les enregistrements d'un même dépôt arrivent consécutivement et sont fusionnés
+        comme dans merge_files. Le fichier de sortie est trié par clé canonique.
+
+        Args:
+            json_files (list): Liste des chemins vers les fichiers JSON à fusionner.
+
+        Returns:
+            int: Nombre de projets écrits.
+        """
+        with tempfile.TemporaryDirectory(dir=self.spill_dir) as work_dir:
+            runs, total = self.spill_sorted_runs(json_files, work_dir)
+            runs = self.reduce_runs(runs, work_dir)
+
+            with ProjectStreamWriter(self.output_file) as writer:
+                current_key = None
+                group = []
+
+                def write(project):
+                    if 'project_number' in project:
+                        project['project_number'] = writer.count + 1
+                    writer.write(project)
+
+                def write_group():
+                    if self.stable_order and len(group) == 1:
+                        # Partitions : un dépôt présent dans une seule partition est recopié tel quel
+                        write(group[0])
+                        return
+                    merged = MergedProject()
+                    for project in group:
+                        merged.add(project)
+                    write(merged.to_dict())
+
+                for key, line in heapq.merge(*(read_run(run) for run in runs)):
+                    project = json.loads(line.split('\t', 1)[1])
+                    if key != current_key and group:
+                        write_group()
+                        group = []
+                    current_key = key
+                    if key.startswith('~'):
+                        # Projet sans URL de dépôt : conservé tel quel
+                        write(project)
+                        continue
+                    group.append(project)
+                if group:
+                    write_group()
+                count = writer.count
+
+        print(f"{total} projets lus, {count} après dédoublonnage ({len(runs)} fichiers de débordement fusionnés).")
+        return count
 
     def merge_and_save(self, json_files):
         """
         Fusionne plusieurs fichiers JSON et enregistre le résultat.
+        Si un budget mémoire est défini, la fusion se fait hors mémoire.
 
         Args:
             json_files (list): Liste des chemins vers les fichiers JSON à fusionner.
         """
-        self.merge_files(json_files)
-        self.save_merged_data()
+        if self.memory_budget:
+            self.merge_and_save_external(json_files)
+        else:
+            self.merge_files(json_files)
+            self.save_merged_data()
         print(f"Données fusionnées enregistrées dans {self.output_file}")
 
+def merge_partitions(output_file, memory_budget=None):
+    """
+    Recombine les fichiers de partition écrits par les nœuds d'une collecte répartie (voir Common.Sharding) en un
+    seul fichier de sortie. Les projets sont fusionnés par dépôt et triés par clé canonique : le résultat ne dépend
+    ni du nombre de nœuds, ni de la répartition des éléments, ni de l'ordre des partitions.
+
+    Args:
+        output_file (str): Fichier de sortie de l'étape (les partitions sont cherchées à côté de lui).
+        memory_budget (int): Budget mémoire en octets (optionnel).
+
+    Returns:
+        int: Nombre de projets écrits.
+    """
+    partitions = partition_files(output_file)
+    if not partitions:
+        raise FileNotFoundError(f"Aucune partition de {output_file}")
+    print(f"{len(partitions)} partitions de {output_file} : {', '.join(os.path.basename(path) for path in partitions)}")
+    merger = JsonMerger(output_file=output_file, memory_budget=memory_budget, stable_order=True)
+    return merger.merge_and_save_external(partitions)
+
+def main(json_files, output_file, memory_budget=None):
+    """
+    Fusionne plusieurs fichiers JSON et enregistre le résultat.
+
+    Args:
+        json_files (list): Liste des chemins vers les fichiers JSON à fusionner.
+        output_file (str): Le chemin vers le fichier JSON de sortie.
+        memory_budget (int): Budget mémoire en octets pour une fusion hors mémoire (optionnel).
+    """
+    merger = JsonMerger(output_file=output_file, memory_budget=memory_budget)
+    with Metrics.phase('merge'):
+        merger.merge_and_save(json_files)
+    Metrics.write_run_report(os.path.splitext(os.path.basename(output_file))[0])
+
 # utilisation
 if __name__ == "__main__":
-    json_files = ['CNRS_HAL.json', '../Git/CNRS_GITHUB_OWNERS_REPOS.json'] 
-    merger = JsonMerger(output_file='CNRS_HAL_GITMOD1.json')
-    merger.merge_and_save(json_files)
+    with Profiling.profile_stage('merge'):
+        json_files = ['CNRS_HAL.json', '../Git/CNRS_GITHUB_OWNERS_REPOS.json'] 
+        main(json_files, 'CNRS_HAL_GITMOD1.json', memory_budget=512 * 1024 * 1024)
 
-    json_github_files = ['../Git/CNRS_GITHUB.json', '../Git/CNRS_OWNERS_REPO_INFO.json'] 
-    merger = JsonMerger(output_file='CNRS_HAL_GITHUB_GITMOD1.json')
-    merger.merge_and_save(json_github_files)
\ No newline at end of file
+        json_github_files = ['../Git/CNRS_GITHUB.json', '../Git/CNRS_OWNERS_REPO_INFO.json'] 
+        main(json_github_files, 'CNRS_HAL_GITHUB_GITMOD1.json')
\ No newline at end of file
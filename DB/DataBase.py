@@ -1,29 +1,89 @@
-import json
-import mysql.connector
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import load_projects_file
+from Common.ProjectStore import ProjectStore, project_field_key
+from Common.RepoUrl import canonical_repo_key
+import EmbeddedDB
 
 """ Classe pour gérer la connexion à la base de données et insérer les données. 
     Les données sont insérées dans la base de données en utilisant des requêtes SQL.
     Il y a 2 fichier d'entrée JSON : CNRS_PROJ.json et CNRS_PROJ_GITHUB_INFO.json
     Le premier fichier contient les informations des projets provenant de Hal, SH ou Github.
-    Le deuxième fichier contient les informations des projets GitHub."""
+    Le deuxième fichier contient les informations des projets GitHub.
+
+    Le chargement est validé par tranches de chunk_size enregistrements ; la table Load_Progress conserve, pour
+    chaque phase, la dernière tranche validée. Un chargement interrompu (mêmes fichiers d'entrée) reprend
+    après cette tranche au lieu de recréer la base."""
+
+DEFAULT_CHUNK_SIZE = 1000
+# Clés déjà insérées des tables de référence, relues dans la base à la reprise d'une phase interrompue
+INSERTED_KEY_QUERIES = {
+    'projects': "SELECT Url FROM Project",
+    'authors': "SELECT Name FROM Author",
+    'forges': "SELECT Name FROM Forge",
+    'labs': "SELECT Name FROM Lab",
+    'keywords': "SELECT Label FROM Keyword",
+    'institutions': "SELECT Name FROM Institution",
+    'languages': "SELECT Name FROM Language",
+    'sources': "SELECT Name, Hal_id, Github_id FROM Source",
+}
+
+def source_key(name, hal_id, github_id):
+    """
+    Clé d'une ligne Source pour éviter les doublons. Les identifiants sont comparés comme chaînes : relus dans
+    la base (colonnes VARCHAR) à la reprise d'un chargement, ils doivent égaler ceux du JSON (github_id entier).
+    Args:
+        name (str): Nom de la source.
+        hal_id: Identifiant HAL.
+        github_id: Identifiant GitHub.
+    Returns:
+        tuple: Clé de la source.
+    """
+    return tuple('' if value is None else str(value) for value in (name, hal_id, github_id))
 
 class DatabaseManager:
-    def __init__(self, db_config):
+    def __init__(self, db_config, store_dir=None):
         """
         Initialise la classe avec la configuration de la base de données.
         Args:
-            db_config (dict): Configuration de la base de données.
+            db_config (dict): Configuration de la base de données. Avec 'backend': 'sqlite', la base est
+                une base embarquée (voir EmbeddedDB) dont 'database' est le chemin du fichier.
+            store_dir (str): Répertoire du stockage indexé des informations GitHub, partagé avec les autres étapes
+                et conservé d'un chargement à l'autre (par défaut, un répertoire temporaire supprimé par close).
         """
         self.db_config = db_config
         self.conn = None
         self.cursor = None
+        self.store_dir = store_dir
+        self.temp_store_dir = None
+        self.github_store = None
+        # Clés canoniques des informations GitHub du chargement en cours
+        self.github_keys = set()
+        self.inserted = {}
+        # Clé canonique du dépôt -> Project_Id, complétée par insert_projects ; relue dans la base à la première
+        # recherche d'un projet inséré par un autre appel (reprise d'un chargement)
+        self.project_ids = {}
+        self.project_ids_loaded = False
 
     def connect(self):
         """
         Établit une connexion à la base de données.
         """
-        self.conn = mysql.connector.connect(**self.db_config)
-        self.cursor = self.conn.cursor()
+        config = {key: value for key, value in self.db_config.items() if key != 'backend'}
+        if self.db_config.get('backend') == 'sqlite':
+            self.conn = EmbeddedDB.connect(**config)
+        else:
+            import mysql.connector
+            self.conn = mysql.connector.connect(**config)
+        self.cursor = Metrics.InstrumentedCursor(self.conn.cursor())
 
     def close(self):
         """
@@ -33,19 +93,107 @@ class DatabaseManager:
             self.cursor.close()
         if self.conn:
             self.conn.close()
+        if self.github_store:
+            self.github_store.close()
+            self.github_store = None
+        if self.temp_store_dir:
+            shutil.rmtree(self.temp_store_dir, ignore_errors=True)
+            self.temp_store_dir = None
 
     def load_json_data(self, json_file):
         """
         Charge les données à partir d'un fichier JSON.
         Args:
-            json_file (str): Chemin du fichier JSON.
+            json_file (str): Chemin du fichier JSON (.json ou .jsonl.gz).
         Returns:
             dict: Données chargées du fichier JSON.
         """
-        with open(json_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_projects_file(json_file)
 
     
+    def inserted_keys(self, table):
+        """
+        Retourne les clés déjà insérées dans une table de référence (auteurs, forges, mots-clés...),
+        conservées d'un appel à l'autre pour éviter les doublons quand les projets sont insérés par lots.
+        Args:
+            table (str): Nom de la table.
+        Returns:
+            set: Clés déjà insérées (modifiable).
+        """
+        return self.inserted.setdefault(table, set())
+
+    def index_github_projects(self, projects_github):
+        """
+        Construit le stockage indexé des informations GitHub, pour retrouver celles d'un projet
+        par l'URL de son dépôt sans parcourir toute la liste.
+        Un stockage existant (store_dir) n'est pas vidé : les informations du chargement y sont ajoutées,
+        et seules celles-ci sont ensuite retrouvées par find_github_info.
+        Args:
+            projects_github (list): Liste des projets GitHub contenant les informations supplémentaires.
+        """
+        if self.github_store is None:
+            if self.store_dir is None and self.temp_store_dir is None:
+                self.temp_store_dir = tempfile.mkdtemp(prefix='github_store_')
+            self.github_store = ProjectStore(self.store_dir or self.temp_store_dir, fields=('url',))
+        self.github_keys = set()
+        for item in projects_github:
+            self.add_github_info(item)
+
+    def add_github_info(self, item):
+        """
+        Ajoute les informations GitHub d'un dépôt au stockage indexé et au chargement en cours.
+        Une version identique déjà stockée n'est pas réécrite, pour que le stockage ne grossisse pas d'un chargement à l'autre.
+        Args:
+            item (dict): Informations GitHub du dépôt (repo_url).
+        """
+        key = project_field_key(item, 'url')
+        if key is None:
+            return
+        self.github_keys.add(key)
+        if self.github_store.get('url', item.get('softCodeRepository') or item.get('repo_url')) != item:
+            self.github_store.put(item)
+
+    def find_github_info(self, url, projects_github):
+        """
+        Retrouve les informations GitHub correspondant à l'URL d'un dépôt.
+        Args:
+            url (str): URL du dépôt (softCodeRepository).
+            projects_github (list): Liste des projets GitHub, parcourue si le stockage indexé n'est pas construit.
+        Returns:
+            dict: Informations GitHub du dépôt, ou None.
+        """
+        if self.github_store:
+            github_info = self.github_store.get('url', url)
+            if github_info is not None and project_field_key(github_info, 'url') in self.github_keys:
+                return github_info
+            return None
+        return next((item for item in projects_github if item['repo_url'] == url), None)
+
+    def project_id(self, project):
+        """
+        Retourne l'identifiant de la ligne Project d'un projet : celui attribué par insert_projects (ou par l'appelant),
+        sinon celui de la ligne de même dépôt (clé canonique). La colonne Url n'est pas indexée : la table n'est
+        relue qu'une fois, en entier, à la première recherche d'un projet inséré par un autre appel
+        (reprise d'un chargement), au lieu d'une requête par projet.
+        Args:
+            project (dict): Projet (softCodeRepository, Project_Id éventuel).
+        Returns:
+            int: Identifiant du projet, ou None s'il n'est pas dans la table.
+        """
+        if project.get('Project_Id') is not None:
+            return project['Project_Id']
+        key = canonical_repo_key(project.get('softCodeRepository') or '')
+        if key is None:
+            return None
+        if key not in self.project_ids and not self.project_ids_loaded:
+            self.cursor.execute("SELECT Project_Id, Url FROM Project ORDER BY Project_Id")
+            for project_id, url in self.cursor.fetchall():
+                url_key = canonical_repo_key(url or '')
+                if url_key is not None:
+                    self.project_ids.setdefault(url_key, project_id)
+            self.project_ids_loaded = True
+        return self.project_ids.get(key)
+
     def create_project_table(self):
         """
         Crée la table Project dans la base de données.
@@ -176,7 +324,7 @@ class DatabaseManager:
         Args:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
         """
-        self.cursor.execute('''CREATE TABLE Github
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS Github
                         (Github_Id INT AUTO_INCREMENT PRIMARY KEY,
                         Name VARCHAR(255),
                         Full_Name VARCHAR(255),
@@ -306,7 +454,7 @@ class DatabaseManager:
         Args:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
         """
-        self.cursor.execute('''CREATE TABLE Project_Github
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS Project_Github
                         (Project_Id INT,
                         Github_Id INT,
                         FOREIGN KEY (Project_Id) REFERENCES Project(Project_Id),
@@ -332,7 +480,8 @@ class DatabaseManager:
 
     def insert_projects(self, projects, projects_github):
         """
-        Insère les projets dans la table Project en évitant les doublons basés sur softCodeRepository.
+        Insère les projets dans la table Project en évitant les doublons (clé canonique du dépôt) :
+        les fichiers fusionnés par JsonMerger n'en contiennent pas, mais complete_database reçoit des fichiers bruts.
 
         Args:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
@@ -341,14 +490,16 @@ class DatabaseManager:
         """
         print("Inserting projects...")
 
-        repository_set = set()  # Utilisé pour éviter les doublons de softCodeRepository
+        repository_set = self.inserted_keys('projects')  # Utilisé pour éviter les doublons de softCodeRepository
         for project in projects:
 
             soft_code_repository = project.get('softCodeRepository', '')
 
             # Ignorer les projets sans softCodeRepository ou déjà insérés
-            if not soft_code_repository or soft_code_repository in repository_set:
+            repository_key = canonical_repo_key(soft_code_repository)
+            if not soft_code_repository or repository_key in repository_set:
                 continue
+            repository_set.add(repository_key)
 
             title = project.get('title', '')
             abstract = project.get('abstract', '')
@@ -359,7 +510,7 @@ class DatabaseManager:
             on_github = True
 
             # Extraire le nombre d'étoiles du projet GitHub correspondant
-            github_info = next((item for item in projects_github if item['repo_url'] == soft_code_repository), None)
+            github_info = self.find_github_info(soft_code_repository, projects_github)
 
             # Mettre on_github à False si le projet n'est pas sur github
             if github_info is not None:
@@ -380,12 +531,7 @@ class DatabaseManager:
             # Récupérer l'ID du projet inséré pour les relations many-to-many
             project_id = self.cursor.lastrowid
             project['Project_Id'] = project_id
-
-            # Ajouter le softCodeRepository à l'ensemble pour éviter les doublons
-            repository_set.add(soft_code_repository)
-
-        # Valider la transaction pour s'assurer que les données sont insérées
-        self.conn.commit()
+            self.project_ids[repository_key] = project_id
 
 
 
@@ -397,7 +543,7 @@ class DatabaseManager:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
             projects (list): Liste des projets contenant les auteurs à insérer.
         """
-        author_set = set()  # Utilisé pour stocker les auteurs déjà insérés
+        author_set = self.inserted_keys('authors')  # Utilisé pour stocker les auteurs déjà insérés
         for project in projects:
             authors = project.get('authors', [])
             for author_info in authors:
@@ -406,11 +552,11 @@ class DatabaseManager:
                 author_hal_name_id = author_info.get('authIdHal_s', '')
                 author_hal_number_id= author_info.get('authIdHal_i', '')
                 author_github_id = author_info.get('AuthGithubId', '')
-                if author_name not in author_set:  # Vérifie si l'auteur n'a pas déjà été inséré
+                if author_name.strip() not in author_set:  # Vérifie si l'auteur n'a pas déjà été inséré
                     self.cursor.execute("""
                         INSERT IGNORE INTO Author (Name, Mail, Hal_name_id, Hal_number_id, Github_Id) VALUES (%s, %s, %s, %s, %s)
                     """, (author_name.strip(), author_mail, author_hal_name_id.strip(), author_hal_number_id, author_github_id))
-                    author_set.add(author_name)  # Ajoute l'auteur à l'ensemble pour éviter les doublons
+                    author_set.add(author_name.strip())  # Ajoute l'auteur à l'ensemble pour éviter les doublons
 
     def insert_forges(self, projects):
         """
@@ -419,7 +565,7 @@ class DatabaseManager:
         Args:
             projects (list): Liste des projets contenant les informations sur les forges.
         """
-        forge_set = set()  # Utilisé pour éviter les doublons
+        forge_set = self.inserted_keys('forges')  # Utilisé pour éviter les doublons
         for project in projects:
             url = project.get('softCodeRepository', '')
             if url:
@@ -439,7 +585,7 @@ class DatabaseManager:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
             projects (list): Liste des projets contenant les informations sur les laboratoires.
         """
-        lab_set = set()  # Utilisé pour éviter les doublons
+        lab_set = self.inserted_keys('labs')  # Utilisé pour éviter les doublons
         for project in projects:
             laboratory = project.get('laboratory', '')
             if laboratory and laboratory not in lab_set:
@@ -456,7 +602,7 @@ class DatabaseManager:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
             projects (list): Liste des projets contenant les informations sur les mots-clés.
         """
-        keyword_set = set()  # Utilisé pour éviter les doublons
+        keyword_set = self.inserted_keys('keywords')  # Utilisé pour éviter les doublons
         for project in projects:
             keywords = project.get('keywords', '').split(',')
             for keyword in keywords:
@@ -475,7 +621,7 @@ class DatabaseManager:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
             projects (list): Liste des projets contenant les informations sur les institutions.
         """
-        institution_set = set()  # Utilisé pour éviter les doublons
+        institution_set = self.inserted_keys('institutions')  # Utilisé pour éviter les doublons
         for project in projects:
             institutions = project.get('institution', '').split(',')
             for institution in institutions:
@@ -494,7 +640,7 @@ class DatabaseManager:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
             projects (list): Liste des projets contenant les informations sur les languages.
         """
-        language_set = set()  # Utilisé pour éviter les doublons
+        language_set = self.inserted_keys('languages')  # Utilisé pour éviter les doublons
         for project in projects:
             languages = project.get('softProgrammingLanguage', [])
             for language in languages:
@@ -513,7 +659,7 @@ class DatabaseManager:
             cursor: Curseur MySQL pour exécuter les requêtes SQL.
             projects (list): Liste des projets contenant les informations sur les sources.
         """
-        source_set = set()  # Utilisé pour éviter les doublons
+        source_set = self.inserted_keys('sources')  # Utilisé pour éviter les doublons
         for project in projects:
             source = project.get('source', '')
             hal_id = project.get('hal_id', '')
@@ -521,13 +667,13 @@ class DatabaseManager:
             sh_id = project.get('sh_id', '')
 
             # Créer une clé unique pour éviter les doublons
-            source_key = (source, hal_id, github_id)
+            key = source_key(source, hal_id, github_id)
             
-            if source_key not in source_set:
+            if key not in source_set:
                 self.cursor.execute("""
                     INSERT IGNORE INTO Source (Name, Hal_id, Github_id, Sh_id) VALUES (%s, %s, %s, %s)
                 """, (source, hal_id, github_id, sh_id))
-                source_set.add(source_key)  # Ajoute la clé à l'ensemble pour éviter les doublons
+                source_set.add(key)  # Ajoute la clé à l'ensemble pour éviter les doublons
 
     def insert_github(self, projects):
         """
@@ -579,14 +725,9 @@ class DatabaseManager:
         """
         for project in projects:
             
-            self.cursor.execute("""
-                SELECT Project_Id FROM Project WHERE url = %s
-            """, (project.get('softCodeRepository', ''),))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if project_result is None:
+            Project_Id = self.project_id(project)
+            if Project_Id is None:
                 continue
-            Project_Id = project_result[0]
 
             authors = project.get('authors', [])
             for author_info in authors:
@@ -617,15 +758,9 @@ class DatabaseManager:
             projects (list): Liste des projets contenant les informations sur les laboratoires.
         """
         for project in projects:
-            # Récupérer l'ID du projet depuis la table Project
-            self.cursor.execute("""
-                SELECT Project_Id FROM Project WHERE url = %s
-            """, (project.get('softCodeRepository', ''),))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if project_result is None:
+            Project_Id = self.project_id(project)
+            if Project_Id is None:
                 continue
-            Project_Id = project_result[0]
 
             # Récupérer le laboratoire associé au projet
             lab_name = project.get('laboratory', '').strip()
@@ -655,15 +790,9 @@ class DatabaseManager:
             projects (list): Liste des projets contenant les informations sur les forges.
         """
         for project in projects:
-            # Récupérer l'ID du projet depuis la table Project
-            self.cursor.execute("""
-                SELECT Project_Id FROM Project WHERE url = %s
-            """, (project.get('softCodeRepository', ''),))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if project_result is None:
+            Project_Id = self.project_id(project)
+            if Project_Id is None:
                 continue
-            Project_Id = project_result[0]
 
             # Récupérer l'URL du dépôt de code associé au projet
             url = project.get('softCodeRepository', '').strip()
@@ -695,15 +824,9 @@ class DatabaseManager:
             projects (list): Liste des projets contenant les informations sur les mots-clés.
         """
         for project in projects:
-            # Récupérer l'ID du projet depuis la table Project
-            self.cursor.execute("""
-                SELECT Project_Id FROM Project WHERE url = %s
-            """, (project.get('softCodeRepository', ''),))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if project_result is None:
+            Project_Id = self.project_id(project)
+            if Project_Id is None:
                 continue
-            Project_Id = project_result[0]
 
             # Récupérer les mots-clés associés au projet
             keywords = project.get('keywords', '').split(',')
@@ -734,15 +857,9 @@ class DatabaseManager:
             projects (list): Liste des projets contenant les informations sur les languages.
         """
         for project in projects:
-            # Récupérer l'ID du projet depuis la table Project
-            self.cursor.execute("""
-                SELECT Project_Id FROM Project WHERE url = %s
-            """, (project.get('softCodeRepository', ''),))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if project_result is None:
+            Project_Id = self.project_id(project)
+            if Project_Id is None:
                 continue
-            Project_Id = project_result[0]
 
             languages = project.get('softProgrammingLanguage', [])
             for language in languages:
@@ -773,15 +890,9 @@ class DatabaseManager:
             projects (list): Liste des projets contenant les informations sur les sources.
         """
         for project in projects:
-            # Récupérer l'ID du projet depuis la table Project
-            self.cursor.execute("""
-                SELECT Project_Id FROM Project WHERE Url = %s
-            """, (project.get('softCodeRepository', ''),))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if project_result is None:
+            Project_Id = self.project_id(project)
+            if Project_Id is None:
                 continue
-            Project_Id = project_result[0]
 
             source = project.get('source', '').strip()
             if source:
@@ -812,17 +923,13 @@ class DatabaseManager:
         for project in projects:
             url = project.get('softCodeRepository')
 
-            # Récupérer l'ID du projet depuis la table Project
-            self.cursor.execute("SELECT Project_Id FROM Project WHERE Url = %s", (url,))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if not project_result:
+            project_id = self.project_id(project)
+            if project_id is None:
                 #print(f"Projet '{title}' non trouvé dans la table Project.")
                 continue
-            project_id = project_result[0]
 
             # Récupérer l'ID du projet GitHub depuis la table Github
-            github_info = next((item for item in projects_github if item['repo_url'] == url), None)
+            github_info = self.find_github_info(url, projects_github)
             if not github_info or 'repo_info' not in github_info:
                 #print(f"Projet GitHub pour '{title}' non trouvé ou sans informations dans les projets GitHub.")
                 continue
@@ -849,15 +956,9 @@ class DatabaseManager:
             projects (list): Liste des projets contenant les informations sur les institutions.
         """
         for project in projects:
-            # Récupérer l'ID du projet depuis la table Project
-            self.cursor.execute("""
-                SELECT Project_Id FROM Project WHERE url = %s
-            """, (project.get('softCodeRepository', ''),))
-            project_result = self.cursor.fetchone()
-            self.cursor.fetchall()
-            if project_result is None:
+            Project_Id = self.project_id(project)
+            if Project_Id is None:
                 continue
-            Project_Id = project_result[0]
 
             # Récupérer l'ID de l'institution depuis la table Institution
             self.cursor.execute("""
@@ -890,68 +991,183 @@ class DatabaseManager:
             db_name (str): Nom de la base de données à supprimer.
         """
         self.cursor.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        self.project_ids = {}
+        self.project_ids_loaded = False
 
-    def fill_database(self, projects, projects_github):
+    def swap_database(self, staging_name, db_name):
         """
-        Remplit la base de données avec les données des projets.
+        Remplace une base par une base de préparation complète (voir staging_database) : la base en service
+        n'est modifiée qu'à cette étape. Avec la base embarquée, le fichier de préparation remplace le fichier
+        de la base et la connexion est fermée ; avec MySQL, les tables sont échangées en une seule instruction
+        RENAME TABLE (atomique), puis les anciennes tables et la base de préparation sont supprimées.
         Args:
-            projects (list): Liste des projets HAL.
-            projects_github (list): Liste des projets GitHub.
+            staging_name (str): Base de préparation, connectée.
+            db_name (str): Base à remplacer.
         """
-        self.create_project_table()
-        self.insert_projects(projects, projects_github)
-
-        self.create_author_table()
-        self.insert_authors(projects)
-
-        self.create_forge_table()
-        self.insert_forges(projects)
-
-        self.create_lab_table()
-        self.insert_labs(projects)
-
-        self.create_keyword_table()
-        self.insert_keywords(projects)
-
-        self.create_institution_table()
-        self.insert_institutions(projects)
-
-        self.create_language_table()
-        self.insert_languages(projects)
-
-        self.create_source_table()
-        self.insert_sources(projects)
-
-        self.create_github_table()
-        self.insert_github(projects_github)
-
-        self.create_project_author_table()
-        self.insert_project_authors(projects)
-
-        self.create_project_lab_table()
-        self.insert_project_labs(projects)
-
-        self.create_project_forge_table()
-        self.insert_project_forges(projects)
-
-        self.create_project_keyword_table()
-        self.insert_project_keywords(projects)
+        if self.db_config.get('backend') == 'sqlite':
+            self.conn.commit()
+            self.cursor.close()
+            self.conn.close()
+            self.cursor = self.conn = None
+            os.replace(staging_name, db_name)
+            return
+        previous_name = f"{db_name}_previous"
+        self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
+        self.drop_database_if_exists(previous_name)
+        self.cursor.execute(f"CREATE DATABASE {previous_name}")
+        self.cursor.execute(f"SHOW TABLES FROM {db_name}")
+        renames = [f"{db_name}.{table} TO {previous_name}.{table}" for table, in self.cursor.fetchall()]
+        self.cursor.execute(f"SHOW TABLES FROM {staging_name}")
+        renames += [f"{staging_name}.{table} TO {db_name}.{table}" for table, in self.cursor.fetchall()]
+        self.cursor.execute(f"RENAME TABLE {', '.join(renames)}")
+        self.cursor.execute(f"USE {db_name}")
+        self.drop_database_if_exists(previous_name)
+        self.drop_database_if_exists(staging_name)
 
-        self.create_project_language_table()
-        self.insert_project_languages(projects)
+    def create_load_progress_table(self):
+        """
+        Crée la table Load_Progress : dernière tranche validée de chaque phase du chargement.
+        """
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS Load_Progress
+                        (Phase VARCHAR(64) PRIMARY KEY,
+                        Load_Id VARCHAR(64),
+                        Chunk INT,
+                        Row_Offset INT,
+                        Done BOOLEAN,
+                        Updated_At VARCHAR(32))''')
 
-        self.create_project_source_table()
-        self.insert_project_sources(projects)
+    def load_progress(self, load_id):
+        """
+        Lit la progression d'un chargement.
+        Args:
+            load_id (str): Identifiant du chargement (empreinte des fichiers d'entrée).
+        Returns:
+            dict: Phase -> (tranches validées, enregistrements traités, phase terminée), pour ce chargement.
+        """
+        self.cursor.execute("SELECT Phase, Load_Id, Chunk, Row_Offset, Done FROM Load_Progress")
+        return {phase: (chunk, offset, bool(done)) for phase, row_load_id, chunk, offset, done in self.cursor.fetchall()
+                if row_load_id == load_id}
 
-        self.create_project_github_table()
-        self.insert_project_github_relations(projects, projects_github)
+    def save_progress(self, phase, load_id, chunk, offset, done):
+        """
+        Enregistre la progression d'une phase, dans la transaction de la tranche qu'elle valide.
+        Args:
+            phase (str): Nom de la phase.
+            load_id (str): Identifiant du chargement.
+            chunk (int): Nombre de tranches validées.
+            offset (int): Nombre d'enregistrements traités.
+            done (bool): True si la phase est terminée.
+        """
+        self.cursor.execute('''REPLACE INTO Load_Progress (Phase, Load_Id, Chunk, Row_Offset, Done, Updated_At)
+                               VALUES (%s, %s, %s, %s, %s, %s)''',
+                            (phase, load_id, chunk, offset, done, datetime.now().isoformat(timespec='seconds')))
 
-        self.create_project_institution_table()
-        self.insert_project_institutions(projects)
+    def resumable_load(self, load_id):
+        """
+        Indique si la base contient un chargement interrompu des mêmes fichiers d'entrée.
+        Args:
+            load_id (str): Identifiant du chargement.
+        Returns:
+            bool: True si le chargement peut reprendre.
+        """
+        self.create_load_progress_table()
+        self.cursor.execute("SELECT Load_Id, Done FROM Load_Progress")
+        rows = self.cursor.fetchall()
+        phases = len(self.load_phases([], []))
+        return bool(rows) and all(row[0] == load_id for row in rows) and sum(bool(row[1]) for row in rows) < phases
 
-        self.conn.commit()
+    def restore_inserted_keys(self, phase):
+        """
+        Relit dans la base les clés déjà insérées d'une table de référence, avant de reprendre sa phase.
+        Args:
+            phase (str): Nom de la phase.
+        """
+        query = INSERTED_KEY_QUERIES.get(phase)
+        if query is None:
+            return
+        self.cursor.execute(query)
+        keys = self.inserted_keys(phase)
+        if phase == 'projects':
+            keys.update(canonical_repo_key(row[0]) for row in self.cursor.fetchall())
+        elif phase == 'sources':
+            keys.update(source_key(*row) for row in self.cursor.fetchall())
+        else:
+            keys.update(row[0] if len(row) == 1 else tuple(row) for row in self.cursor.fetchall())
+
+    def fill_database(self, projects, projects_github, chunk_size=DEFAULT_CHUNK_SIZE, load_id=''):
+        """
+        Remplit la base de données avec les données des projets. Chaque phase est validée par tranches
+        de chunk_size enregistrements, avec sa progression ; les phases et tranches déjà validées par
+        un chargement interrompu de même load_id sont ignorées.
+        Args:
+            projects (list): Liste des projets HAL.
+            projects_github (list): Liste des projets GitHub.
+            chunk_size (int): Nombre d'enregistrements par tranche (une transaction par tranche).
+            load_id (str): Identifiant du chargement (voir load_fingerprint).
+        """
+        with Metrics.phase('db:index_github'):
+            self.index_github_projects(projects_github)
+
+        self.create_load_progress_table()
+        progress = self.load_progress(load_id)
+        for name, create_table, insert_rows, items in self.load_phases(projects, projects_github):
+            chunk, offset, done = progress.get(name, (0, 0, False))
+            if done:
+                print(f"Phase {name} déjà chargée, ignorée.")
+                continue
+            with Metrics.phase(f'db:{name}'):
+                create_table()
+                if offset:
+                    print(f"Reprise de la phase {name} après {offset} enregistrements ({chunk} tranches).")
+                    self.restore_inserted_keys(name)
+                while not done:
+                    insert_rows(items[offset:offset + chunk_size])
+                    offset = min(offset + chunk_size, len(items))
+                    chunk += 1
+                    done = offset >= len(items)
+                    self.save_progress(name, load_id, chunk, offset, done)
+                    with Metrics.phase('db:commit'):
+                        self.conn.commit()
+                    Metrics.count('db_chunks_committed_total', phase=name)
         print("Données insérées avec succès dans la base de données.")
 
+    def load_phases(self, projects, projects_github):
+        """
+        Décrit les phases du chargement, dans l'ordre où les tables doivent être remplies.
+        Args:
+            projects (list): Liste des projets HAL.
+            projects_github (list): Liste des projets GitHub.
+        Returns:
+            list: Quadruplets (nom de la phase, création de la table, insertion d'une liste d'enregistrements,
+                enregistrements de la phase).
+        """
+        return [
+            ('projects', self.create_project_table, lambda chunk: self.insert_projects(chunk, projects_github), projects),
+            ('authors', self.create_author_table, self.insert_authors, projects),
+            ('forges', self.create_forge_table, self.insert_forges, projects),
+            ('labs', self.create_lab_table, self.insert_labs, projects),
+            ('keywords', self.create_keyword_table, self.insert_keywords, projects),
+            ('institutions', self.create_institution_table, self.insert_institutions, projects),
+            ('languages', self.create_language_table, self.insert_languages, projects),
+            ('sources', self.create_source_table, self.insert_sources, projects),
+            ('github', self.create_github_table, self.insert_github, projects_github),
+            ('project_authors', self.create_project_author_table, self.insert_project_authors, projects),
+            ('project_labs', self.create_project_lab_table, self.insert_project_labs, projects),
+            ('project_forges', self.create_project_forge_table, self.insert_project_forges, projects),
+            ('project_keywords', self.create_project_keyword_table, self.insert_project_keywords, projects),
+            ('project_languages', self.create_project_language_table, self.insert_project_languages, projects),
+            ('project_sources', self.create_project_source_table, self.insert_project_sources, projects),
+            ('project_github', self.create_project_github_table, lambda chunk: self.insert_project_github_relations(chunk, projects_github), projects),
+            ('project_institutions', self.create_project_institution_table, self.insert_project_institutions, projects),
+        ]
+
+    def create_tables(self):
+        """
+        Crée toutes les tables, sans les remplir (chargement en flux, voir StreamLoader).
+        """
+        for name, create_table, insert_rows, items in self.load_phases([], []):
+            create_table()
+
     def complete_database(self, projects, projects_github):
         """
         Complète la base de données avec des données supplémentaires.
@@ -959,6 +1175,7 @@ class DatabaseManager:
             projects (list): Liste des projets HAL.
             projects_github (list): Liste des projets GitHub.
         """
+        self.index_github_projects(projects_github)
         self.insert_projects(projects, projects_github)
         self.insert_authors(projects)
         self.insert_forges(projects)
@@ -979,19 +1196,55 @@ class DatabaseManager:
         self.conn.commit()
         print("Données rajoutées avec succès dans la base de données.")
 
-def main():
+DEFAULT_DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'mouahid',
+    'password': 'MdpSQL',
+    'database': 'cnrs_hal_db'
+}
+
+def staging_database(db_config):
+    """
+    Retourne la base de préparation d'un chargement complet, qui remplace la base une fois terminé (voir swap_database).
+    Args:
+        db_config (dict): Configuration de la base de données.
+    Returns:
+        str: Nom de la base de préparation (chemin du fichier pour la base embarquée), ou None pour une base
+            embarquée en mémoire, chargée directement.
+    """
+    if db_config.get('backend') == 'sqlite':
+        return None if db_config['database'] == ':memory:' else db_config['database'] + '.staging'
+    return db_config['database'] + '_staging'
+
+def load_fingerprint(json_files):
+    """
+    Calcule l'identifiant d'un chargement : empreinte SHA-256 du contenu des fichiers d'entrée.
+    Args:
+        json_files (list): Fichiers d'entrée.
+    Returns:
+        str: Empreinte hexadécimale.
+    """
+    digest = hashlib.sha256()
+    for json_file in json_files:
+        with open(json_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def main(json_file_hal='CNRS_HAL_GITMOD1.json', json_file_github='CNRS_HAL_GITHUB_GITMOD1.json', db_config=None,
+         resume=True, chunk_size=DEFAULT_CHUNK_SIZE):
     """
     Fonction principale pour charger les fichiers JSON, connecter à la base de données, 
     supprimer et créer la base de données, puis remplir la base de données avec les données des projets.
+    Un chargement interrompu des mêmes fichiers reprend là où il s'était arrêté, sans supprimer la base.
+    Args:
+        json_file_hal (str): Fichier des projets fusionnés.
+        json_file_github (str): Fichier des informations GitHub fusionnées.
+        db_config (dict): Configuration de la base de données (par défaut, DEFAULT_DB_CONFIG).
+        resume (bool): Reprend un chargement interrompu (sinon, la base est toujours recréée).
+        chunk_size (int): Nombre d'enregistrements validés par transaction.
     """
-    json_file_hal = 'CNRS_HAL_GITMOD1.json'
-    json_file_github = 'CNRS_HAL_GITHUB_GITMOD1.json'
-    db_config = {
-        'host': 'localhost',
-        'user': 'mouahid',
-        'password': 'MdpSQL',
-        'database': 'cnrs_hal_db'
-    }
+    db_config = db_config or DEFAULT_DB_CONFIG
 
     db_manager = DatabaseManager(db_config)
     data_hal = db_manager.load_json_data(json_file_hal)
@@ -999,12 +1252,21 @@ def main():
 
     data_github = db_manager.load_json_data(json_file_github)
     projects_github = data_github.get('projects', [])
+    load_id = load_fingerprint([json_file_hal, json_file_github])
 
     db_manager.connect()
-    db_manager.drop_database_if_exists(db_config['database'])
-    db_manager.create_database(db_config['database'])
-    db_manager.fill_database(projects, projects_github)
-    db_manager.close()
+    try:
+        db_manager.create_database(db_config['database'])
+        if resume and db_manager.resumable_load(load_id):
+            print("Reprise du chargement interrompu.")
+        else:
+            db_manager.drop_database_if_exists(db_config['database'])
+            db_manager.create_database(db_config['database'])
+        db_manager.fill_database(projects, projects_github, chunk_size=chunk_size, load_id=load_id)
+    finally:
+        db_manager.close()
+    Metrics.write_run_report('database')
 
 if __name__ == '__main__':
-    main()
+    with Profiling.profile_stage('database'):
+        main()
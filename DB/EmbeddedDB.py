@@ -0,0 +1,104 @@
+import re
+import sqlite3
+
+""" Base de données embarquée (SQLite) utilisable à la place de MySQL par DatabaseManager.
+
+    Les requêtes de DatabaseManager sont écrites pour MySQL ; elles sont traduites à la volée :
+    paramètres %s -> ?, INSERT IGNORE -> INSERT OR IGNORE, INT AUTO_INCREMENT PRIMARY KEY -> INTEGER PRIMARY KEY AUTOINCREMENT.
+    Les commandes portant sur la base elle-même (CREATE DATABASE, USE) sont ignorées ; DROP DATABASE supprime toutes les tables.
+    Sert aux bancs d'essai (Benchmarks/) et aux essais locaux sans serveur MySQL :
+        DatabaseManager({'backend': 'sqlite', 'database': 'cartographie.db'}) """
+
+TRANSLATIONS = [
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE), 'INSERT OR IGNORE'),
+    (re.compile(r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', re.IGNORECASE), 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'%s'), '?'),
+]
+IGNORED_STATEMENT = re.compile(r'^\s*(CREATE\s+DATABASE|USE)\b', re.IGNORECASE)
+DROP_DATABASE = re.compile(r'^\s*DROP\s+DATABASE\b', re.IGNORECASE)
+
+def translate_query(query):
+    """
+    Traduit une requête MySQL de DatabaseManager en requête SQLite.
+
+    Args:
+        query (str): Requête MySQL.
+
+    Returns:
+        str: Requête SQLite.
+    """
+    for pattern, replacement in TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    return query
+
+class EmbeddedCursor:
+    """
+    Curseur SQLite acceptant les requêtes MySQL de DatabaseManager.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+
+    def execute(self, query, params=None):
+        if IGNORED_STATEMENT.match(query):
+            return
+        if DROP_DATABASE.match(query):
+            tables = [row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+            for table in tables:
+                self.connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+            return
+        self.cursor.execute(translate_query(query), params or ())
+
+    def executemany(self, query, seq_of_params):
+        self.cursor.executemany(translate_query(query), seq_of_params)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def close(self):
+        self.cursor.close()
+
+class EmbeddedConnection:
+    """
+    Connexion SQLite exposant l'interface de mysql.connector utilisée par DatabaseManager.
+    """
+
+    def __init__(self, database=':memory:'):
+        self.connection = sqlite3.connect(database)
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+
+    def cursor(self):
+        return EmbeddedCursor(self.connection)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+def connect(database=':memory:', **kwargs):
+    """
+    Ouvre une base embarquée. Les autres paramètres de connexion MySQL (hôte, utilisateur...) sont ignorés.
+
+    Args:
+        database (str): Chemin du fichier SQLite, ou ':memory:'.
+
+    Returns:
+        EmbeddedConnection: Connexion à la base.
+    """
+    return EmbeddedConnection(database)
@@ -1,5 +1,6 @@
 # importer la classe DatabaseManager depuis le fichier database_manager.py
 from DataBase import DatabaseManager
+from Common import Profiling
 
 """ Complete la base de données avec les nouvelles données JSON. """
 
@@ -39,4 +40,5 @@ def main():
     print("Nouvelles données insérées avec succès dans la base de données.")
 
 if __name__ == '__main__':
-    main()
+    with Profiling.profile_stage('ext_db'):
+        main()
@@ -0,0 +1,290 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics
+from Common.ProjectIO import iter_projects
+from Common.ProjectStore import field_key, project_field_key
+from ConcatenateJson import freshness, source_rank
+from DataBase import DatabaseManager, staging_database
+
+""" Chargement en flux de la base de données, pendant la collecte.
+
+    Les collecteurs (ou Pipeline.py --stream-db, qui relit la sortie de chaque collecteur dès qu'il se termine)
+    déposent les projets et les informations GitHub dans une file bornée ; un thread d'écriture les retire
+    par lots et les insère avec DatabaseManager (MySQL ou base embarquée), en validant chaque lot.
+    Quand l'écriture prend du retard, la file se remplit et put bloque les producteurs (contre-pression) :
+    la mémoire reste bornée, et la durée totale est proche de celle de la plus lente des deux phases.
+
+    Les enregistrements d'un même dépôt (clé canonique de l'URL) provenant de plusieurs sources sont fusionnés
+    comme le fait JsonMerger : une seule ligne Project, dont chaque colonne prend la valeur non vide de la source
+    la plus prioritaire (à priorité égale, celle de l'enregistrement le plus récent, puis la première reçue),
+    et les relations de toutes les sources.
+    Un projet inséré avant ses informations GitHub est relié à celles-ci à leur arrivée.
+
+    La base est chargée dans une base de préparation (voir DataBase.staging_database), qui ne remplace la base
+    en service qu'à la fin d'un chargement complet (close) : pendant le chargement, et s'il échoue, la base en
+    service reste celle du chargement précédent.
+
+    Le chargement en flux traite chaque enregistrement avant fusion (les relations de chaque source), là où le
+    chargement après fusion ne traite que les projets fusionnés : sur des fichiers déjà collectés, les deux ont
+    une durée comparable, et le gain vient du recouvrement avec la collecte.
+
+    Taille de la file : CARTO_STREAM_QUEUE_SIZE (DEFAULT_QUEUE_SIZE par défaut). """
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_QUEUE_SIZE = int(os.environ.get('CARTO_STREAM_QUEUE_SIZE', 5000))
+# Délai au-delà duquel un lot incomplet est inséré sans attendre d'autres enregistrements
+FLUSH_INTERVAL = 1.0
+# Champ du projet -> colonne de la table Project
+PROJECT_COLUMNS = [('title', 'Title'), ('abstract', 'Abstract'), ('submitted_date', 'Date_creation'),
+                   ('updated_date', 'Date_update'), ('domain', 'Domain')]
+
+class StreamLoader:
+    def __init__(self, db_config, batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE, store_dir=None):
+        """
+        Prépare le chargement ; start lance le thread d'écriture, qui recrée la base de préparation.
+        Args:
+            db_config (dict): Configuration de la base de données (voir DatabaseManager).
+            batch_size (int): Nombre maximal d'enregistrements insérés par lot (une transaction par lot).
+            queue_size (int): Nombre maximal d'enregistrements en attente dans la file.
+            store_dir (str): Répertoire du stockage indexé des informations GitHub (par défaut, un répertoire temporaire).
+        """
+        self.database = db_config['database']
+        self.staging = staging_database(db_config)
+        if self.staging and db_config.get('backend') == 'sqlite':
+            # La base embarquée est un fichier : la connexion ouvre directement le fichier de préparation
+            db_config = dict(db_config, database=self.staging)
+        self.manager = DatabaseManager(db_config, store_dir)
+        self.publish = True
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer = threading.Thread(target=self.run, name='db-writer', daemon=True)
+        self.feeders = []
+        self.error = None
+        # Clé canonique du dépôt -> [Project_Id, URL enregistrée, (rang de la source, fraîcheur) de chaque colonne]
+        self.projects = {}
+        # Clé canonique -> Project_Id des projets insérés sans informations GitHub
+        self.without_github = {}
+        self.github_keys = set()
+        self.counts = {"projects": 0, "merged": 0, "github": 0, "batches": 0}
+
+    def start(self):
+        self.writer.start()
+        return self
+
+    def put(self, record, kind='project'):
+        """
+        Dépose un enregistrement dans la file ; bloque tant que la file est pleine.
+        Args:
+            record (dict): Projet, ou information GitHub si kind vaut "github".
+            kind (str): "project" ou "github".
+        """
+        item = (kind, record)
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        start = time.perf_counter()
+        while True:
+            if self.error is not None or not self.writer.is_alive():
+                raise RuntimeError("Le chargement de la base de données s'est interrompu") from self.error
+            try:
+                self.queue.put(item, timeout=FLUSH_INTERVAL)
+                break
+            except queue.Full:
+                continue
+        Metrics.count('stream_backpressure_seconds_total', time.perf_counter() - start)
+
+    def put_github(self, info):
+        self.put(info, 'github')
+
+    def feed_file(self, file_path, kind='project'):
+        """
+        Dépose en flux, depuis un thread dédié, les enregistrements d'un fichier de projets.
+        Args:
+            file_path (str): Fichier (.json ou .jsonl.gz), ex. la sortie d'un collecteur qui vient de se terminer.
+            kind (str): "project" ou "github".
+        """
+        def feed():
+            try:
+                with Metrics.phase(f'stream:feed:{os.path.basename(file_path)}'):
+                    for record in iter_projects(file_path):
+                        self.put(record, kind)
+            except Exception as e:
+                self.error = self.error or e
+
+        feeder = threading.Thread(target=feed, name=f'db-feed-{os.path.basename(file_path)}', daemon=True)
+        feeder.start()
+        self.feeders.append(feeder)
+
+    def close(self, publish=True):
+        """
+        Attend la fin des fichiers en cours de lecture et l'insertion des derniers lots, remplace la base en service
+        par la base chargée, puis ferme la connexion.
+        Args:
+            publish (bool): Remplace la base en service (False si une partie des données manque, ex. une collecte
+                en échec : la base chargée reste dans la base de préparation).
+        Returns:
+            dict: Nombre de projets insérés, fusionnés, d'informations GitHub et de lots.
+        """
+        for feeder in self.feeders:
+            feeder.join()
+        # Lu par le thread d'écriture après le dernier lot ; une erreur de lecture empêche aussi le remplacement
+        self.publish = publish
+        if self.writer.is_alive():
+            self.put(None, None)
+            self.writer.join()
+        if self.error is not None:
+            raise self.error
+        return self.counts
+
+    def next_batch(self):
+        """
+        Retire de la file le prochain lot : attend un premier enregistrement, puis complète le lot
+        tant que d'autres arrivent en moins de FLUSH_INTERVAL secondes.
+        Returns:
+            list: Enregistrements (kind, record) du lot.
+            bool: True si la fin du chargement a été demandée.
+        """
+        items = []
+        item = self.queue.get()
+        while item[0] is not None:
+            items.append(item)
+            if len(items) >= self.batch_size:
+                return items, False
+            try:
+                item = self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                return items, False
+        return items, True
+
+    def run(self):
+        try:
+            self.manager.connect()
+            self.manager.drop_database_if_exists(self.staging or self.database)
+            self.manager.create_database(self.staging or self.database)
+            self.manager.create_tables()
+            self.manager.index_github_projects([])
+            finished = False
+            while not finished:
+                items, finished = self.next_batch()
+                if items:
+                    with Metrics.phase('stream:batch'):
+                        self.write_batch(items)
+            if self.error is not None or not self.publish:
+                print(f"Chargement en flux incomplet : la base en service est conservée, la base chargée reste dans {self.staging or self.database}.")
+                return
+            if self.staging:
+                self.manager.swap_database(self.staging, self.database)
+            print(f"Chargement en flux terminé : {self.counts['projects']} projets ({self.counts['merged']} enregistrements fusionnés), "
+                  f"{self.counts['github']} informations GitHub, {self.counts['batches']} lots.")
+        except Exception as e:
+            self.error = e
+            # Débloque les producteurs en attente : put constatera l'erreur
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            self.manager.close()
+
+    def write_batch(self, items):
+        """
+        Insère un lot dans une transaction : nouvelles informations GitHub, nouveaux projets, mise à jour
+        des projets déjà insérés, puis entités et relations de tous les enregistrements du lot.
+        Args:
+            items (list): Enregistrements (kind, record).
+        """
+        github, records, new_projects, updates = [], [], [], {}
+        for kind, record in items:
+            if kind == 'github':
+                key = project_field_key(record, 'url')
+                if key is not None and key not in self.github_keys:
+                    self.github_keys.add(key)
+                    self.manager.add_github_info(record)
+                    github.append(record)
+                continue
+            key = field_key('url', record.get('softCodeRepository'))
+            if key is None:
+                records.append(record)
+            elif key in self.projects:
+                entry = self.projects[key]
+                record = dict(record, softCodeRepository=entry[1], Project_Id=entry[0])
+                changed = self.merge_columns(entry, record)
+                if changed:
+                    updates.setdefault(key, {}).update(changed)
+                self.counts["merged"] += 1
+                records.append(record)
+            else:
+                priority = (source_rank(record), freshness(record))
+                self.projects[key] = [None, record['softCodeRepository'],
+                                      [None if record.get(field) in (None, '') else priority for field, column in PROJECT_COLUMNS]]
+                new_projects.append(record)
+                records.append(record)
+
+        for name, create_table, insert_rows, phase_records in self.manager.load_phases(records, github):
+            if name == 'projects':
+                # Seuls les nouveaux projets ont une ligne à créer ; les autres ont été fusionnés
+                self.manager.insert_projects(new_projects, [])
+            else:
+                insert_rows(phase_records)
+
+        for record in new_projects:
+            key = field_key('url', record['softCodeRepository'])
+            self.projects[key][0] = record.get('Project_Id')
+            if self.manager.find_github_info(record['softCodeRepository'], []) is None:
+                self.without_github[key] = record.get('Project_Id')
+        for key, columns in updates.items():
+            assignments = ', '.join(f"{column} = %s" for column in columns)
+            self.manager.cursor.execute(f"UPDATE Project SET {assignments} WHERE Project_Id = %s",
+                                        (*columns.values(), self.projects[key][0]))
+        self.link_github(github)
+        self.manager.conn.commit()
+
+        self.counts["projects"] += len(new_projects)
+        self.counts["github"] += len(github)
+        self.counts["batches"] += 1
+        Metrics.count('stream_records_total', len(items))
+
+    def merge_columns(self, entry, record):
+        """
+        Fusionne dans un projet déjà inséré les colonnes d'un autre enregistrement du même dépôt.
+        Args:
+            entry (list): État du projet [Project_Id, URL, priorités des colonnes] (les priorités sont mises à jour).
+            record (dict): Nouvel enregistrement.
+        Returns:
+            dict: Colonnes dont la valeur change -> nouvelle valeur.
+        """
+        rank, updated = source_rank(record), freshness(record)
+        changed = {}
+        for index, (field, column) in enumerate(PROJECT_COLUMNS):
+            if record.get(field) in (None, ''):
+                continue
+            current = entry[2][index]
+            # Source plus prioritaire, ou enregistrement plus récent de même priorité (comme JsonMerger)
+            if current is None or rank < current[0] or (rank == current[0] and updated > current[1]):
+                entry[2][index] = (rank, updated)
+                changed[column] = record[field]
+        return changed
+
+    def link_github(self, github):
+        """
+        Relie aux informations GitHub arrivées dans ce lot les projets insérés avant elles.
+        Args:
+            github (list): Nouvelles informations GitHub.
+        """
+        for info in github:
+            key = project_field_key(info, 'url')
+            project_id = self.without_github.pop(key, None)
+            if project_id is None:
+                continue
+            stars = info.get('repo_info', {}).get('stars', "None")
+            self.manager.cursor.execute("UPDATE Project SET OnGithub = %s WHERE Project_Id = %s", (stars != "None", project_id))
+            self.manager.insert_project_github_relations([{'softCodeRepository': self.projects[key][1], 'Project_Id': project_id}], [])
@@ -1,5 +1,14 @@
+import hashlib
 import json
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import is_compact, save_projects_file
+from Common.RepoUrl import canonical_repo_key, normalize_repo_url
+from ExtResolver import ExternalLinkResolver, read_gitlab_hosts
 
 """ Prends un fichier texte nommé Nom_du_Laboratoire.txt et contenant une liste d'url et génère un fichier JSON contenant les informations des projets """
 
@@ -63,25 +72,134 @@ def write_json_to_file(data, file_path):
     Écrit les données dans un fichier JSON.
     Args:
         data (dict): Données à écrire dans le fichier JSON.
-        file_path (str): Chemin du fichier de sortie JSON.
+        file_path (str): Chemin du fichier de sortie JSON (.json, ou .jsonl.gz pour des projets).
     """
+    if is_compact(file_path):
+        save_projects_file(data, file_path)
+        return
     with open(file_path, 'w') as file:
         json.dump(data, file, indent=4)
 
-def main(input_file, output_file):
+def main(input_file, output_file, resolve=False, github_token=None):
     """
     Fonction principale pour lire les liens à partir d'un fichier texte, générer une sortie JSON et l'écrire dans un fichier.
     Args:
         input_file (str): Chemin du fichier texte d'entrée.
         output_file (str): Chemin du fichier JSON de sortie.
+        resolve (bool): Enrichit les projets avec les métadonnées de leur forge (voir ExtResolver).
+        github_token (str): Jeton d'authentification GitHub utilisé par le résolveur.
     """
     lab_name = os.path.basename(input_file).replace('.txt', '')  # Déduit le nom du laboratoire à partir du nom du fichier
     links = read_links_from_file(input_file)  # Lit les liens à partir du fichier texte
     json_output = generate_json_output(links, lab_name)  # Génère la sortie JSON
+    if resolve:
+        resolver = ExternalLinkResolver(github_token=github_token, gitlab_hosts=read_gitlab_hosts())
+        json_output = resolver.enrich_output(json_output)  # Récupère étoiles, dates et description auprès des forges
     write_json_to_file(json_output, output_file)  # Écrit la sortie JSON dans un fichier
     print(f"JSON output written to {output_file}")
+    Metrics.write_run_report('external')
+
+def file_hash(file_path):
+    """
+    Calcule l'empreinte SHA-256 du contenu d'un fichier.
+    Args:
+        file_path (str): Chemin du fichier.
+    Returns:
+        str: Empreinte hexadécimale.
+    """
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def process_lab_file(file_path):
+    """
+    Lit, normalise et dédoublonne (par clé canonique du dépôt) les liens d'un fichier de laboratoire.
+    Args:
+        file_path (str): Chemin du fichier texte Nom_du_Laboratoire.txt.
+    Returns:
+        tuple: (nom du laboratoire, liste des projets, statistiques du fichier).
+    """
+    lab_name = os.path.basename(file_path).replace('.txt', '')
+    links = [link for link in read_links_from_file(file_path) if link]
+    unique_links = {}
+    valid = 0
+    for link in links:
+        normalized = normalize_repo_url(link)
+        if len(normalized.split('/')) < 5:  # https://forge/auteur/projet au minimum
+            continue
+        valid += 1
+        unique_links.setdefault(canonical_repo_key(normalized), normalized)
+    unique_links = list(unique_links.values())
+    stats = {
+        "links": len(links),
+        "invalid": len(links) - valid,
+        "duplicates_in_lab": valid - len(unique_links),
+    }
+    return lab_name, generate_json_output(unique_links, lab_name)["projects"], stats
+
+def main_directory(input_dir, output_file, stats_file='ExtJSON_stats.json', state_file='ext_state.json', resolve=False, github_token=None):
+    """
+    Traite tous les fichiers .txt d'un répertoire (un par laboratoire),
+    dédoublonne les liens entre laboratoires (clé canonique du dépôt) et écrit une sortie consolidée ainsi que des statistiques par laboratoire.
+    Les fichiers dont le contenu n'a pas changé depuis l'exécution précédente (même empreinte) ne sont pas retraités.
+    Args:
+        input_dir (str): Répertoire contenant les fichiers texte des laboratoires.
+        output_file (str): Chemin du fichier JSON de sortie consolidé.
+        stats_file (str): Chemin du fichier JSON des statistiques par laboratoire.
+        state_file (str): Fichier d'état contenant l'empreinte et les projets de chaque fichier déjà traité.
+        resolve (bool): Enrichit les projets avec les métadonnées de leur forge (voir ExtResolver).
+        github_token (str): Jeton d'authentification GitHub utilisé par le résolveur.
+    """
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+
+    lab_files = sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir) if name.endswith('.txt'))
+    hashes = {path: file_hash(path) for path in lab_files}
+    changed_files = [path for path in lab_files if state.get(path, {}).get("hash") != hashes[path]]
+    print(f"{len(lab_files)} fichiers de laboratoire, {len(changed_files)} modifiés depuis la dernière exécution.")
+    Metrics.cache_lookup('ext_state', hit=True, value=len(lab_files) - len(changed_files))
+    Metrics.cache_lookup('ext_state', hit=False, value=len(changed_files))
+
+    with Metrics.phase('process_labs'):
+        for path in changed_files:
+            lab_name, projects, stats = process_lab_file(path)
+            state[path] = {"hash": hashes[path], "lab_name": lab_name, "projects": projects, "stats": stats}
+
+    # Consolider dans l'ordre des fichiers pour un résultat déterministe
+    consolidated = {}
+    all_stats = {}
+    for path in lab_files:
+        lab_state = state[path]
+        stats = dict(lab_state["stats"], skipped=path not in changed_files, duplicates_across_labs=0)
+        for project in lab_state["projects"]:
+            key = canonical_repo_key(project["softCodeRepository"])
+            if key in consolidated:
+                consolidated[key].setdefault("laboratories", [consolidated[key]["laboratory"]]).append(lab_state["lab_name"])
+                stats["duplicates_across_labs"] += 1
+            else:
+                consolidated[key] = dict(project)
+        stats["unique"] = len(lab_state["projects"]) - stats["duplicates_across_labs"]
+        all_stats[lab_state["lab_name"]] = stats
+
+    # Oublier les fichiers supprimés du répertoire
+    state = {path: state[path] for path in lab_files}
+    with open(state_file, 'w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False)
+
+    json_output = {"number_of_projects": len(consolidated), "projects": list(consolidated.values())}
+    if resolve:
+        resolver = ExternalLinkResolver(github_token=github_token, gitlab_hosts=read_gitlab_hosts())
+        json_output = resolver.enrich_output(json_output)
+    write_json_to_file(json_output, output_file)
+    write_json_to_file(all_stats, stats_file)
+    print(f"JSON output written to {output_file} ({len(consolidated)} projects), stats written to {stats_file}")
+    Metrics.write_run_report('external')
 
 if __name__ == "__main__":
     input_file = 'Cailloux.txt' 
     output_file = 'ExtJSON.json'
-    main(input_file, output_file)
+    with Profiling.profile_stage('external'):
+        main(input_file, output_file, resolve=True, github_token="YOUR_GITHUB_API_TOKEN_HERE")
+    # Pour traiter tous les laboratoires d'un répertoire :
+    # main_directory('.', 'ExtJSON.json', resolve=True, github_token="YOUR_GITHUB_API_TOKEN_HERE")
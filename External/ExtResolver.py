@@ -0,0 +1,288 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics
+from Common.TokenPool import TokenPool
+
+""" Enrichit les projets externes générés par ExtJSON.generate_json_output (étoiles, dates, description...)
+    en interrogeant l'API de la forge de chaque lien. Les liens sont résolus par lots, en parallèle,
+    à travers un pool de connexions partagé, et les résultats sont mis en cache par URL.
+    Seules les réponses définitives sont mises en cache, y compris celles d'un lien mort (dépôt supprimé, privé ou
+    inexistant : {"reachable": False}) : une erreur réseau, une limite de taux, une erreur 5xx ou un jeton refusé
+    (401) sera retentée à la prochaine exécution. """
+
+# Statuts d'erreur passagère (ou de jeton refusé), à retenter : les autres erreurs signalent un lien mort
+RETRY_STATUSES = (401, 429)
+
+DEFAULT_LABS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Gitlab', 'labs_gitlab.txt')
+
+class ExternalLinkResolver:
+    def __init__(self, github_token=None, gitlab_hosts=None, cache_file='ext_cache.json', max_workers=16, batch_size=200):
+        """
+        Initialise le résolveur.
+        Args:
+            github_token (str | list | TokenPool): Jeton(s) GitHub (optionnel mais conseillé pour la limite de taux, voir Common.TokenPool).
+            gitlab_hosts (iterable): Instances GitLab connues (en plus des hôtes contenant "gitlab") : noms d'hôtes,
+                ou URL de base pour une instance installée sous un sous-chemin (ex. https://forge.example.org/gitlab).
+            cache_file (str): Fichier JSON du cache des métadonnées par URL.
+            max_workers (int): Nombre de requêtes simultanées.
+            batch_size (int): Nombre de liens résolus entre deux sauvegardes du cache.
+        """
+        self.github_headers = {'Accept': 'application/vnd.github.v3+json'}
+        self.github_tokens = TokenPool.from_tokens(github_token)
+        # URL de base des instances connues, les plus longues d'abord (une instance sous un sous-chemin l'emporte)
+        self.gitlab_instances = sorted({host.rstrip('/') if '://' in host else f"https://{host}" for host in (gitlab_hosts or [])},
+                                       key=len, reverse=True)
+        self.gitlab_hosts = {urlparse(instance).netloc.lower() for instance in self.gitlab_instances}
+        self.cache_file = cache_file
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+        # Une seule session, dont le pool de connexions est dimensionné pour les threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.cache = {}
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                self.cache = json.load(f)
+
+    def save_cache(self):
+        """
+        Sauvegarde le cache des métadonnées dans son fichier.
+        """
+        with open(self.cache_file, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+
+    def detect_forge(self, url):
+        """
+        Détermine le type de forge d'un lien.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            str: "github", "gitlab", "bitbucket" ou "git".
+        """
+        host = urlparse(url).netloc.lower()
+        if host in ('github.com', 'www.github.com'):
+            return 'github'
+        if host in ('bitbucket.org', 'www.bitbucket.org'):
+            return 'bitbucket'
+        if 'gitlab' in host or host in self.gitlab_hosts:
+            return 'gitlab'
+        return 'git'
+
+    def repo_path(self, url):
+        """
+        Extrait le chemin du dépôt (propriétaire/nom) d'un lien.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            str: Chemin du dépôt sans barre finale ni suffixe .git.
+        """
+        path = urlparse(url).path.strip('/')
+        if path.endswith('.git'):
+            path = path[:-4]
+        return path
+
+    def is_dead_link(self, response):
+        """
+        Distingue un lien mort (404, 410... : réponse définitive, mise en cache) d'une erreur passagère.
+        Args:
+            response (requests.Response): Réponse de l'API de la forge.
+        Returns:
+            bool: True si le dépôt n'est pas accessible.
+        Raises:
+            requests.exceptions.HTTPError: Pour une erreur passagère (RETRY_STATUSES, 5xx), qui ne doit pas être mise en cache.
+        """
+        if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+            response.raise_for_status()
+        return not response.ok
+
+    def fetch_github(self, url):
+        """
+        Récupère les métadonnées d'un dépôt GitHub.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            dict: Métadonnées au format des projets ({"reachable": False} pour un lien mort).
+        """
+        parts = self.repo_path(url).split('/')
+        response = self.github_tokens.get(f"https://api.github.com/repos/{parts[0]}/{parts[1]}", 'ext:github', session=self.session, headers=self.github_headers, timeout=30)
+        if self.is_dead_link(response):
+            return {"reachable": False}
+        data = response.json()
+        return {
+            "stars": data.get("stargazers_count"),
+            "forks": data.get("forks_count"),
+            "submitted_date": data.get("created_at"),
+            "updated_date": data.get("pushed_at"),
+            "abstract": data.get("description"),
+            "softProgrammingLanguage": [data["language"]] if data.get("language") else [],
+            "github_id": data.get("id"),
+        }
+
+    def gitlab_api_base(self, url):
+        """
+        Détermine l'instance GitLab d'un lien.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            str: URL de base de l'instance (schéma du lien, sous-chemin éventuel de l'instance).
+            str: Chemin du projet relatif à l'instance.
+        """
+        parsed = urlparse(url)
+        path = self.repo_path(url)
+        for instance in self.gitlab_instances:
+            instance_url = urlparse(instance)
+            prefix = instance_url.path.strip('/')
+            if instance_url.netloc.lower() == parsed.netloc.lower() and prefix and (path == prefix or path.startswith(prefix + '/')):
+                return f"{parsed.scheme}://{parsed.netloc}/{prefix}", path[len(prefix):].strip('/')
+        return f"{parsed.scheme}://{parsed.netloc}", path
+
+    def fetch_gitlab(self, url):
+        """
+        Récupère les métadonnées d'un projet d'une instance GitLab.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            dict: Métadonnées au format des projets ({"reachable": False} pour un lien mort).
+        """
+        base_url, path = self.gitlab_api_base(url)
+        project_path = quote(path, safe='')
+        response = Metrics.http_get(f"{base_url}/api/v4/projects/{project_path}", 'ext:gitlab', session=self.session, timeout=30)
+        if self.is_dead_link(response):
+            return {"reachable": False}
+        data = response.json()
+        return {
+            "stars": data.get("star_count"),
+            "forks": data.get("forks_count"),
+            "submitted_date": data.get("created_at"),
+            "updated_date": data.get("last_activity_at"),
+            "abstract": data.get("description"),
+            "keywords": ", ".join(data.get("topics", [])),
+            "gitlab_id": data.get("id"),
+        }
+
+    def fetch_bitbucket(self, url):
+        """
+        Récupère les métadonnées d'un dépôt Bitbucket.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            dict: Métadonnées au format des projets ({"reachable": False} pour un lien mort).
+        """
+        parts = self.repo_path(url).split('/')
+        response = Metrics.http_get(f"https://api.bitbucket.org/2.0/repositories/{parts[0]}/{parts[1]}", 'ext:bitbucket', session=self.session, timeout=30)
+        if self.is_dead_link(response):
+            return {"reachable": False}
+        data = response.json()
+        return {
+            "submitted_date": data.get("created_on"),
+            "updated_date": data.get("updated_on"),
+            "abstract": data.get("description"),
+            "softProgrammingLanguage": [data["language"]] if data.get("language") else [],
+        }
+
+    def fetch_git(self, url):
+        """
+        Vérifie qu'un dépôt git d'une forge inconnue est accessible.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            dict: Métadonnées au format des projets.
+        """
+        # On vérifie seulement que le dépôt répond au protocole git "smart HTTP"
+        response = Metrics.http_get(f"{url.rstrip('/')}/info/refs", 'ext:git', session=self.session, params={'service': 'git-upload-pack'}, timeout=30)
+        if response.status_code == 429 or response.status_code >= 500:
+            # Indisponibilité passagère : l'erreur n'est pas mise en cache
+            response.raise_for_status()
+        return {"reachable": response.status_code == 200}
+
+    def resolve_link(self, url):
+        """
+        Récupère les métadonnées d'un lien auprès de sa forge.
+        Args:
+            url (str): Lien du dépôt de code.
+        Returns:
+            tuple: (url, métadonnées ou None, message d'erreur ou None).
+        """
+        fetchers = {
+            'github': self.fetch_github,
+            'gitlab': self.fetch_gitlab,
+            'bitbucket': self.fetch_bitbucket,
+            'git': self.fetch_git,
+        }
+        try:
+            return url, fetchers[self.detect_forge(url)](url), None
+        except (requests.exceptions.RequestException, IndexError, ValueError) as e:
+            return url, None, str(e)
+
+    def resolve_links(self, urls):
+        """
+        Résout un ensemble de liens par lots parallèles, en ignorant ceux déjà présents dans le cache.
+        Args:
+            urls (iterable): Liens à résoudre.
+        Returns:
+            dict: Métadonnées par URL (les liens en erreur sont absents).
+        """
+        urls = list(urls)
+        unique_urls = [url for url in dict.fromkeys(urls) if url]
+        pending = [url for url in unique_urls if url not in self.cache]
+        Metrics.cache_lookup('ext_cache', hit=True, value=len(unique_urls) - len(pending))
+        Metrics.cache_lookup('ext_cache', hit=False, value=len(pending))
+        print(f"{len(pending)} liens à résoudre ({len(self.cache)} déjà en cache).")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                for url, metadata, error in executor.map(self.resolve_link, batch):
+                    if error:
+                        # Les erreurs (limite de taux, dépôt indisponible...) ne sont pas mises en cache
+                        print(f"Échec de la résolution de {url} : {error}")
+                        continue
+                    self.cache[url] = metadata
+                self.save_cache()
+                print(f"{min(start + self.batch_size, len(pending))}/{len(pending)} liens traités.")
+
+        return {url: self.cache[url] for url in urls if url in self.cache}
+
+    def enrich_output(self, json_output):
+        """
+        Complète les projets générés par generate_json_output avec les métadonnées de leur forge.
+        Args:
+            json_output (dict): Sortie de ExtJSON.generate_json_output.
+        Returns:
+            dict: La même structure, projets enrichis.
+        """
+        metadata = self.resolve_links(project["softCodeRepository"] for project in json_output["projects"])
+        for project in json_output["projects"]:
+            project.update(metadata.get(project["softCodeRepository"], {}))
+        return json_output
+
+def read_gitlab_hosts(file_path=DEFAULT_LABS_FILE):
+    """
+    Lit les URL des instances GitLab à partir du fichier des laboratoires GitLab.
+    Args:
+        file_path (str): Chemin du fichier (format "laboratoire : url", par défaut Gitlab/labs_gitlab.txt du dépôt).
+    Returns:
+        set: URL de base des instances GitLab (avec leur sous-chemin éventuel).
+    """
+    hosts = set()
+    if os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if ':' in line:
+                    instance = line.split(':', 1)[1].strip().rstrip('/')
+                    if urlparse(instance).netloc:
+                        hosts.add(instance)
+    return hosts
@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics
+from Common.TokenPool import TokenPool
+
+""" Service de comptage des commits des dépôts GitHub.
+
+    L'historique d'un dépôt ne fait que s'allonger : son nombre de commits ne peut changer que si pushed_at a changé.
+    Le service conserve, pour chaque dépôt, le nombre de commits avec le pushed_at et le sha de HEAD auxquels il a été
+    calculé, et ne le recalcule que si pushed_at a bougé : une mise à jour n'appelle plus l'API pour les dépôts inchangés.
+
+    Les nombres à recalculer sont demandés par lots à l'API GraphQL (history.totalCount de la branche par défaut,
+    jusqu'à GRAPHQL_BATCH_SIZE dépôts par requête). Sans jeton (GraphQL exige une authentification), ou pour les
+    dépôts que GraphQL n'a pas résolus, le service revient à l'appel REST /commits?per_page=1 et au numéro de la
+    dernière page de l'en-tête Link.
+
+    Base : CARTO_COMMIT_COUNTS (par défaut github_commit_counts.db à la racine du dépôt). """
+
+DEFAULT_COUNTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'github_commit_counts.db')
+GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_BATCH_SIZE = 50
+
+class CommitCountService:
+    def __init__(self, token_pool, headers=None, db_file=None, batch_size=GRAPHQL_BATCH_SIZE):
+        """
+        Initialise le service.
+        Args:
+            token_pool (TokenPool): Pool de jetons des appels REST (le budget GraphQL, distinct, a son propre pool).
+            headers (dict): En-têtes des appels REST.
+            db_file (str): Fichier SQLite (par défaut, CARTO_COMMIT_COUNTS ou DEFAULT_COUNTS_FILE).
+            batch_size (int): Nombre de dépôts par requête GraphQL.
+        """
+        self.token_pool = TokenPool.from_tokens(token_pool)
+        self.graphql_pool = TokenPool(self.token_pool.tokens, source='github_graphql') if self.token_pool.authenticated else None
+        self.headers = headers or {'Accept': 'application/vnd.github.v3+json'}
+        self.batch_size = batch_size
+        self.db_file = db_file or os.environ.get('CARTO_COMMIT_COUNTS', DEFAULT_COUNTS_FILE)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_file, timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS Commit_Count
+                             (Repo TEXT PRIMARY KEY, Pushed_At TEXT, Head_Sha TEXT, Count INTEGER, Computed_At REAL)''')
+        self.conn.commit()
+
+    def cached(self, repo_name, pushed_at):
+        """
+        Retourne le nombre de commits conservé pour un dépôt s'il a été calculé au même pushed_at.
+        Args:
+            repo_name (str): Nom du dépôt ("owner/name").
+            pushed_at (str): Date du dernier push connue pour le dépôt.
+        Returns:
+            int: Nombre de commits, ou None s'il faut le recalculer.
+        """
+        if not pushed_at:
+            return None
+        with self.lock:
+            row = self.conn.execute('SELECT Pushed_At, Count FROM Commit_Count WHERE Repo = ?', (repo_name.lower(),)).fetchone()
+        hit = row is not None and row[0] == pushed_at
+        Metrics.cache_lookup('commit_counts', hit=hit)
+        return row[1] if hit else None
+
+    def store(self, repo_name, pushed_at, head_sha, count):
+        """
+        Conserve le nombre de commits d'un dépôt.
+        Args:
+            repo_name (str): Nom du dépôt.
+            pushed_at (str): pushed_at auquel le nombre a été calculé.
+            head_sha (str): sha de HEAD à ce moment (None s'il est inconnu).
+            count (int): Nombre de commits.
+        """
+        if not pushed_at:
+            return
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO Commit_Count (Repo, Pushed_At, Head_Sha, Count, Computed_At) VALUES (?, ?, ?, ?, ?)',
+                              (repo_name.lower(), pushed_at, head_sha, count, time.time()))
+            self.conn.commit()
+
+    def count_rest(self, repo_name):
+        """
+        Calcule le nombre de commits d'un dépôt avec l'API REST (numéro de la dernière page de /commits?per_page=1).
+        Args:
+            repo_name (str): Nom du dépôt.
+        Returns:
+            int: Nombre de commits (None si l'appel a échoué).
+            str: sha de HEAD (None s'il est inconnu).
+        """
+        api_url = f"https://api.github.com/repos/{repo_name}/commits"
+        response = self.token_pool.get(api_url, 'github:commits', headers=self.headers, params={'per_page': 1})
+        if response.status_code == 409:
+            # Dépôt vide
+            return 0, None
+        if response.status_code != 200:
+            return None, None
+        commits = response.json()
+        head_sha = commits[0].get("sha") if commits else None
+        if 'Link' in response.headers:
+            last_page_link = [link for link in response.headers['Link'].split(',') if 'rel="last"' in link]
+            if last_page_link:
+                last_page_url = last_page_link[0].split(';')[0].strip('<> ')
+                return int(last_page_url.split('page=')[-1]), head_sha
+        return len(commits), head_sha
+
+    def count_graphql(self, repo_names):
+        """
+        Calcule le nombre de commits de plusieurs dépôts en une requête GraphQL (history.totalCount).
+        Args:
+            repo_names (list): Noms des dépôts ("owner/name").
+        Returns:
+            dict: Nom du dépôt -> (nombre de commits, sha de HEAD), pour les dépôts résolus.
+        """
+        fields = []
+        for index, repo_name in enumerate(repo_names):
+            owner, _, name = repo_name.partition('/')
+            fields.append(f'r{index}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) '
+                          '{ defaultBranchRef { target { ... on Commit { oid history { totalCount } } } } }')
+        query = "query {\n" + "\n".join(fields) + "\n}"
+        response = self.graphql_pool.post(GRAPHQL_URL, 'github:graphql', json={"query": query})
+        if response.status_code != 200:
+            return {}
+        data = response.json().get("data") or {}
+
+        counts = {}
+        for index, repo_name in enumerate(repo_names):
+            repository = data.get(f"r{index}")
+            if repository is None:
+                # Dépôt introuvable ou inaccessible : l'appel REST tranchera
+                continue
+            branch = repository.get("defaultBranchRef")
+            if branch is None:
+                counts[repo_name] = (0, None)
+                continue
+            target = branch.get("target") or {}
+            counts[repo_name] = (target.get("history", {}).get("totalCount", 0), target.get("oid"))
+        return counts
+
+    def count(self, repo_name, pushed_at=None):
+        """
+        Retourne le nombre de commits d'un dépôt, recalculé seulement si pushed_at a changé.
+        Args:
+            repo_name (str): Nom du dépôt.
+            pushed_at (str): Date du dernier push (champ pushed_at de /repos/{owner}/{name}).
+        Returns:
+            int: Nombre de commits (0 si le calcul a échoué).
+        """
+        return self.count_many([(repo_name, pushed_at)])[repo_name]
+
+    def count_many(self, repos):
+        """
+        Retourne le nombre de commits de plusieurs dépôts : les nombres conservés sont réutilisés, les autres
+        sont calculés par lots avec GraphQL, puis avec l'API REST pour les dépôts restants.
+        Args:
+            repos (list): Couples (nom du dépôt, pushed_at).
+        Returns:
+            dict: Nom du dépôt -> nombre de commits (0 si le calcul a échoué).
+        """
+        counts = {}
+        pending = {}
+        for repo_name, pushed_at in repos:
+            count = self.cached(repo_name, pushed_at)
+            if count is None:
+                pending[repo_name] = pushed_at
+            else:
+                counts[repo_name] = count
+
+        names = list(pending)
+        if self.graphql_pool is not None:
+            for start in range(0, len(names), self.batch_size):
+                for repo_name, (count, head_sha) in self.count_graphql(names[start:start + self.batch_size]).items():
+                    counts[repo_name] = count
+                    self.store(repo_name, pending[repo_name], head_sha, count)
+
+        for repo_name in names:
+            if repo_name in counts:
+                continue
+            count, head_sha = self.count_rest(repo_name)
+            if count is None:
+                counts[repo_name] = 0
+                continue
+            counts[repo_name] = count
+            self.store(repo_name, pending[repo_name], head_sha, count)
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
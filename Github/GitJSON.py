@@ -1,21 +1,30 @@
 import requests
-import json
-import time
+import os
+import sys
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import load_projects_file, save_projects_file
+from Common.ResponseStore import ResponseStore
+from Common.TokenPool import TokenPool
+
 """ A partir du fichier JSON généré par la recherche sur Hal ou SH, on va extraire les URLs des dépôts GitHub et récupérer les informations de ces dépôts. 
     On va ensuite sauvegarder les informations des dépôts GitHub dans le fichier JSON de sortie : CNRS_GITHUB_FROM_SH.json ou CNRS_GITHUB_FROM_HAL.json"""
 
 class GitHubRepoInfoCollector:
-    def __init__(self, token):
+    def __init__(self, token, response_store=None):
         """
-        Initialise la classe avec un jeton d'authentification GitHub.
+        Initialise la classe avec un ou plusieurs jetons d'authentification GitHub.
         Args:
-            token (str): Jeton d'authentification GitHub.
+            token (str | list | TokenPool): Jeton, liste de jetons ou pool de jetons GitHub (voir Common.TokenPool).
+            response_store (ResponseStore): Réponses conservées partagées avec les autres collecteurs (par défaut, le stockage commun).
         """
+        self.token_pool = TokenPool.from_tokens(token)
+        self.response_store = response_store or ResponseStore()
         
         self.headers = {
-            'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json'
         }
 
@@ -35,11 +44,12 @@ class GitHubRepoInfoCollector:
 
         api_url = f"https://api.github.com/repos/{repo_name}"
         try:
-            response = requests.get(api_url, headers=self.headers)
+            response = self.response_store.fetch(api_url, lambda: self.token_pool.get(api_url, 'github:repos', headers=self.headers),
+                                                 scope=self.token_pool.identity)
             if response.status_code == 404:
                 return None, "Repository not found"
             elif response.status_code == 403:
-                return None, "Rate limit exceeded"
+                return None, "Access forbidden"
             response.raise_for_status()
             return response.json(), None
         except requests.exceptions.RequestException as e:
@@ -115,22 +125,17 @@ class GitHubRepoInfoCollector:
                 continue
 
             repo_data, error = self.fetch_repo_data(github_url)
+            # Les limites de taux sont gérées par le pool de jetons : une erreur ici est définitive
             if error:
-                if error == "Rate limit exceeded":
-                    print("Rate limit exceeded, sleeping for 60 seconds")
-                    time.sleep(60)
-                    repo_data, error = self.fetch_repo_data(github_url)
-                
-                if error:
-                    results["projects"].append({
-                        "project_number": project_counter,
-                        "title": project["title"],
-                        "repo_source": source_field,
-                        "repo_url": github_url,
-                        "error": error
-                    })
-                    project_counter += 1
-                    continue
+                results["projects"].append({
+                    "project_number": project_counter,
+                    "title": project["title"],
+                    "repo_source": source_field,
+                    "repo_url": github_url,
+                    "error": error
+                })
+                project_counter += 1
+                continue
 
             project_info = {
                 "project_number": project_counter,
@@ -149,28 +154,34 @@ class GitHubRepoInfoCollector:
         Sauvegarde les données dans un fichier JSON.
         Args:
             data (dict): Données à sauvegarder.
-            filename (str): Nom du fichier de sortie.
+            filename (str): Nom du fichier de sortie (.json ou .jsonl.gz).
         """
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        save_projects_file(data, filename)
 
-def main():
+def main(input_file='../SH/SH_CNRS_PROJ_INFO.json', output_file='CNRS_GITHUB_FROM_SH.json', token="YOUR_GITHUB_API_TOKEN_HERE"):
     """
     Fonction principale pour charger les projets, récupérer les informations GitHub, et sauvegarder les résultats.
+    Args:
+        input_file (str): Fichier des projets HAL ou SH (METTRE LE BON CHEMIN VERS LE FICHIER CNRS_HAL ou SH).
+        output_file (str): Fichier de sortie des informations GitHub.
+        token (str | list): Jeton GitHub, ou plusieurs jetons (liste ou chaîne séparée par des virgules).
     """
-    # Charger les projets à partir d'un fichier JSON (METTRE LE BON CHEMIN VERS LE FICHIER CNRS_HAL)
-    with open('../SH/SH_CNRS_PROJ_INFO.json', 'r', encoding='utf-8') as f:
-        projects_data = json.load(f)
+    # Charger les projets à partir d'un fichier JSON
+    projects_data = load_projects_file(input_file)
 
     # Créer une instance de GitHubRepoInfoCollector avec votre jeton GitHub personnel
-    github_collector = GitHubRepoInfoCollector(token="YOUR_GITHUB_API_TOKEN_HERE")
+    github_collector = GitHubRepoInfoCollector(token=token)
 
     # Traiter les projets et récupérer les informations GitHub
-    results = github_collector.process_projects(projects_data["projects"])
+    with Metrics.phase('collect'):
+        results = github_collector.process_projects(projects_data["projects"])
 
     # Enregistrer les résultats dans un fichier JSON
-    github_collector.save_json(results, 'CNRS_GITHUB_FROM_SH.json')
+    github_collector.save_json(results, output_file)
+    github_collector.response_store.close()
+    Metrics.write_run_report(os.path.splitext(os.path.basename(output_file))[0])
 
 if __name__ == "__main__":
-    main()
+    with Profiling.profile_stage('github'):
+        main()
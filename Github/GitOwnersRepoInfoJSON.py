@@ -1,21 +1,35 @@
-import requests
 import json
 import re
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import load_projects_file, save_projects_file
+from Common.ResponseStore import ResponseStore
+from Common.Scheduler import RefreshScheduler
+from Common.TokenPool import TokenPool
+from Common.WorkQueue import WorkQueue
+from CommitCounts import GRAPHQL_BATCH_SIZE, CommitCountService
 
 """ A partir du fichier généré par GitOwnersRepoJSON.py, on va extraire les URLs des dépôts GitHub et récupérer les informations de ces dépôts."""
 
 class GitHubRepoInfoCollector:
-    def __init__(self, token):
+    def __init__(self, token, response_store=None, commit_counts=None):
         """
-        Initialise la classe avec un jeton d'authentification GitHub.
+        Initialise la classe avec un ou plusieurs jetons d'authentification GitHub.
         Args:
-            token (str): Jeton d'authentification GitHub.
+            token (str | list | TokenPool): Jeton, liste de jetons ou pool de jetons GitHub (voir Common.TokenPool).
+            response_store (ResponseStore): Réponses conservées partagées avec les autres collecteurs (par défaut, le stockage commun).
+            commit_counts (CommitCountService): Nombres de commits conservés (par défaut, la base commune).
         """
+        self.token_pool = TokenPool.from_tokens(token)
+        self.response_store = response_store or ResponseStore()
         self.headers = {
-            'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json'
         }
+        self.commit_counts = commit_counts or CommitCountService(self.token_pool, self.headers)
 
     def fetch_repo_data(self, repo_url):
         """
@@ -31,32 +45,13 @@ class GitHubRepoInfoCollector:
             return None, "Invalid GitHub URL"
 
         api_url = f"https://api.github.com/repos/{repo_name}"
-        response = requests.get(api_url, headers=self.headers)
+        response = self.response_store.fetch(api_url, lambda: self.token_pool.get(api_url, 'github:repos', headers=self.headers),
+                                             scope=self.token_pool.identity)
         if response.status_code == 200:
             return response.json(), None
         else:
             return None, "Failed to fetch repo"
 
-    def fetch_commit_count(self, repo_name):
-        """
-        Récupère le nombre de commits d'un dépôt GitHub.
-        Args:
-            repo_name (str): Nom du dépôt GitHub.
-        Returns:
-            int: Nombre de commits.
-        """
-        api_url = f"https://api.github.com/repos/{repo_name}/commits"
-        response = requests.get(api_url, headers=self.headers, params={'per_page': 1})
-        if response.status_code == 200:
-            if 'Link' in response.headers:
-                last_page_link = [link for link in response.headers['Link'].split(',') if 'rel="last"' in link]
-                if last_page_link:
-                    last_page_url = last_page_link[0].split(';')[0].strip('<> ')
-                    num_commits = int(last_page_url.split('page=')[-1])
-                    return num_commits
-            return len(response.json())
-        return 0
-
     def extract_repo_name(self, url):
         """
         Extrait le nom du dépôt GitHub à partir de l'URL.
@@ -99,46 +94,46 @@ class GitHubRepoInfoCollector:
             "commit_count": commit_count
         }
 
-    def process_project(self, project):
+    def process_projects(self, projects):
         """
-        Traite un projet et récupère les informations du dépôt GitHub associé.
+        Traite un lot de projets : les nombres de commits du lot sont demandés ensemble (voir CommitCounts).
         Args:
-            project (dict): Données du projet.
+            projects (list): Données des projets.
         Returns:
-            dict: Résultats avec les informations du dépôt GitHub.
+            list: Résultats, dans l'ordre des projets.
         """
-        github_url = project.get("softCodeRepository")
+        fetched = []
+        for project in projects:
+            github_url = project.get("softCodeRepository")
+            repo_data, error = self.fetch_repo_data(github_url)
+            fetched.append((project, github_url, repo_data, error))
+
+        commit_counts = self.commit_counts.count_many([(self.extract_repo_name(github_url), repo_data.get("pushed_at"))
+                                                       for project, github_url, repo_data, error in fetched if not error])
 
-        repo_data, error = self.fetch_repo_data(github_url)
-        if error:
-            return {
+        results = []
+        for project, github_url, repo_data, error in fetched:
+            result = {
                 "project_number": project["project_number"],
                 "title": project["title"],
                 "repo_source": "softCodeRepository",
-                "repo_url": github_url,
-                "error": error
+                "repo_url": github_url
             }
-
-        repo_name = self.extract_repo_name(github_url)
-        commit_count = self.fetch_commit_count(repo_name)
-
-        return {
-            "project_number": project["project_number"],
-            "title": project["title"],
-            "repo_source": "softCodeRepository",
-            "repo_url": github_url,
-            "repo_info": self.collect_info(repo_data, commit_count)
-        }
+            if error:
+                result["error"] = error
+            else:
+                result["repo_info"] = self.collect_info(repo_data, commit_counts[self.extract_repo_name(github_url)])
+            results.append(result)
+        return results
 
     def save_json(self, data, filename):
         """
         Sauvegarde les données dans un fichier JSON.
         Args:
             data (dict): Données à sauvegarder.
-            filename (str): Nom du fichier de sortie.
+            filename (str): Nom du fichier de sortie (.json ou .jsonl.gz).
         """
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        save_projects_file(data, filename)
 
 def load_state(state_file):
     """
@@ -163,38 +158,110 @@ def save_state(state, state_file):
     with open(state_file, 'w', encoding='utf-8') as f:
         json.dump(state, f, ensure_ascii=False, indent=4)
 
-def main():
+def load_previous_results(output_filepath):
+    """
+    Charge les résultats de la collecte précédente, indexés par URL de dépôt (seuls les résultats sans erreur).
+    Args:
+        output_filepath (str): Fichier de sortie de la collecte précédente.
+    Returns:
+        dict: URL du dépôt -> résultat.
+    """
+    if not os.path.exists(output_filepath):
+        return {}
+    return {result["repo_url"]: result for result in load_projects_file(output_filepath).get("projects", []) if "repo_info" in result}
+
+def main(input_filepath='CNRS_GITHUB_HAL_OWNERS_REPOS.json', output_filepath='CNRS_GITHUB_HAL_OWNERS_REPOS_INFO.json', token="YOUR_GITHUB_API_TOKEN_HERE", batch_size=GRAPHQL_BATCH_SIZE, refresh_budget=None, work_queue=None):
     """
     Fonction principale pour charger les projets, récupérer les informations GitHub, et sauvegarder les résultats.
+
+    Les dépôts à recollecter sont choisis par le planificateur (Common.Scheduler) d'après leur pushed_at :
+    les dépôts nouveaux sont toujours collectés, les dépôts inactifs sont revisités de plus en plus rarement,
+    et les autres reprennent le résultat de la collecte précédente.
+    Args:
+        input_filepath (str): Fichier généré par GitOwnersRepoJSON.py.
+        output_filepath (str): Fichier de sortie des informations GitHub.
+        token (str | list): Jeton GitHub, ou plusieurs jetons (liste ou chaîne séparée par des virgules).
+        batch_size (int): Nombre de projets traités ensemble (l'état est sauvegardé après chaque lot).
+        refresh_budget (int): Nombre maximal de dépôts déjà connus à recollecter (None : tous ceux qui sont dus).
+        work_queue (str): Nom d'une file de travail (Common.WorkQueue) pour répartir la collecte entre plusieurs
+            processus exécutant main avec les mêmes paramètres ; un seul écrit la sortie, une fois la file vidée.
     """
-    input_filepath = 'CNRS_GITHUB_HAL_OWNERS_REPOS.json'
-    output_filepath = 'CNRS_GITHUB_HAL_OWNERS_REPOS_INFO.json'
     state_filepath = 'owner_info_state.json'
 
-    with open(input_filepath, 'r', encoding='utf-8') as f:
-        projects_data = json.load(f)
+    projects_data = load_projects_file(input_filepath)
 
-    github_collector = GitHubRepoInfoCollector(token="YOUR_GITHUB_API_TOKEN_HERE")
+    github_collector = GitHubRepoInfoCollector(token=token)
     state = load_state(state_filepath)
     last_processed_index = state["last_processed_index"]
     results = state["results"]
 
-    for index in range(last_processed_index + 1, len(projects_data["projects"])):
-        project = projects_data["projects"][index]
-        result = github_collector.process_project(project)
-        results.append(result)
+    projects = projects_data["projects"]
+    previous_results = load_previous_results(output_filepath)
+    scheduler = RefreshScheduler('github_repos')
+    # Les dépôts de la collecte précédente inconnus du planificateur sont enregistrés sans être recollectés
+    scheduler.seed((url, result["repo_info"].get("pushed_at"), result["repo_info"].get("pushed_at")) for url, result in previous_results.items())
+    repo_urls = [project.get("softCodeRepository") for project in projects[last_processed_index + 1:]]
+    refresh = scheduler.plan(repo_urls, refresh_budget, required=[url for url in repo_urls if url not in previous_results])
+
+    def is_fresh(project):
+        github_url = project.get("softCodeRepository")
+        return github_url in previous_results and github_url not in refresh
+
+    def process_batch(batch):
+        # batch : couples (projet, à recollecter)
+        fetched = iter(github_collector.process_projects([project for project, refreshed in batch if refreshed]))
+        batch_results = []
+        for project, refreshed in batch:
+            github_url = project.get("softCodeRepository")
+            if not refreshed:
+                # Dépôt à jour d'après le planificateur : résultat de la collecte précédente
+                batch_results.append(dict(previous_results[github_url], project_number=project["project_number"], title=project["title"]))
+                continue
+            result = next(fetched)
+            if "repo_info" in result:
+                pushed_at = result["repo_info"].get("pushed_at")
+                scheduler.observe(github_url, pushed_at, changed_at=pushed_at)
+            batch_results.append(result)
+        return batch_results
+
+    if work_queue:
+        # Le choix des dépôts à recollecter est fixé par le premier processus qui remplit la file
+        with WorkQueue(work_queue) as queue:
+            queue.enqueue((index, {"project": project, "refresh": not is_fresh(project)}) for index, project in enumerate(projects))
+            queue.run_worker(lambda items: process_batch([(item["project"], item["refresh"]) for item in items]), batch_size=batch_size)
+            # results vaut None si la sortie est écrite par un autre processus
+            results = [result for key, result in queue.results()] if queue.claim_output() else None
+            for item in queue.dead_letters() if results is not None else []:
+                project = item["payload"]["project"]
+                results.append({
+                    "project_number": project["project_number"],
+                    "title": project["title"],
+                    "repo_source": "softCodeRepository",
+                    "repo_url": project.get("softCodeRepository"),
+                    "error": item["error"]
+                })
+    else:
+        for start in range(last_processed_index + 1, len(projects), batch_size):
+            batch = projects[start:start + batch_size]
+            results.extend(process_batch([(project, not is_fresh(project)) for project in batch]))
 
-        # Mise à jour de l'état
-        state["last_processed_index"] = index
-        state["results"] = results
-        save_state(state, state_filepath)
+            # Mise à jour de l'état
+            state["last_processed_index"] = start + len(batch) - 1
+            state["results"] = results
+            save_state(state, state_filepath)
 
     # Sauvegarder les résultats finaux
-    github_collector.save_json({"projects": results}, output_filepath)
+    if results is not None:
+        github_collector.save_json({"projects": results}, output_filepath)
+    github_collector.response_store.close()
+    github_collector.commit_counts.close()
+    scheduler.close()
+    Metrics.write_run_report('github_owners_info')
 
     # Suppression du fichier d'état après avoir terminé
     if os.path.exists(state_filepath):
         os.remove(state_filepath)
 
 if __name__ == "__main__":
-    main()
+    with Profiling.profile_stage('github_owners_info'):
+        main()
@@ -2,25 +2,57 @@ import requests
 import json
 import time
 import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import load_projects_file, save_projects_file
+from Common.ResponseStore import ResponseStore
+from Common.Sharding import HashRing, partition_file
+from Common.TokenPool import TokenPool
+from Common.WorkQueue import WorkQueue
 
 """ A partir du fichier généré par Github/GitJSON.py, on va extraire les propriétaires des dépôts GitHub et récupérer les informations
 de base de ces dépôts."""
 
+# En mode incrémental, une collecte complète (qui retire les dépôts supprimés) est faite tous les DEFAULT_FULL_CRAWL_DAYS jours
+DEFAULT_FULL_CRAWL_DAYS = 30
+# Clé du fichier de dates de collecte réservée à la date de la dernière collecte complète (« * » est exclu des noms GitHub)
+FULL_CRAWL_KEY = '*full_crawl*'
+
 class GitHubRepoFetcher:
-    def __init__(self, github_api_token, state_file='owner_state.json'):
+    def __init__(self, github_api_token, state_file='owner_state.json', response_store=None,
+                 incremental=False, previous_projects=None, crawl_state_file='owner_crawl_state.json'):
         """
-        Initialise la classe avec un jeton GitHub et un fichier d'état.
+        Initialise la classe avec un ou plusieurs jetons GitHub et un fichier d'état.
+
+        En mode incrémental, les dépôts de chaque propriétaire sont listés du plus récemment modifié au plus ancien,
+        et la liste s'arrête au premier dépôt non modifié depuis la dernière collecte du propriétaire : seuls les
+        dépôts modifiés sont demandés, puis fusionnés (par github_id) dans les projets de la collecte précédente.
+        Les dépôts supprimés ou devenus privés ne sont pas retirés en mode incrémental.
         Args:
-            github_api_token (str): Jeton d'authentification GitHub.
+            github_api_token (str | list | TokenPool): Jeton, liste de jetons ou pool de jetons GitHub (voir Common.TokenPool).
             state_file (str): Nom du fichier d'état pour sauvegarder la progression.
+            response_store (ResponseStore): Réponses conservées partagées avec les autres collecteurs (par défaut, le stockage commun).
+            incremental (bool): Active la collecte incrémentale.
+            previous_projects (list): Projets de la collecte précédente (mode incrémental).
+            crawl_state_file (str): Fichier contenant la date de dernière collecte de chaque propriétaire.
         """
-        self.github_api_token = github_api_token
+        self.token_pool = TokenPool.from_tokens(github_api_token)
+        self.response_store = response_store or ResponseStore()
         self.headers = {
-            'Authorization': f'token {self.github_api_token}',
             'Accept': 'application/vnd.github.v3+json'
         }
         self.state_file = state_file
         self.load_state()
+        self.incremental = incremental
+        self.crawl_state_file = crawl_state_file
+        self.crawl_state = load_crawl_state(crawl_state_file) if incremental else {}
+        self.previous_projects = {}
+        for project in previous_projects or []:
+            self.previous_projects.setdefault(repo_owner(project.get("softCodeRepository", "")), []).append(project)
 
     def load_state(self):
         """
@@ -56,70 +88,125 @@ class GitHubRepoFetcher:
                 continue
 
             try:
-                repos = self.fetch_user_repos(owner)
-                for repo in repos:
-                    repo_data = self.fetch_repo(owner, repo['name'])
-                    if repo_data:
-                        contributors = self.fetch_repo_contributors(owner, repo['name'])
-                        organization = repo_data.get("organization", {"login": ""})
-                        topics = ", ".join(repo.get("topics", [])) if repo.get("topics") else ""
-                        languages = [repo.get("language", "")] if repo.get("language") else []
-                        project_data = {
-                            "project_number": self.state['project_counter'],
-                            "title": repo.get("name", ""),
-                            "authors": contributors,
-                            "submitted_date": repo.get("created_at", ""),
-                            "updated_date": repo.get("updated_at", ""),
-                            "laboratory": organization.get("login", ""),
-                            "domain": topics,
-                            "abstract": repo.get("description", ""),
-                            "keywords": "",
-                            "github_id": repo.get("id", ""),
-                            "structures": "",
-                            "softCodeRepository": repo.get("html_url", ""),
-                            "forge": "github.com",
-                            "softProgrammingLanguage": languages,
-                            "source": "Github_modality_1",
-                            "hal_id": "",
-                            "authIdHal_s": "",    
-                            "authIdHal_i": ""
-                        }
-                        self.state['projects'].append(project_data)
-                        self.state['project_counter'] += 1
-
+                owner_projects, crawled_at = self.fetch_owner(owner)
+                if crawled_at:
+                    self.crawl_state[owner] = crawled_at
             except requests.exceptions.RequestException as e:
-                self.state['projects'].append({
-                    "project_number": self.state['project_counter'],
-                    "title": "none",
-                    "authors": [{
-                        "name": owner,
-                        "AuthGithubId": owner
-                    }],
-                    "submitted_date": "none",
-                    "updated_date": "none",
-                    "laboratory": "none",
-                    "domain": "none",
-                    "abstract": "none",
-                    "keywords": "none",
-                    "hal_id": "none",
-                    "structures": "none",
-                    "softCodeRepository": "none",
-                    "forge": "github.com",
-                    "softProgrammingLanguage": "none",
-                    "source": "GitHub",
-                    "error": f"API request failed: {str(e)}"
-                })
-                self.state['project_counter'] += 1
+                owner_projects = [owner_error_project(owner, e)]
+            self.add_projects(owner_projects)
             
             self.state['owners_processed'].append(owner)
             self.save_state()
-            time.sleep(1)  # Sleep to avoid hitting rate limits too quickly
 
         return {
             "number_of_projects": len(self.state['projects']),
             "projects": self.state['projects']
         }
 
+    def fetch_repos_queued(self, owners, queue):
+        """
+        Variante de fetch_repos répartie entre plusieurs processus par une file de travail (voir Common.WorkQueue) :
+        chaque processus collecte les propriétaires qu'il réserve, puis, une fois la file vidée, assemble les projets
+        de tous les propriétaires dans l'ordre de la file. Un propriétaire en échec est réessayé par la file ; après
+        plusieurs échecs, il est signalé par un projet d'erreur.
+        Args:
+            owners (iterable): Propriétaires de dépôts GitHub.
+            queue (WorkQueue): File de travail de la collecte.
+        Returns:
+            dict: Dictionnaire contenant le nombre de projets et les informations des projets,
+                ou None si la sortie est écrite par un autre processus.
+        """
+        def handler(batch):
+            results = []
+            for owner in batch:
+                owner_projects, crawled_at = self.fetch_owner(owner)
+                results.append({"projects": owner_projects, "crawled_at": crawled_at})
+            return results
+
+        queue.enqueue((owner, owner) for owner in sorted(owners))
+        queue.run_worker(handler)
+        if not queue.claim_output():
+            return None
+
+        self.state = {"owners_processed": [], "projects": [], "project_counter": 1}
+        for owner, result in queue.results():
+            self.add_projects(result["projects"])
+            if result["crawled_at"]:
+                self.crawl_state[owner] = result["crawled_at"]
+            self.state['owners_processed'].append(owner)
+        for item in queue.dead_letters():
+            self.add_projects([owner_error_project(item["key"], item["error"])])
+        return {
+            "number_of_projects": len(self.state['projects']),
+            "projects": self.state['projects']
+        }
+
+    def add_projects(self, projects):
+        """
+        Ajoute les projets d'un propriétaire à l'état en les numérotant.
+        Args:
+            projects (list): Projets du propriétaire.
+        """
+        for project_data in projects:
+            project_data["project_number"] = self.state['project_counter']
+            self.state['projects'].append(project_data)
+            self.state['project_counter'] += 1
+
+    def fetch_owner(self, owner):
+        """
+        Récupère les projets d'un propriétaire (en mode incrémental, les dépôts modifiés depuis sa dernière collecte,
+        fusionnés dans ses projets de la collecte précédente).
+        Args:
+            owner (str): Nom du propriétaire du dépôt GitHub.
+        Returns:
+            list: Projets du propriétaire (numérotés par add_projects).
+            str: Date ISO 8601 de la collecte à enregistrer, ou None (mode non incrémental ou liste incomplète).
+        """
+        crawl_start = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        last_crawl = self.crawl_state.get(owner) if self.owner_projects(owner) else None
+        repos, complete = self.fetch_user_repos_since(owner, last_crawl)
+        owner_projects = []
+        for repo in repos:
+            repo_data = self.fetch_repo(owner, repo['name'])
+            if repo_data:
+                contributors = self.fetch_repo_contributors(owner, repo['name'])
+                organization = repo_data.get("organization", {"login": ""})
+                topics = ", ".join(repo.get("topics", [])) if repo.get("topics") else ""
+                languages = [repo.get("language", "")] if repo.get("language") else []
+                project_data = {
+                    "project_number": self.state['project_counter'],
+                    "title": repo.get("name", ""),
+                    "authors": contributors,
+                    "submitted_date": repo.get("created_at", ""),
+                    "updated_date": repo.get("updated_at", ""),
+                    "laboratory": organization.get("login", ""),
+                    "domain": topics,
+                    "abstract": repo.get("description", ""),
+                    "keywords": "",
+                    "github_id": repo.get("id", ""),
+                    "structures": "",
+                    "softCodeRepository": repo.get("html_url", ""),
+                    "forge": "github.com",
+                    "softProgrammingLanguage": languages,
+                    "source": "Github_modality_1",
+                    "hal_id": "",
+                    "authIdHal_s": "",    
+                    "authIdHal_i": ""
+                }
+                owner_projects.append(project_data)
+
+        if last_crawl:
+            # Delta fusionné dans les projets de la collecte précédente
+            owner_projects = merge_projects_by_github_id(self.owner_projects(owner), owner_projects)
+        return owner_projects, crawl_start if self.incremental and complete else None
+
+    def owner_projects(self, owner):
+        """
+        Returns:
+            list: Projets du propriétaire dans la collecte précédente.
+        """
+        return self.previous_projects.get(owner.lower(), [])
+
     def fetch_user_repos(self, owner):
         """
         Récupère les dépôts pour un propriétaire donné.
@@ -128,24 +215,47 @@ class GitHubRepoFetcher:
         Returns:
             list: Liste des dépôts.
         """
+        return self.fetch_user_repos_since(owner)[0]
+
+    def fetch_user_repos_since(self, owner, since=None):
+        """
+        Récupère les dépôts d'un propriétaire, éventuellement limités à ceux modifiés depuis une date.
+        Les dépôts sont alors demandés du plus récemment modifié au plus ancien, et la pagination s'arrête
+        au premier dépôt plus ancien que la date : un propriétaire peu actif ne coûte qu'une page.
+        Args:
+            owner (str): Nom du propriétaire du dépôt GitHub.
+            since (str): Date ISO 8601 de la dernière collecte (None pour tous les dépôts).
+        Returns:
+            list: Liste des dépôts.
+            bool: True si la liste est complète (False si une requête a échoué).
+        """
         repos = []
         page = 1
+        params = {'per_page': 100}
+        if since:
+            params.update({'sort': 'updated', 'direction': 'desc'})
         while True:
-            response = requests.get(f'https://api.github.com/users/{owner}/repos', headers=self.headers, params={'page': page, 'per_page': 100})
+            response = self.token_pool.get(f'https://api.github.com/users/{owner}/repos', 'github:user_repos', headers=self.headers, params=dict(params, page=page))
             if response.status_code == 200:
                 repos_data = response.json()
                 if not repos_data:
                     break
-                repos.extend(repos_data)
+                if since:
+                    # Les dates ISO 8601 en UTC se comparent comme des chaînes
+                    changed = [repo for repo in repos_data if max(repo.get("updated_at") or "", repo.get("pushed_at") or "") >= since]
+                    repos.extend(changed)
+                    if len(changed) < len(repos_data):
+                        break
+                else:
+                    repos.extend(repos_data)
+                if len(repos_data) < params['per_page']:
+                    break
                 page += 1
-            elif response.status_code == 403:
-                print(f"Rate limit exceeded, sleeping for 60 seconds")
-                time.sleep(60)
             else:
                 print(f"Failed to fetch repos for {owner}: {response.status_code}")
-                break
+                return repos, False
             
-        return repos
+        return repos, True
 
     def fetch_repo(self, owner, repo_name):
         """
@@ -158,14 +268,11 @@ class GitHubRepoFetcher:
         """
         attempts = 3
         while attempts > 0:
-            response = requests.get(f'https://api.github.com/repos/{owner}/{repo_name}', headers=self.headers)
+            api_url = f'https://api.github.com/repos/{owner}/{repo_name}'
+            response = self.response_store.fetch(api_url, lambda: self.token_pool.get(api_url, 'github:repos', headers=self.headers),
+                                                 scope=self.token_pool.identity)
             if response.status_code == 200:
                 return response.json()
-            elif response.status_code == 403 and 'X-RateLimit-Reset' in response.headers:
-                reset_time = int(response.headers['X-RateLimit-Reset'])
-                sleep_time = max(reset_time - time.time(), 0) + 1
-                print(f"Rate limit exceeded, sleeping for {sleep_time} seconds")
-                time.sleep(sleep_time)
             else:
                 print(f"Attempt to fetch repo {repo_name} failed: {response.status_code}")
                 attempts -= 1
@@ -182,11 +289,13 @@ class GitHubRepoFetcher:
             list: Liste des contributeurs avec leurs emails (si disponibles).
         """
         contributors = []
-        response = requests.get(f'https://api.github.com/repos/{owner}/{repo_name}/contributors', headers=self.headers)
+        response = self.token_pool.get(f'https://api.github.com/repos/{owner}/{repo_name}/contributors', 'github:contributors', headers=self.headers)
         if response.status_code == 200:
             contributors_data = response.json()
             for contributor in contributors_data:
-                contributor_detail_response = requests.get(contributor['url'], headers=self.headers)
+                contributor_detail_response = self.response_store.fetch(
+                    contributor['url'], lambda: self.token_pool.get(contributor['url'], 'github:users', headers=self.headers),
+                    scope=self.token_pool.identity)
                 if contributor_detail_response.status_code == 200:
                     contributor_detail = contributor_detail_response.json()
                     email = contributor_detail.get('email', 'Email not public')
@@ -203,47 +312,195 @@ class GitHubRepoFetcher:
                     })
         return contributors
 
+def owner_error_project(owner, error):
+    """
+    Construit le projet signalant l'échec de la collecte d'un propriétaire.
+    Args:
+        owner (str): Nom du propriétaire.
+        error: Exception ou description de l'erreur.
+    Returns:
+        dict: Projet d'erreur.
+    """
+    return {
+        "project_number": 0,
+        "title": "none",
+        "authors": [{
+            "name": owner,
+            "AuthGithubId": owner
+        }],
+        "submitted_date": "none",
+        "updated_date": "none",
+        "laboratory": "none",
+        "domain": "none",
+        "abstract": "none",
+        "keywords": "none",
+        "hal_id": "none",
+        "structures": "none",
+        "softCodeRepository": "none",
+        "forge": "github.com",
+        "softProgrammingLanguage": "none",
+        "source": "GitHub",
+        "error": f"API request failed: {str(error)}"
+    }
+
+def repo_owner(repo_url):
+    """
+    Extrait le propriétaire (en minuscules) de l'URL d'un dépôt GitHub.
+    Args:
+        repo_url (str): URL du dépôt (ex. https://github.com/owner/name).
+    Returns:
+        str: Propriétaire, ou "" si l'URL n'est pas celle d'un dépôt GitHub.
+    """
+    parts = repo_url.split('github.com/', 1)
+    return parts[1].split('/')[0].lower() if len(parts) == 2 else ""
+
+def merge_projects_by_github_id(previous_projects, new_projects):
+    """
+    Fusionne les projets modifiés dans les projets précédents d'un propriétaire, en se basant sur le github_id.
+    Les projets existants sont remplacés à leur position, les nouveaux sont ajoutés à la fin.
+    Args:
+        previous_projects (list): Projets issus de la collecte précédente.
+        new_projects (list): Projets modifiés depuis la collecte précédente.
+    Returns:
+        list: Liste fusionnée des projets.
+    """
+    merged = {project.get('github_id') or project.get('softCodeRepository'): project for project in previous_projects}
+    merged.update({project.get('github_id') or project.get('softCodeRepository'): project for project in new_projects})
+    return list(merged.values())
+
+def load_crawl_state(state_file):
+    """
+    Charge la date de dernière collecte de chaque propriétaire.
+    Args:
+        state_file (str): Chemin du fichier d'état.
+    Returns:
+        dict: Dictionnaire {propriétaire: date ISO 8601 de la dernière collecte}.
+    """
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_crawl_state(state, state_file):
+    """
+    Sauvegarde la date de dernière collecte de chaque propriétaire.
+    Args:
+        state (dict): Dictionnaire {propriétaire: date ISO 8601}.
+        state_file (str): Chemin du fichier d'état.
+    """
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=4)
+
+def full_crawl_due(crawl_state, full_crawl_days, now=None):
+    """
+    Indique si une collecte complète est due en mode incrémental.
+    Args:
+        crawl_state (dict): Dates de collecte (voir load_crawl_state).
+        full_crawl_days (float): Intervalle entre deux collectes complètes, en jours (None : jamais, 0 : toujours).
+        now (datetime): Date courante (par défaut, maintenant).
+    Returns:
+        bool: True si la dernière collecte complète est plus ancienne que full_crawl_days jours, ou inconnue.
+    """
+    if full_crawl_days is None:
+        return False
+    last_full_crawl = crawl_state.get(FULL_CRAWL_KEY)
+    if not last_full_crawl:
+        return True
+    last_full_crawl = datetime.strptime(last_full_crawl, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    return (now or datetime.now(timezone.utc)) - last_full_crawl >= timedelta(days=full_crawl_days)
+
 def load_input_json(filepath):
     """
     Charge les données d'un fichier JSON.
     Args:
-        filepath (str): Chemin vers le fichier JSON.
+        filepath (str): Chemin vers le fichier JSON (.json ou .jsonl.gz).
     Returns:
         dict: Données JSON chargées.
     """
-    with open(filepath, 'r', encoding='utf-8') as file:
-        return json.load(file)
+    return load_projects_file(filepath)
 
 def save_output_json(data, filepath):
     """
     Sauvegarde les données dans un fichier JSON.
     Args:
         data (dict): Données à sauvegarder.
-        filepath (str): Chemin vers le fichier de sortie.
+        filepath (str): Chemin vers le fichier de sortie (.json ou .jsonl.gz).
     """
-    with open(filepath, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
-
-# Exemple d'utilisation
-if __name__ == "__main__":
-    input_filepath = 'CNRS_GITHUB_FROM_SH.json'  # Remplacez par le chemin de votre fichier JSON d'entrée
-    output_filepath = 'CNRS_GITHUB_SH_OWNERS_REPOS.json'  # Remplacez par le chemin de votre fichier JSON de sortie
-    github_api_token = 'YOUR_GITHUB_API_TOKEN_HERE'
+    save_projects_file(data, filepath)
 
+def main(input_filepath, output_filepath, github_api_token, incremental=False, crawl_state_file='owner_crawl_state.json', work_queue=None,
+         shard_node=None, shard_nodes=None, full_crawl_days=DEFAULT_FULL_CRAWL_DAYS):
+    """
+    Récupère les dépôts des propriétaires des dépôts GitHub du fichier d'entrée et les sauvegarde.
+    Args:
+        input_filepath (str): Fichier généré par GitJSON.py.
+        output_filepath (str): Fichier de sortie des projets des propriétaires.
+        github_api_token (str | list): Jeton GitHub, ou plusieurs jetons (liste ou chaîne séparée par des virgules).
+        incremental (bool): Ne demande que les dépôts modifiés depuis la dernière collecte de chaque propriétaire.
+        crawl_state_file (str): Fichier contenant la date de dernière collecte de chaque propriétaire.
+        work_queue (str): Nom d'une file de travail (Common.WorkQueue) pour répartir la collecte entre plusieurs
+            processus exécutant main avec les mêmes paramètres ; un seul écrit la sortie, une fois la file vidée.
+        shard_node (str): Nom de ce nœud, dans une collecte répartie par hachage cohérent (voir Common.Sharding) :
+            seuls les propriétaires attribués au nœud sont collectés, et la sortie est écrite dans sa partition
+            (à recombiner avec DB/ConcatenateJson.merge_partitions).
+        shard_nodes (int | str | list): Nœuds de la collecte répartie.
+        full_crawl_days (float): En mode incrémental, intervalle en jours entre deux collectes complètes, qui listent
+            tous les dépôts sans reprendre la sortie précédente (None : jamais, 0 : à chaque exécution).
+    """
     input_data = load_input_json(input_filepath)
     owners = {project['repo_info']['owner'] for project in input_data['projects'] if 'repo_info' in project}
 
-    fetcher = GitHubRepoFetcher(github_api_token)
+    state_file = 'owner_state.json'
+    if shard_node:
+        ring = HashRing(shard_nodes)
+        owners = {owner for owner in owners if ring.owns(shard_node, owner.lower())}
+        print(f"Nœud {shard_node} : {len(owners)} propriétaires sur {len(ring.nodes)} nœuds.")
+        # Chaque nœud a ses propres fichiers d'état et écrit sa partition
+        output_filepath = partition_file(output_filepath, shard_node)
+        crawl_state_file = partition_file(crawl_state_file, shard_node)
+        state_file = partition_file(state_file, shard_node)
+
+    crawl_start = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    full_crawl = incremental and full_crawl_due(load_crawl_state(crawl_state_file), full_crawl_days)
+    previous_projects = []
+    if full_crawl:
+        # Sans projets précédents, chaque propriétaire est listé entièrement : les dépôts supprimés disparaissent
+        print(f"Collecte complète des propriétaires (dernière depuis plus de {full_crawl_days} jours).")
+    elif incremental and os.path.exists(output_filepath):
+        previous_projects = load_input_json(output_filepath).get('projects', [])
+    fetcher = GitHubRepoFetcher(github_api_token, state_file=state_file, incremental=incremental,
+                                previous_projects=previous_projects, crawl_state_file=crawl_state_file)
     try:
-        output_data = fetcher.fetch_repos(owners)
+        with Metrics.phase('collect'):
+            if work_queue:
+                with WorkQueue(work_queue) as queue:
+                    output_data = fetcher.fetch_repos_queued(owners, queue)
+            else:
+                output_data = fetcher.fetch_repos(owners)
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
         output_data = {"number_of_projects": 0, "projects": []}
 
-    save_output_json(output_data, output_filepath)
-    print(f"Les informations sur les projets ont été sauvegardées dans '{output_filepath}'.")
+    fetcher.response_store.close()
+    # output_data vaut None si la sortie est écrite par un autre processus de la file de travail
+    if output_data is not None:
+        save_output_json(output_data, output_filepath)
+        # La date de collecte n'est enregistrée qu'une fois la sortie écrite
+        if full_crawl:
+            fetcher.crawl_state[FULL_CRAWL_KEY] = crawl_start
+        save_crawl_state(fetcher.crawl_state, crawl_state_file)
+        print(f"Les informations sur les projets ont été sauvegardées dans '{output_filepath}'.")
+    Metrics.write_run_report('github_owners')
 
     # Suppression du fichier d'état après avoir terminé
     if os.path.exists(fetcher.state_file):
         os.remove(fetcher.state_file)
         print(f"Le fichier d'état '{fetcher.state_file}' a été supprimé.")
+
+# Exemple d'utilisation
+if __name__ == "__main__":
+    input_filepath = 'CNRS_GITHUB_FROM_SH.json'  # Remplacez par le chemin de votre fichier JSON d'entrée
+    output_filepath = 'CNRS_GITHUB_SH_OWNERS_REPOS.json'  # Remplacez par le chemin de votre fichier JSON de sortie
+    github_api_token = 'YOUR_GITHUB_API_TOKEN_HERE'
+    with Profiling.profile_stage('github_owners'):
+        main(input_filepath, output_filepath, github_api_token)
@@ -1,9 +1,48 @@
-import requests
 import json
+import os
+import sys
 
-# Lire le fichier JSON d'entrée
-with open('all_labs_projects.json', 'r', encoding='utf-8') as f:
-    input_json = json.load(f)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Profiling
+from Common.ProjectIO import load_projects_file, save_projects_file
+
+# Fonction pour transformer un projet
+def transform_project(project, laboratory_name):
+    """
+    Transforme un projet brut de l'API GitLab au format commun des projets.
+
+    Args:
+        project (dict): Projet brut renvoyé par l'API GitLab.
+        laboratory_name (str): Nom du laboratoire propriétaire de l'instance.
+
+    Returns:
+        dict: Projet transformé.
+    """
+    return {
+        "title": project.get('name', ''),
+        "authors": [
+            {
+                "name": project['namespace'].get('name', ''),
+                "AuthGitlabId": project['namespace'].get('id', ''),
+                "kind": project['namespace'].get('kind', '')
+            }
+        ],
+        "submitted_date": project.get('created_at', '').split('T')[0],
+        "updated_date": project.get('last_activity_at', ''),
+        "type": "SOFTWARE",
+        "laboratory": laboratory_name,
+        "domain": ", ".join(project.get('topics', [])),
+        "abstract": project.get('description', ''),
+        "keywords": ", ".join(project.get('tag_list', [])),
+        "softCodeRepository": project.get('web_url', ''),
+        "readme": project.get('readme_url', ''),
+        "stars": project.get('star_count', 0),
+        "forks": project.get('forks_count', 0),
+        "gitlab_id": project['id'],
+        "forge": "gitlab",
+        "source": "gitLab",
+    }
 
 # Fonction pour transformer les projets
 def transform_projects(input_json):
@@ -12,31 +51,7 @@ def transform_projects(input_json):
 
     for lab_data in input_json:
         for project in lab_data["projects"]:
-            transformed_project = {
-                "title": project.get('name', ''),
-                "authors": [
-                    {
-                        "name": project['namespace'].get('name', ''),
-                        "AuthGitlabId": project['namespace'].get('id', ''),
-                        "kind": project['namespace'].get('kind', '')
-                    }
-                ],
-                "submitted_date": project.get('created_at', '').split('T')[0],
-                "updated_date": project.get('last_activity_at', ''),
-                "type": "SOFTWARE",
-                "laboratory": lab_data["laboratory_name"],
-                "domain": ", ".join(project.get('topics', [])),
-                "abstract": project.get('description', ''),
-                "keywords": ", ".join(project.get('tag_list', [])),
-                "softCodeRepository": project.get('web_url', ''),
-                "readme": project.get('readme_url', ''),
-                "stars": project.get('star_count', 0),
-                "forks": project.get('forks_count', 0),
-                "gitlab_id": project['id'],
-                "forge": "gitlab",
-                "source": "gitLab",
-            }
-            transformed_projects.append(transformed_project)
+            transformed_projects.append(transform_project(project, lab_data["laboratory_name"]))
         total_projects += lab_data["number_of_projects"]
 
     output_json = {
@@ -45,11 +60,56 @@ def transform_projects(input_json):
     }
     return output_json
 
-# Transformer les projets
-output_json = transform_projects(input_json)
+# Fonction pour fusionner les projets transformés par identifiant GitLab
+def merge_transformed_projects(previous_json, delta_json):
+    """
+    Fusionne les projets transformés modifiés dans la sortie précédente en se basant sur gitlab_id.
+    L'identifiant n'étant unique qu'au sein d'une instance, la clé inclut le laboratoire.
+    Les projets existants sont remplacés à leur position, les nouveaux sont ajoutés à la fin.
+
+    Args:
+        previous_json (dict): Sortie transformée de l'exécution précédente.
+        delta_json (dict): Projets modifiés depuis, déjà transformés.
+
+    Returns:
+        dict: Sortie transformée fusionnée.
+    """
+    merged = {(project["laboratory"], project["gitlab_id"]): project for project in previous_json["projects"]}
+    merged.update({(project["laboratory"], project["gitlab_id"]): project for project in delta_json["projects"]})
+    return {
+        "number_of_projects": len(merged),
+        "projects": list(merged.values())
+    }
+
+def main(input_file='all_labs_projects.json', output_file='transformed_projects.json', delta_file='labs_projects_delta.json'):
+    """
+    Transforme les projets collectés par GitlabPreJSON et les sauvegarde dans un fichier JSON.
+
+    Args:
+        input_file (str): Fichier JSON des projets bruts de tous les laboratoires.
+        output_file (str): Fichier JSON des projets transformés.
+        delta_file (str): Fichier JSON des projets modifiés produit par GitlabPreJSON en mode incrémental.
+    """
+    # En mode incrémental (GitlabPreJSON a produit un delta), on ne transforme que les projets modifiés
+    if os.path.exists(delta_file) and os.path.exists(output_file):
+        with open(delta_file, 'r', encoding='utf-8') as f:
+            delta_json = json.load(f)
+        previous_json = load_projects_file(output_file)
+        output_json = merge_transformed_projects(previous_json, transform_projects(delta_json))
+    else:
+        # Lire le fichier JSON d'entrée et transformer tous les projets
+        with open(input_file, 'r', encoding='utf-8') as f:
+            input_json = json.load(f)
+        output_json = transform_projects(input_json)
+
+    # Sauvegarder les projets transformés dans un fichier JSON
+    save_projects_file(output_json, output_file)
+    if os.path.exists(delta_file):
+        # Le delta est consommé : l'exécution suivante repartira de la collecte complète si aucun nouveau delta n'est produit
+        os.remove(delta_file)
 
-# Sauvegarder les projets transformés dans un fichier JSON
-with open('transformed_projects.json', 'w', encoding='utf-8') as f:
-    json.dump(output_json, f, ensure_ascii=False, indent=4)
+    print(f"Les informations des projets transformés ont été sauvegardées dans '{output_file}'.")
 
-print("Les informations des projets transformés ont été sauvegardées dans 'transformed_projects.json'.")
+if __name__ == "__main__":
+    with Profiling.profile_stage('gitlab_json'):
+        main()
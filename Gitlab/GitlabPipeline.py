@@ -0,0 +1,194 @@
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import ProjectStreamWriter, iter_projects
+from Common.AdaptiveConcurrency import get_controller
+from Common.WorkQueue import WorkQueue
+from GitlabPreJSON import (PER_PAGE, read_labs_from_file, fetch_public_project_page, iter_public_project_pages,
+                           load_crawl_state, save_crawl_state)
+from GitlabJSON import transform_project
+
+""" Collecte et transforme en flux les projets publics des instances GitLab des laboratoires.
+    Chaque page de l'API est transformée dès sa réception et écrite directement dans le fichier de sortie,
+    la mémoire utilisée ne dépend donc pas de la taille des instances.
+    Le fichier brut (équivalent de labs_projects.json) est optionnel et écrit en JSONL compressé.
+    La collecte peut être répartie entre plusieurs processus par une file de travail, dont chaque élément est
+    une plage de PAGES_PER_ITEM pages d'une instance : la mémoire d'un processus reste bornée par la taille
+    d'une plage, quelle que soit la taille des instances, et une grande instance est répartie entre les processus. """
+
+# Nombre de pages de l'API (PER_PAGE projets chacune) par élément de la file de travail
+PAGES_PER_ITEM = 10
+
+def page_range_key(lab_name, first_page):
+    """
+    Returns:
+        str: Clé de l'élément de la file de travail d'une plage de pages.
+    """
+    return f"{lab_name}#{first_page}"
+
+def collect_page_range(item, keep_raw=False, queue=None):
+    """
+    Collecte et transforme une plage de pages d'une instance (mode file de travail). Ajoute à la file les plages
+    suivantes : toutes celles annoncées par l'en-tête X-Total-Pages pour la première plage, et la suivante
+    si la dernière page de la plage est pleine (instances qui n'indiquent pas le nombre de pages).
+
+    Args:
+        item (dict): Plage ("lab_name", "lab_url", "last_crawl", "first_page", "total_pages" éventuel).
+        keep_raw (bool): Conserve aussi les projets bruts.
+        queue (WorkQueue): File de travail à compléter.
+
+    Returns:
+        dict: Projets transformés ("projects"), projets bruts ("raw"), date de la collecte ("crawled_at")
+            et présence d'une plage suivante ("more").
+    """
+    crawled_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    lab_name, lab_url, first_page = item["lab_name"], item["lab_url"], item["first_page"]
+    if first_page == 1:
+        print(f"Collecte des données pour {lab_name} à partir de {lab_url}...")
+    last_page = first_page + PAGES_PER_ITEM - 1
+    if item.get("total_pages"):
+        last_page = min(last_page, item["total_pages"])
+    responses = get_controller(lab_url).map(lambda page: fetch_public_project_page(lab_url, page, item["last_crawl"]),
+                                            range(first_page, last_page + 1))
+
+    projects, raw = [], []
+    total_pages, page_size = item.get("total_pages"), 0
+    for response in responses:
+        page = response.json()
+        if first_page == 1 and total_pages is None and response.headers.get('X-Total-Pages'):
+            total_pages = int(response.headers['X-Total-Pages'])
+        page_size = len(page)
+        for project in page:
+            projects.append(transform_project(project, lab_name))
+            if keep_raw:
+                raw.append(project)
+        if page_size < PER_PAGE:
+            break
+
+    more = last_page < total_pages if total_pages else page_size >= PER_PAGE
+    if more and queue is not None:
+        # Les plages déjà ajoutées (par un autre processus, ou par la première plage) sont ignorées par enqueue
+        starts = range(last_page + 1, total_pages + 1, PAGES_PER_ITEM) if total_pages else [last_page + 1]
+        queue.enqueue((page_range_key(lab_name, start), dict(item, first_page=start, total_pages=total_pages)) for start in starts)
+    return {"projects": projects, "raw": raw, "crawled_at": crawled_at, "more": more}
+
+def run_pipeline(input_file, output_file, raw_dump_file=None, incremental=False, state_file='gitlab_state.json', work_queue=None):
+    """
+    Collecte, transforme et écrit en flux les projets de chaque laboratoire.
+
+    En mode incrémental, seuls les projets actifs depuis la dernière collecte de chaque instance sont demandés ;
+    les projets non modifiés sont recopiés en flux depuis le fichier de sortie précédent.
+
+    Args:
+        input_file (str): Fichier texte contenant les laboratoires et l'URL de leur instance.
+        output_file (str): Fichier JSON des projets transformés.
+        raw_dump_file (str): Fichier .jsonl.gz pour conserver les projets bruts, ou None pour ne pas les conserver.
+        incremental (bool): Active la collecte incrémentale.
+        state_file (str): Fichier contenant la date de dernière collecte par instance.
+        work_queue (str): Nom d'une file de travail (Common.WorkQueue) pour répartir les plages de pages des instances
+            entre plusieurs processus exécutant run_pipeline avec les mêmes paramètres ; une plage en échec est réessayée.
+
+    Returns:
+        int: Nombre de projets écrits dans le fichier de sortie (None s'il est écrit par un autre processus).
+    """
+    labs = read_labs_from_file(input_file)
+    incremental = incremental and os.path.exists(output_file)
+    state = load_crawl_state(state_file) if incremental else {}
+    changed_keys = set()
+
+    if work_queue:
+        with WorkQueue(work_queue) as queue:
+            queue.enqueue((page_range_key(lab_name, 1), {"lab_name": lab_name, "lab_url": lab_url, "last_crawl": state.get(lab_url), "first_page": 1})
+                          for lab_name, lab_url in labs.items())
+            queue.run_worker(lambda items: [collect_page_range(item, bool(raw_dump_file), queue) for item in items])
+            if not queue.claim_output():
+                return None
+            for item in queue.dead_letters():
+                print(f"Erreur lors de la collecte de {item['key']}: {item['error']}")
+
+    temp_file = output_file + '.tmp'
+    raw_dump = gzip.open(raw_dump_file, 'wt', encoding='utf-8') if raw_dump_file else None
+    try:
+        with ProjectStreamWriter(temp_file) as writer:
+            if work_queue:
+                # Les plages sont relues une à une depuis la file, dans l'ordre des instances et des pages
+                with WorkQueue(work_queue) as queue:
+                    for lab_name, lab_url in labs.items():
+                        first_page, crawled_at = 1, None
+                        while True:
+                            result = queue.result(page_range_key(lab_name, first_page))
+                            if result is None:
+                                # Plage en échec définitif : la date de collecte de l'instance n'avance pas
+                                crawled_at = None
+                                break
+                            for project in result["projects"]:
+                                writer.write(project)
+                                changed_keys.add((project["laboratory"], project["gitlab_id"]))
+                            if raw_dump:
+                                for project in result["raw"]:
+                                    raw_dump.write(json.dumps({"laboratory_name": lab_name, "project": project}, ensure_ascii=False) + '\n')
+                            crawled_at = min(crawled_at or result["crawled_at"], result["crawled_at"])
+                            if not result["more"]:
+                                break
+                            first_page += PAGES_PER_ITEM
+                        if crawled_at:
+                            state[lab_url] = crawled_at
+            else:
+                for lab_name, lab_url in labs.items():
+                    last_crawl = state.get(lab_url)
+                    crawl_start = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+                    print(f"Collecte des données pour {lab_name} à partir de {lab_url}...")
+                    try:
+                        for page in iter_public_project_pages(lab_url, last_crawl):
+                            for project in page:
+                                writer.write(transform_project(project, lab_name))
+                                changed_keys.add((lab_name, project['id']))
+                                if raw_dump:
+                                    raw_dump.write(json.dumps({"laboratory_name": lab_name, "project": project}, ensure_ascii=False) + '\n')
+                    except requests.exceptions.RequestException as e:
+                        print(f"Erreur lors de la requête à {lab_url}: {e}")
+                        continue
+                    state[lab_url] = crawl_start
+
+            # Recopier les projets non modifiés depuis la sortie précédente
+            if incremental:
+                with Metrics.phase('copy_unchanged'):
+                    for project in iter_projects(output_file):
+                        if (project["laboratory"], project["gitlab_id"]) not in changed_keys:
+                            writer.write(project)
+            count = writer.count
+    finally:
+        if raw_dump:
+            raw_dump.close()
+
+    os.replace(temp_file, output_file)
+    save_crawl_state(state, state_file)
+    return count
+
+def main(input_file='labs_gitlab.txt', output_file='transformed_projects.json', raw_dump_file=None, incremental=False, work_queue=None):
+    """
+    Fonction principale pour collecter et transformer en flux les projets GitLab des laboratoires.
+
+    Args:
+        input_file (str): Fichier texte contenant les laboratoires et l'URL de leur instance.
+        output_file (str): Fichier JSON des projets transformés.
+        raw_dump_file (str): Fichier .jsonl.gz optionnel pour les projets bruts.
+        incremental (bool): Active la collecte incrémentale.
+        work_queue (str): Nom d'une file de travail pour répartir la collecte entre plusieurs processus.
+    """
+    count = run_pipeline(input_file, output_file, raw_dump_file=raw_dump_file, incremental=incremental, work_queue=work_queue)
+    if count is not None:
+        print(f"{count} projets transformés ont été sauvegardés dans '{output_file}'.")
+    Metrics.write_run_report('gitlab')
+
+if __name__ == "__main__":
+    with Profiling.profile_stage('gitlab'):
+        main(raw_dump_file='labs_projects.jsonl.gz', incremental=True)
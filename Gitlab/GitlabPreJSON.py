@@ -1,5 +1,15 @@
 import requests
 import json
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.AdaptiveConcurrency import get_controller
+
+PER_PAGE = 100  # Nombre maximum de projets par page autorisé par l'API
 
 def read_labs_from_file(file_path):
     labs = {}
@@ -10,49 +20,231 @@ def read_labs_from_file(file_path):
                 labs[lab_name.strip()] = url.strip()
     return labs
 
-def get_all_public_projects(base_url):
-    per_page = 100  # Nombre maximum de projets par page autorisé par l'API
-    projects = []
-    page = 1
+def fetch_public_project_page(base_url, page, last_activity_after=None):
+    """
+    Demande une page des projets publics d'une instance GitLab, sous le contrôle de sa concurrence adaptative.
 
-    while True:
-        url = f"{base_url}/api/v4/projects?visibility=public&per_page={per_page}&page={page}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()  # Vérifie si la requête a échoué
-        except requests.exceptions.RequestException as e:
-            print(f"Erreur lors de la requête à {base_url}: {e}")
-            break
+    Args:
+        base_url (str): URL de l'instance GitLab.
+        page (int): Numéro de la page (à partir de 1).
+        last_activity_after (str): Date ISO 8601 ; si fournie, seuls les projets actifs depuis cette date sont retournés.
+
+    Returns:
+        requests.Response: Réponse de l'API (en-tête X-Total-Pages éventuel).
+
+    Raises:
+        requests.exceptions.RequestException: Si la requête échoue.
+    """
+    url = f"{base_url}/api/v4/projects?visibility=public&per_page={PER_PAGE}&page={page}"
+    if last_activity_after:
+        url += f"&last_activity_after={last_activity_after}"
+    response = get_controller(base_url).get(url, 'gitlab:projects')
+    response.raise_for_status()  # Vérifie si la requête a échoué
+    return response
+
+def iter_public_project_pages(base_url, last_activity_after=None):
+    """
+    Parcourt page par page les projets publics d'une instance GitLab, éventuellement limités à ceux
+    dont l'activité est postérieure à une date donnée.
+
+    Lorsque l'instance indique le nombre de pages (en-tête X-Total-Pages), les pages suivantes sont demandées
+    en parallèle, sous le contrôle de la concurrence adaptative de l'instance (Common.AdaptiveConcurrency),
+    et restituées dans l'ordre. Sinon (instances de plus de 10 000 projets), elles sont demandées l'une après l'autre.
 
-        data = response.json()
+    Args:
+        base_url (str): URL de l'instance GitLab.
+        last_activity_after (str): Date ISO 8601 ; si fournie, seuls les projets actifs depuis cette date sont retournés.
+
+    Yields:
+        list: Projets d'une page de l'API.
+
+    Raises:
+        requests.exceptions.RequestException: Si une requête échoue.
+    """
+    controller = get_controller(base_url)
+
+    def fetch_page(page):
+        return fetch_public_project_page(base_url, page, last_activity_after)
+
+    response = fetch_page(1)
+    data = response.json()
+    if not data:
+        return
+    yield data
+
+    total_pages = response.headers.get('X-Total-Pages')
+    if total_pages:
+        # Pages demandées par fenêtres, pour borner le nombre de pages en mémoire
+        pages = range(2, int(total_pages) + 1)
+        window = 2 * controller.maximum
+        for start in range(0, len(pages), window):
+            for response in controller.map(fetch_page, pages[start:start + window]):
+                data = response.json()
+                if data:
+                    yield data
+        return
+
+    page = 2
+    while True:
+        data = fetch_page(page).json()
         if not data:
             break
 
-        projects.extend(data)
+        yield data
         page += 1
 
+def crawl_public_projects(base_url, last_activity_after=None):
+    """
+    Récupère les projets publics d'une instance GitLab, éventuellement limités à ceux
+    dont l'activité est postérieure à une date donnée.
+
+    Args:
+        base_url (str): URL de l'instance GitLab.
+        last_activity_after (str): Date ISO 8601 ; si fournie, seuls les projets actifs depuis cette date sont retournés.
+
+    Returns:
+        tuple: (liste des projets, booléen indiquant si la collecte est complète).
+    """
+    projects = []
+    try:
+        for page in iter_public_project_pages(base_url, last_activity_after):
+            projects.extend(page)
+    except requests.exceptions.RequestException as e:
+        print(f"Erreur lors de la requête à {base_url}: {e}")
+        return projects, False
+
+    return projects, True
+
+def get_all_public_projects(base_url, last_activity_after=None):
+    projects, _ = crawl_public_projects(base_url, last_activity_after)
     return projects
 
-def main(input_file, output_file):
+def load_crawl_state(state_file):
+    """
+    Charge la date de dernière collecte de chaque instance GitLab.
+
+    Args:
+        state_file (str): Chemin du fichier d'état.
+
+    Returns:
+        dict: Dictionnaire {url de l'instance: date ISO 8601 de la dernière collecte}.
+    """
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_crawl_state(state, state_file):
+    """
+    Sauvegarde la date de dernière collecte de chaque instance GitLab.
+
+    Args:
+        state (dict): Dictionnaire {url de l'instance: date ISO 8601}.
+        state_file (str): Chemin du fichier d'état.
+    """
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=4)
+
+def merge_projects_by_id(previous_projects, new_projects):
+    """
+    Fusionne les projets modifiés dans la liste précédente en se basant sur l'id GitLab.
+    Les projets existants sont remplacés à leur position, les nouveaux sont ajoutés à la fin.
+
+    Args:
+        previous_projects (list): Projets issus de la collecte précédente.
+        new_projects (list): Projets modifiés depuis la collecte précédente.
+
+    Returns:
+        list: Liste fusionnée des projets.
+    """
+    merged = {project['id']: project for project in previous_projects}
+    merged.update({project['id']: project for project in new_projects})
+    return list(merged.values())
+
+def main(input_file, output_file, incremental=False, state_file='gitlab_state.json', delta_file='labs_projects_delta.json'):
+    """
+    Collecte les projets publics de chaque laboratoire et les sauvegarde dans un fichier JSON.
+
+    En mode incrémental, seuls les projets actifs depuis la dernière collecte de chaque instance
+    sont demandés à l'API, puis fusionnés par id dans le fichier de sortie précédent. Les projets
+    modifiés sont également écrits dans delta_file pour que GitlabJSON ne transforme que le delta ; un delta
+    que GitlabJSON n'a pas encore consommé est complété (par laboratoire et id) et non remplacé, car les
+    projets qu'il contient ne seront plus demandés par les collectes suivantes.
+    Les projets devenus privés ou supprimés ne sont pas retirés en mode incrémental.
+
+    Args:
+        input_file (str): Fichier texte contenant les laboratoires et l'URL de leur instance.
+        output_file (str): Fichier JSON de sortie.
+        incremental (bool): Active la collecte incrémentale.
+        state_file (str): Fichier contenant la date de dernière collecte par instance.
+        delta_file (str): Fichier JSON contenant uniquement les projets modifiés.
+    """
     labs = read_labs_from_file(input_file)
     all_labs_data = []
+    delta_labs_data = []
+
+    previous_labs = {}
+    previous_delta = {}
+    state = {}
+    if incremental:
+        state = load_crawl_state(state_file)
+        if os.path.exists(output_file):
+            with open(output_file, 'r', encoding='utf-8') as f:
+                previous_labs = {lab_data["laboratory_name"]: lab_data for lab_data in json.load(f)}
+        if os.path.exists(delta_file):
+            with open(delta_file, 'r', encoding='utf-8') as f:
+                previous_delta = {lab_data["laboratory_name"]: lab_data["projects"] for lab_data in json.load(f)}
 
     for lab_name, lab_url in labs.items():
-        print(f"Collecte des données pour {lab_name} à partir de {lab_url}...")
-        projects = get_all_public_projects(lab_url)
-        lab_data = {
+        last_crawl = state.get(lab_url) if lab_name in previous_labs else None
+        crawl_start = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        if last_crawl:
+            print(f"Collecte des projets modifiés depuis {last_crawl} pour {lab_name} à partir de {lab_url}...")
+        else:
+            print(f"Collecte des données pour {lab_name} à partir de {lab_url}...")
+        with Metrics.phase('crawl'):
+            changed_projects, complete = crawl_public_projects(lab_url, last_crawl)
+
+        if last_crawl:
+            projects = merge_projects_by_id(previous_labs[lab_name]["projects"], changed_projects)
+        else:
+            projects = changed_projects
+        if complete:
+            state[lab_url] = crawl_start
+
+        all_labs_data.append({
             "laboratory_name": lab_name,
             "number_of_projects": len(projects),
             "projects": projects
-        }
-        all_labs_data.append(lab_data)
+        })
+        delta_projects = merge_projects_by_id(previous_delta.pop(lab_name, []), changed_projects)
+        delta_labs_data.append({
+            "laboratory_name": lab_name,
+            "number_of_projects": len(delta_projects),
+            "projects": delta_projects
+        })
 
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(all_labs_data, f, ensure_ascii=False, indent=4)
 
+    if incremental:
+        # Laboratoires du delta non consommé qui ne sont plus dans le fichier d'entrée
+        delta_labs_data.extend({"laboratory_name": lab_name, "number_of_projects": len(projects), "projects": projects}
+                               for lab_name, projects in previous_delta.items())
+        with open(delta_file, 'w', encoding='utf-8') as f:
+            json.dump(delta_labs_data, f, ensure_ascii=False, indent=4)
+        save_crawl_state(state, state_file)
+        print(f"Les projets modifiés ont été sauvegardés dans '{delta_file}'.")
+    elif os.path.exists(delta_file):
+        # Collecte complète : un delta d'une collecte incrémentale précédente ne doit pas être repris par GitlabJSON
+        os.remove(delta_file)
+
     print(f"Toutes les informations des laboratoires ont été sauvegardées dans '{output_file}'.")
+    Metrics.write_run_report('gitlab_pre')
 
 if __name__ == "__main__":
     input_file = 'labs_gitlab.txt'  # Remplacer par le chemin de votre fichier texte
     output_file = 'labs_projects.json'  # Nom du fichier de sortie
-    main(input_file, output_file)
+    incremental = True  # Mettre à False pour forcer une collecte complète
+    with Profiling.profile_stage('gitlab_pre'):
+        main(input_file, output_file, incremental=incremental)
@@ -1,11 +1,58 @@
 import requests
 import re
-import json
+import os
+import sys
+import time
 from itertools import zip_longest
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.AdaptiveConcurrency import get_controller
+from Common.ProjectIO import load_projects_file, save_projects_file
+
 
 """ Crée le fichier CNRS_HAL.json qui contients les logiciels du CNRS sur HAL"""
 
+# Tentatives par page avant d'abandonner la collecte, et attente entre deux tentatives (multipliée par le numéro de tentative)
+PAGE_ATTEMPTS = 3
+PAGE_RETRY_DELAY = 5
+
+def search_hal_page(collection, doc_type, start=0, rows=1000):
+    """
+    Recherche une page de projets HAL en fonction de la collection et du type de document.
+    Les pages sont demandées sous le contrôle de la concurrence adaptative de l'API HAL (Common.AdaptiveConcurrency).
+    Une page en erreur est redemandée jusqu'à PAGE_ATTEMPTS fois ; au-delà, l'erreur est propagée
+    plutôt que de produire une collecte incomplète.
+
+    Args:
+        collection (str): Collection à rechercher.
+        doc_type (str): Type de document à rechercher.
+        start (int): Indice de départ pour la pagination.
+        rows (int): Nombre de résultats par page.
+
+    Returns:
+        list: Liste des projets trouvés dans la réponse de l'API.
+        int: Nombre total de projets correspondant à la recherche.
+
+    Raises:
+        requests.exceptions.RequestException: Si la page n'a pu être obtenue après PAGE_ATTEMPTS tentatives.
+    """
+    fields = "title_s,authFullName_s,authIdHal_s,authIdHal_i,producedDate_s,submittedDate_s,docType_s,labStructName_s,fr_domainAllCodeLabel_fs,abstract_s,keyword_s,halId_s,structName_s,language_s,swhidId_s,softCodeRepository_s,softProgrammingLanguage_s,rgrpInstStructName_s"
+    search_url = f"https://api.archives-ouvertes.fr/search/?q=collCode_s:{collection}+AND+docType_s:{doc_type}&start={start}&rows={rows}&fl={fields}"
+    for attempt in range(1, PAGE_ATTEMPTS + 1):
+        try:
+            response = get_controller('hal').get(search_url, 'hal:search')
+            response.raise_for_status()
+            result = response.json().get('response', {})
+            return result.get('docs', []), result.get('numFound', 0)
+        except requests.exceptions.RequestException as e:
+            print(f"Erreur lors de la requête (page {start}, tentative {attempt}/{PAGE_ATTEMPTS}) : {e}")
+            if attempt == PAGE_ATTEMPTS:
+                raise
+            Metrics.count('hal_page_retries_total')
+            time.sleep(PAGE_RETRY_DELAY * attempt)
+
 def search_hal_projects(collection, doc_type, start=0, rows=1000):
     """
     Recherche les projets HAL en fonction de la collection et du type de document.
@@ -20,15 +67,7 @@ def search_hal_projects(collection, doc_type, start=0, rows=1000):
     Returns:
         list: Liste des projets trouvés dans la réponse de l'API.
     """
-    fields = "title_s,authFullName_s,authIdHal_s,authIdHal_i,producedDate_s,submittedDate_s,docType_s,labStructName_s,fr_domainAllCodeLabel_fs,abstract_s,keyword_s,halId_s,structName_s,language_s,swhidId_s,softCodeRepository_s,softProgrammingLanguage_s,rgrpInstStructName_s"
-    search_url = f"https://api.archives-ouvertes.fr/search/?q=collCode_s:{collection}+AND+docType_s:{doc_type}&start={start}&rows={rows}&fl={fields}"
-    try:
-        response = requests.get(search_url)
-        response.raise_for_status()
-        return response.json().get('response', {}).get('docs', [])
-    except requests.exceptions.RequestException as e:
-        print(f"Erreur lors de la requête : {e}")
-        return []
+    return search_hal_page(collection, doc_type, start, rows)[0]
 
 def collect_hal_data(collection, doc_type):
     """
@@ -41,16 +80,12 @@ def collect_hal_data(collection, doc_type):
     Returns:
         dict: Dictionnaire catégorisé des projets avec ou sans SWHID et repos.
     """
-    all_projects = []
-    start, rows = 0, 1000
-    while True:
-        projects = search_hal_projects(collection, doc_type, start=start, rows=rows)
-        if not projects:
-            break
+    rows = 1000
+    all_projects, num_found = search_hal_page(collection, doc_type, start=0, rows=rows)
+    # Le nombre total de projets est connu dès la première page : les suivantes sont demandées en parallèle
+    starts = range(rows, num_found, rows)
+    for projects in get_controller('hal').map(lambda start: search_hal_projects(collection, doc_type, start=start, rows=rows), starts):
         all_projects.extend(projects)
-        start += rows
-        if len(projects) < rows:
-            break
 
     categorized_projects = {"with_swhid": [], "with_repo": [], "without_swhid_and_repo": []}
     for project in all_projects:
@@ -122,10 +157,9 @@ def save_json(data, filename):
 
     Args:
         data (list): Liste des projets à sauvegarder.
-        filename (str): Nom du fichier de sortie.
+        filename (str): Nom du fichier de sortie (.json ou .jsonl.gz).
     """
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump({"number_of_projects": len(data), "projects": [{"project_number": i + 1, **proj} for i, proj in enumerate(data)]}, f, ensure_ascii=False, indent=4)
+    save_projects_file({"number_of_projects": len(data), "projects": [{"project_number": i + 1, **proj} for i, proj in enumerate(data)]}, filename)
 
 def merge_json_files(json_files, output_file):
     """
@@ -137,19 +171,18 @@ def merge_json_files(json_files, output_file):
     """
     merged_data = []
     for file in json_files:
-        with open(file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            merged_data.extend(data["projects"])
+        data = load_projects_file(file)
+        merged_data.extend(data["projects"])
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump({"number_of_projects": len(merged_data), "projects": merged_data}, f, ensure_ascii=False, indent=4)
+    save_projects_file({"number_of_projects": len(merged_data), "projects": merged_data}, output_file)
 
 def main():
     """
     Collecte les données des projets HAL et les sauvegarde dans des fichiers JSON.
     """
     collection, doc_type = 'CNRS', 'SOFTWARE'
-    projects = collect_hal_data(collection, doc_type)
+    with Metrics.phase('collect'):
+        projects = collect_hal_data(collection, doc_type)
     save_json(projects["with_swhid"], 'CNRS_HAL_SWHID.json')
     save_json(projects["with_repo"], 'CNRS_HAL_REPO.json')
     save_json(projects["without_swhid_and_repo"], 'CNRS_HAL_AUTRE.json')
@@ -157,6 +190,8 @@ def main():
     #utilisation de la fonction merge_json_files pour fusionner les fichiers JSON en un seul fichier
     json_files = ['CNRS_HAL_SWHID.json', 'CNRS_HAL_REPO.json']
     merge_json_files(json_files, 'CNRS_HAL.json')
+    Metrics.write_run_report('hal')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with Profiling.profile_stage('hal'):
+        main()
\ No newline at end of file
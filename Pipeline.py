@@ -0,0 +1,629 @@
+import argparse
+import glob
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from Common import Metrics, Profiling
+from Common.Sharding import node_names
+from Common.WorkQueue import WorkQueue
+
+""" Point d'entrée unique pour une mise à jour complète de la cartographie.
+
+    Les étapes (collecteurs, fusion, base de données) et leurs dépendances sont décrites dans STAGES.
+    Les branches indépendantes (HAL, Software Heritage, GitLab, liens externes) s'exécutent en parallèle,
+    chacune dans son propre processus et dans le répertoire de son script.
+    Une étape est ignorée si ses fichiers d'entrée, ses paramètres et son script n'ont pas changé depuis
+    sa dernière exécution réussie (empreintes SHA-256 dans pipeline_state.json) et que ses sorties existent.
+    Les durées de chaque étape sont enregistrées dans pipeline_report.json, et les mesures détaillées
+    de chaque étape (requêtes, attentes, caches, lignes insérées) dans le répertoire metrics/.
+
+    Utilisation :
+        python Pipeline.py                    # mise à jour complète
+        python Pipeline.py --no-refresh       # réutilise les sorties existantes des collecteurs sans entrée
+        python Pipeline.py --stages database  # une étape et ce dont elle dépend
+        python Pipeline.py --worker sh_info --processes 4  # une étape répartie entre 4 processus
+        python Pipeline.py --shard sh_info --nodes 4       # une étape répartie entre 4 nœuds locaux
+        python Pipeline.py --stream-db        # charge la base pendant la collecte
+        python Pipeline.py --full-crawl       # collecte complète des propriétaires GitHub (sinon tous les 30 jours)
+
+    Les étapes marquées "work_queue" peuvent être réparties entre plusieurs processus, sur une ou plusieurs machines,
+    par une file de travail partagée (Common/WorkQueue.py) : chaque processus exécute la même commande --worker avec
+    le même nom de file (--queue, à choisir pour plusieurs machines), sans les dépendances de l'étape. Sans --queue,
+    la file est nommée d'après l'étape et l'empreinte de ses entrées : une exécution interrompue reprend là où elle
+    s'était arrêtée, et la file est vidée une fois l'étape terminée.
+
+    Les étapes marquées "shard" peuvent être réparties entre N nœuds par hachage cohérent (Common/Sharding.py) :
+    chaque nœud (--node, sur sa machine) collecte sa part avec ses propres jetons (variable du secret suffixée
+    par le nom du nœud, ex. GITHUB_TOKEN_NODE0) et écrit sa partition ; --merge-partitions les recombine.
+    Sans --node, les N nœuds sont des processus locaux et les partitions sont recombinées à la fin.
+
+    Avec --stream-db, la base est chargée pendant la collecte (DB/StreamLoader.py) : dès qu'une étape marquée
+    "stream" se termine (ou est ignorée), sa sortie est relue en flux et ses enregistrements sont insérés par lots
+    pendant que les autres collecteurs travaillent. Les étapes marquées "batch_load" (fusion des fichiers et
+    chargement final) sont alors inutiles et ne sont pas exécutées.
+"""
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(ROOT_DIR, 'pipeline_state.json')
+REPORT_FILE = os.path.join(ROOT_DIR, 'pipeline_report.json')
+METRICS_DIR = os.path.join(ROOT_DIR, 'metrics')
+
+# Chaque étape appelle une fonction d'un script. Les chemins des entrées et sorties sont relatifs à la racine du dépôt ;
+# "secrets" associe un paramètre de la fonction à une variable d'environnement (jamais pris en compte dans les empreintes) ;
+# "work_queue" indique que la fonction accepte le paramètre work_queue (voir run_workers),
+# "shard" qu'elle accepte les paramètres shard_node et shard_nodes (voir run_shards),
+# "full_crawl" qu'elle accepte le paramètre full_crawl_days de sa collecte incrémentale (voir with_full_crawl) ;
+# "stream" indique le type des enregistrements de ses sorties pour le chargement en flux ("project" ou "github"),
+# "batch_load" qu'elle ne sert qu'au chargement de la base après la collecte (remplacé par le chargement en flux).
+STAGES = [
+    {
+        "name": "hal",
+        "script": "Hal/HalJSON.py", "function": "main",
+        "kwargs": {},
+        "inputs": [], "outputs": ["Hal/CNRS_HAL.json"],
+        "depends_on": [],
+        "stream": "project",
+    },
+    {
+        "name": "sh_origins",
+        "script": "SH/ShAllProjJSON.py", "function": "main",
+        "kwargs": {"output_file": "SH/structured_data_cnrs.json"},
+        "secrets": {"token": "SH_TOKEN"},
+        "inputs": [], "outputs": ["SH/structured_data_cnrs.json"],
+        "depends_on": [],
+    },
+    {
+        "name": "sh_info",
+        "script": "SH/ShAllProjInfoJSON.py", "function": "main",
+        "kwargs": {"input_file": "SH/structured_data_cnrs.json", "output_file": "SH/SH_CNRS_PROJ_INFO.json",
+                   "swhid_file": "Hal/CNRS_HAL.json"},
+        "secrets": {"token": "SH_TOKEN"},
+        "inputs": ["SH/structured_data_cnrs.json", "Hal/CNRS_HAL.json"], "outputs": ["SH/SH_CNRS_PROJ_INFO.json"],
+        "depends_on": ["sh_origins", "hal"],
+        "stream": "project",
+        "work_queue": True,
+        "shard": True,
+    },
+    {
+        "name": "github_from_hal",
+        "script": "Github/GitJSON.py", "function": "main",
+        "kwargs": {"input_file": "Hal/CNRS_HAL.json", "output_file": "Github/CNRS_GITHUB_FROM_HAL.json"},
+        "secrets": {"token": "GITHUB_TOKEN"},
+        "inputs": ["Hal/CNRS_HAL.json"], "outputs": ["Github/CNRS_GITHUB_FROM_HAL.json"],
+        "depends_on": ["hal"],
+        "stream": "github",
+    },
+    {
+        "name": "github_from_sh",
+        "script": "Github/GitJSON.py", "function": "main",
+        "kwargs": {"input_file": "SH/SH_CNRS_PROJ_INFO.json", "output_file": "Github/CNRS_GITHUB_FROM_SH.json"},
+        "secrets": {"token": "GITHUB_TOKEN"},
+        "inputs": ["SH/SH_CNRS_PROJ_INFO.json"], "outputs": ["Github/CNRS_GITHUB_FROM_SH.json"],
+        "depends_on": ["sh_info"],
+        "stream": "github",
+    },
+    {
+        "name": "github_owners",
+        "script": "Github/GitOwnersRepoJSON.py", "function": "main",
+        "kwargs": {"input_filepath": "Github/CNRS_GITHUB_FROM_HAL.json", "output_filepath": "Github/CNRS_GITHUB_HAL_OWNERS_REPOS.json", "incremental": True},
+        "secrets": {"github_api_token": "GITHUB_TOKEN"},
+        "inputs": ["Github/CNRS_GITHUB_FROM_HAL.json"], "outputs": ["Github/CNRS_GITHUB_HAL_OWNERS_REPOS.json"],
+        "depends_on": ["github_from_hal"],
+        "stream": "project",
+        "work_queue": True,
+        "shard": True,
+        "full_crawl": True,
+    },
+    {
+        "name": "github_owners_info",
+        "script": "Github/GitOwnersRepoInfoJSON.py", "function": "main",
+        "kwargs": {"input_filepath": "Github/CNRS_GITHUB_HAL_OWNERS_REPOS.json", "output_filepath": "Github/CNRS_GITHUB_HAL_OWNERS_REPOS_INFO.json"},
+        "secrets": {"token": "GITHUB_TOKEN"},
+        "inputs": ["Github/CNRS_GITHUB_HAL_OWNERS_REPOS.json"], "outputs": ["Github/CNRS_GITHUB_HAL_OWNERS_REPOS_INFO.json"],
+        "depends_on": ["github_owners"],
+        "stream": "github",
+        "work_queue": True,
+    },
+    {
+        "name": "gitlab",
+        "script": "Gitlab/GitlabPipeline.py", "function": "main",
+        "kwargs": {"input_file": "Gitlab/labs_gitlab.txt", "output_file": "Gitlab/transformed_projects.json", "incremental": True},
+        "inputs": ["Gitlab/labs_gitlab.txt"], "outputs": ["Gitlab/transformed_projects.json"],
+        "depends_on": [],
+        "stream": "project",
+        "source": True,
+        "work_queue": True,
+    },
+    {
+        "name": "external",
+        "script": "External/ExtJSON.py", "function": "main_directory",
+        "kwargs": {"input_dir": "External", "output_file": "External/ExtJSON.json", "stats_file": "External/ExtJSON_stats.json"},
+        "inputs": ["External/*.txt"], "outputs": ["External/ExtJSON.json"],
+        "depends_on": [],
+        "stream": "project",
+    },
+    {
+        "name": "merge_projects",
+        "script": "DB/ConcatenateJson.py", "function": "main",
+        "kwargs": {
+            "json_files": ["Hal/CNRS_HAL.json", "SH/SH_CNRS_PROJ_INFO.json", "Github/CNRS_GITHUB_HAL_OWNERS_REPOS.json",
+                           "Gitlab/transformed_projects.json", "External/ExtJSON.json"],
+            "output_file": "DB/CNRS_HAL_GITMOD1.json",
+        },
+        "inputs": ["Hal/CNRS_HAL.json", "SH/SH_CNRS_PROJ_INFO.json", "Github/CNRS_GITHUB_HAL_OWNERS_REPOS.json",
+                   "Gitlab/transformed_projects.json", "External/ExtJSON.json"],
+        "outputs": ["DB/CNRS_HAL_GITMOD1.json"],
+        "depends_on": ["hal", "sh_info", "github_owners", "gitlab", "external"],
+        "batch_load": True,
+    },
+    {
+        "name": "merge_github",
+        "script": "DB/ConcatenateJson.py", "function": "main",
+        "kwargs": {
+            "json_files": ["Github/CNRS_GITHUB_FROM_HAL.json", "Github/CNRS_GITHUB_FROM_SH.json", "Github/CNRS_GITHUB_HAL_OWNERS_REPOS_INFO.json"],
+            "output_file": "DB/CNRS_HAL_GITHUB_GITMOD1.json",
+        },
+        "inputs": ["Github/CNRS_GITHUB_FROM_HAL.json", "Github/CNRS_GITHUB_FROM_SH.json", "Github/CNRS_GITHUB_HAL_OWNERS_REPOS_INFO.json"],
+        "outputs": ["DB/CNRS_HAL_GITHUB_GITMOD1.json"],
+        "depends_on": ["github_from_hal", "github_from_sh", "github_owners_info"],
+        "batch_load": True,
+    },
+    {
+        "name": "database",
+        "script": "DB/DataBase.py", "function": "main",
+        "kwargs": {"json_file_hal": "DB/CNRS_HAL_GITMOD1.json", "json_file_github": "DB/CNRS_HAL_GITHUB_GITMOD1.json"},
+        "inputs": ["DB/CNRS_HAL_GITMOD1.json", "DB/CNRS_HAL_GITHUB_GITMOD1.json"], "outputs": [],
+        "depends_on": ["merge_projects", "merge_github"],
+        "batch_load": True,
+    },
+]
+
+def absolute_path(path):
+    return os.path.join(ROOT_DIR, path)
+
+def absolute_kwargs(value):
+    """
+    Convertit récursivement en chemins absolus les paramètres d'une étape qui désignent un chemin
+    relatif à la racine (chaînes commençant par un répertoire du dépôt, ex. "Hal/CNRS_HAL.json").
+    """
+    if isinstance(value, dict):
+        return {key: absolute_kwargs(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [absolute_kwargs(item) for item in value]
+    if isinstance(value, str) and value and os.path.isdir(absolute_path(value.split('/')[0])):
+        return absolute_path(value)
+    return value
+
+def expand_inputs(patterns):
+    """
+    Développe les motifs (ex. "External/*.txt") en liste triée de fichiers.
+    """
+    files = []
+    for pattern in patterns:
+        files.extend(sorted(glob.glob(absolute_path(pattern))))
+    return files
+
+def stage_fingerprint(stage):
+    """
+    Calcule l'empreinte d'une étape : contenu de ses entrées, de son script et ses paramètres.
+
+    Args:
+        stage (dict): Description de l'étape.
+
+    Returns:
+        str: Empreinte hexadécimale, ou None si une entrée est manquante.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(stage["kwargs"], sort_keys=True).encode('utf-8'))
+    for path in [absolute_path(stage["script"])] + expand_inputs(stage["inputs"]):
+        if not os.path.exists(path):
+            return None
+        digest.update(path.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def stage_secrets(stage, node=None):
+    """
+    Lit les secrets d'une étape dans les variables d'environnement.
+
+    Args:
+        stage (dict): Description de l'étape.
+        node (str): Nœud d'une collecte répartie : ses secrets sont lus en priorité dans les variables
+            suffixées par son nom (ex. GITHUB_TOKEN_NODE0).
+
+    Returns:
+        dict: Paramètre de la fonction -> valeur du secret.
+
+    Raises:
+        ValueError: Si une variable requise n'est pas définie.
+    """
+    secrets, missing = {}, []
+    for parameter, variable in stage.get("secrets", {}).items():
+        node_variable = f"{variable}_{node.upper().replace('-', '_')}" if node else None
+        if node_variable and os.environ.get(node_variable):
+            secrets[parameter] = os.environ[node_variable]
+        elif os.environ.get(variable):
+            secrets[parameter] = os.environ[variable]
+        else:
+            missing.append(f"{node_variable} ou {variable}" if node_variable else variable)
+    if missing:
+        raise ValueError(f"Étape {stage['name']} : variable(s) d'environnement non définie(s) : {', '.join(missing)}")
+    return secrets
+
+def check_secrets(stages, force=False, refresh_sources=True):
+    """
+    Vérifie avant l'exécution que les secrets des étapes qui ne seront pas ignorées sont définis,
+    pour ne pas échouer au milieu du pipeline.
+
+    Args:
+        stages (list): Étapes à exécuter.
+        force (bool): Voir run_pipeline.
+        refresh_sources (bool): Voir run_pipeline.
+
+    Raises:
+        ValueError: Si une variable requise n'est pas définie.
+    """
+    state = load_state()
+    errors = []
+    for stage in stages:
+        if should_skip(stage, state, force, refresh_sources):
+            continue
+        try:
+            stage_secrets(stage)
+        except ValueError as e:
+            errors.append(str(e))
+    if errors:
+        raise ValueError('\n'.join(errors))
+
+def run_stage(stage, node=None):
+    """
+    Exécute une étape dans un processus dédié, depuis le répertoire de son script
+    (les scripts y écrivent leurs fichiers d'état). Le répertoire courant et sys.path sont
+    rétablis à la fin, les processus du pool étant réutilisés.
+
+    Args:
+        stage (dict): Description de l'étape.
+        node (str): Nœud d'une collecte répartie (voir stage_secrets).
+
+    Returns:
+        float: Durée de l'étape en secondes.
+    """
+    kwargs = absolute_kwargs(stage["kwargs"])
+    kwargs.update(stage_secrets(stage, node))
+    script_dir = os.path.dirname(absolute_path(stage["script"]))
+    cwd = os.getcwd()
+    os.chdir(script_dir)
+    sys.path.insert(0, script_dir)
+    try:
+        module = importlib.import_module(os.path.splitext(os.path.basename(stage["script"]))[0])
+        # Les processus du pool sont réutilisés : chaque étape repart de mesures vides
+        os.environ.setdefault('CARTO_METRICS_DIR', METRICS_DIR)
+        Metrics.reset()
+        start = time.perf_counter()
+        with Profiling.profile_stage(stage["name"]):
+            getattr(module, stage["function"])(**kwargs)
+        return time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        if script_dir in sys.path:
+            sys.path.remove(script_dir)
+
+def run_workers(name, queue_name=None, processes=1):
+    """
+    Exécute une étape répartie par une file de travail, dans un ou plusieurs processus de cette machine.
+    D'autres machines peuvent exécuter la même étape avec le même nom de file (base CARTO_WORK_QUEUE partagée).
+
+    Args:
+        name (str): Nom de l'étape (marquée "work_queue").
+        queue_name (str): Nom de la file, à choisir pour une collecte répartie entre plusieurs machines
+            (par défaut, l'étape et l'empreinte de ses entrées et paramètres : une collecte interrompue reprend
+            là où elle s'était arrêtée, et la file est vidée une fois l'étape terminée pour que la suivante
+            ne réutilise pas ses résultats).
+        processes (int): Nombre de processus.
+
+    Returns:
+        float: Durée en secondes.
+    """
+    stage = next((stage for stage in STAGES if stage["name"] == name), None)
+    if stage is None or not stage.get("work_queue"):
+        raise ValueError(f"Étape sans file de travail : {name}")
+    default_queue = queue_name is None
+    if default_queue:
+        queue_name = f"{name}-{stage_fingerprint(stage)[:16]}"
+    stage = dict(stage, kwargs=dict(stage["kwargs"], work_queue=queue_name))
+    stage_secrets(stage)
+    print(f"[{name}] {processes} processus sur la file {queue_name}")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for future in [executor.submit(run_stage, stage) for _ in range(processes)]:
+            future.result()
+    if default_queue:
+        # Sortie écrite : une nouvelle exécution refait la collecte au lieu de relire ces résultats
+        with WorkQueue(queue_name) as queue:
+            queue.purge()
+    return time.perf_counter() - start
+
+def run_shards(name, nodes, node=None):
+    """
+    Exécute une étape répartie entre plusieurs nœuds par hachage cohérent. Avec node, seul ce nœud est exécuté
+    (les autres le sont sur leurs machines) ; sinon, chaque nœud est un processus local et les partitions
+    sont recombinées dans la sortie de l'étape.
+
+    Args:
+        name (str): Nom de l'étape (marquée "shard").
+        nodes (int | str): Nombre de nœuds, ou leurs noms séparés par des virgules.
+        node (str): Nœud à exécuter (par défaut, tous, localement).
+
+    Returns:
+        float: Durée en secondes.
+    """
+    stage = next((stage for stage in STAGES if stage["name"] == name), None)
+    if stage is None or not stage.get("shard"):
+        raise ValueError(f"Étape non répartissable : {name}")
+    nodes = node_names(nodes)
+    if node and node not in nodes:
+        raise ValueError(f"Nœud inconnu : {node}")
+    start = time.perf_counter()
+    selected = [node] if node else nodes
+    for selected_node in selected:
+        stage_secrets(stage, selected_node)
+    print(f"[{name}] nœuds {', '.join(selected)} sur {len(nodes)}")
+    with ProcessPoolExecutor(max_workers=len(selected)) as executor:
+        futures = [executor.submit(run_stage, dict(stage, kwargs=dict(stage["kwargs"], shard_node=selected_node, shard_nodes=nodes)), selected_node)
+                   for selected_node in selected]
+        for future in futures:
+            future.result()
+    if not node:
+        merge_stage_partitions(name)
+    return time.perf_counter() - start
+
+def merge_stage_partitions(name):
+    """
+    Recombine les partitions écrites par les nœuds d'une étape répartie dans sa sortie.
+
+    Args:
+        name (str): Nom de l'étape.
+    """
+    stage = next(stage for stage in STAGES if stage["name"] == name)
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'DB'))
+    from ConcatenateJson import merge_partitions
+    for output in stage["outputs"]:
+        merge_partitions(absolute_path(output))
+
+def select_stages(names):
+    """
+    Retourne les étapes demandées et toutes celles dont elles dépendent, dans l'ordre de STAGES.
+    """
+    by_name = {stage["name"]: stage for stage in STAGES}
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise ValueError(f"Étape inconnue : {name}")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(by_name[name]["depends_on"])
+    return [stage for stage in STAGES if stage["name"] in selected]
+
+def with_full_crawl(stages):
+    """
+    Force une collecte complète des étapes incrémentales marquées "full_crawl" (paramètre full_crawl_days=0),
+    qui sinon n'en font une que périodiquement. Le paramètre modifie l'empreinte : ces étapes ne sont pas ignorées.
+    """
+    return [dict(stage, kwargs=dict(stage["kwargs"], full_crawl_days=0)) if stage.get("full_crawl") else stage
+            for stage in stages]
+
+def load_state():
+    """
+    Lit l'état des dernières exécutions réussies (pipeline_state.json).
+    """
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def should_skip(stage, state, force=False, refresh_sources=True):
+    """
+    Indique si une étape peut être ignorée : ses sorties existent et ni ses entrées, ni ses paramètres,
+    ni son script n'ont changé (voir run_pipeline).
+    """
+    if force or not all(os.path.exists(absolute_path(path)) for path in stage["outputs"]):
+        return False
+    if stage.get("source") or not stage["inputs"]:
+        # Collecteur interrogeant une API : ses entrées locales ne suffisent pas à savoir s'il a changé
+        return not refresh_sources
+    return state.get(stage["name"], {}).get("fingerprint") == stage_fingerprint(stage)
+
+def run_pipeline(stages, max_workers=4, force=False, refresh_sources=True, loader=None):
+    """
+    Exécute les étapes en respectant leurs dépendances, les étapes indépendantes en parallèle.
+
+    Args:
+        stages (list): Étapes à exécuter (dépendances incluses).
+        max_workers (int): Nombre maximal d'étapes simultanées.
+        force (bool): Exécute toutes les étapes, même inchangées.
+        refresh_sources (bool): Exécute les collecteurs qui interrogent une API sans fichier d'entrée local
+            (sinon leurs sorties existantes sont réutilisées).
+        loader (StreamLoader): Chargement en flux démarré, qui reçoit les sorties des étapes marquées "stream"
+            et est terminé avec le pipeline.
+
+    Returns:
+        dict: Rapport d'exécution par étape (statut, durée).
+
+    Raises:
+        ValueError: Si le secret d'une étape à exécuter n'est pas défini (voir check_secrets).
+    """
+    check_secrets(stages, force, refresh_sources)
+    state = load_state()
+
+    names = {stage["name"] for stage in stages}
+    remaining = {stage["name"]: stage for stage in stages}
+    done, failed = set(), set()
+    report = {}
+    running = {}
+    pipeline_start = time.perf_counter()
+
+    def ready(stage):
+        deps = [dep for dep in stage["depends_on"] if dep in names]
+        return all(dep in done for dep in deps)
+
+    def stream_outputs(stage):
+        if loader is not None and stage.get("stream"):
+            for path in stage["outputs"]:
+                loader.feed_file(absolute_path(path), stage["stream"])
+
+    # Le chargement en flux tourne dans des threads de ce processus : les processus des étapes ne sont pas créés par fork
+    mp_context = multiprocessing.get_context('spawn') if loader is not None else None
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        while remaining or running:
+            # Étapes dont une dépendance a échoué
+            for name, stage in list(remaining.items()):
+                if any(dep in failed for dep in stage["depends_on"]):
+                    failed.add(name)
+                    report[name] = {"status": "cancelled"}
+                    del remaining[name]
+                    print(f"[{name}] annulée (dépendance en échec)")
+
+            for name, stage in list(remaining.items()):
+                if not ready(stage):
+                    continue
+                del remaining[name]
+                if should_skip(stage, state, force, refresh_sources):
+                    done.add(name)
+                    report[name] = {"status": "skipped", "seconds": 0.0}
+                    print(f"[{name}] inchangée, ignorée")
+                    stream_outputs(stage)
+                    continue
+                print(f"[{name}] démarrage")
+                running[executor.submit(run_stage, stage)] = (stage, time.perf_counter())
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, started = running.pop(future)
+                name = stage["name"]
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    failed.add(name)
+                    report[name] = {"status": "failed", "error": repr(e), "seconds": round(time.perf_counter() - started, 3)}
+                    print(f"[{name}] échec : {e!r}")
+                    continue
+                done.add(name)
+                report[name] = {"status": "done", "seconds": round(seconds, 3)}
+                state[name] = {
+                    "fingerprint": stage_fingerprint(stage),
+                    "seconds": round(seconds, 3),
+                    "finished_at": datetime.now().isoformat(timespec='seconds'),
+                }
+                with open(STATE_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=4)
+                print(f"[{name}] terminée en {seconds:.1f} s")
+                stream_outputs(stage)
+
+    if loader is not None:
+        # Fin du chargement des dernières sorties
+        start = time.perf_counter()
+        try:
+            # Si une étape a échoué, la base en service n'est pas remplacée par une base incomplète
+            counts = loader.close(publish=not failed)
+            report["stream_db"] = {"status": "cancelled" if failed else "done", "seconds": round(time.perf_counter() - start, 3), **counts}
+        except Exception as e:
+            failed.add("stream_db")
+            report["stream_db"] = {"status": "failed", "error": repr(e), "seconds": round(time.perf_counter() - start, 3)}
+            print(f"[stream_db] échec : {e!r}")
+        Metrics.write_run_report('stream_db')
+
+    total = time.perf_counter() - pipeline_start
+    with open(REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"total_seconds": round(total, 3), "stages": report}, f, ensure_ascii=False, indent=4)
+    print(f"Pipeline terminé en {total:.1f} s ({len(failed)} étape(s) en échec). Rapport : {REPORT_FILE}")
+    return report
+
+def run_streaming(stages, max_workers=4, force=False, refresh_sources=True, db_config=None):
+    """
+    Exécute les étapes en chargeant la base pendant la collecte (voir DB/StreamLoader.py), sans les étapes
+    marquées "batch_load".
+
+    Args:
+        stages (list): Étapes à exécuter (dépendances incluses).
+        max_workers (int): Nombre maximal d'étapes simultanées.
+        force (bool): Exécute toutes les étapes, même inchangées.
+        refresh_sources (bool): Voir run_pipeline.
+        db_config (dict): Configuration de la base de données (par défaut, celle de DB/DataBase.py).
+
+    Returns:
+        dict: Rapport d'exécution par étape, avec l'entrée "stream_db" du chargement.
+    """
+    stages = [stage for stage in stages if not stage.get("batch_load")]
+    check_secrets(stages, force, refresh_sources)
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'DB'))
+    from DataBase import DEFAULT_DB_CONFIG
+    from StreamLoader import StreamLoader
+    os.environ.setdefault('CARTO_METRICS_DIR', METRICS_DIR)
+    Metrics.reset()
+    loader = StreamLoader(db_config or DEFAULT_DB_CONFIG).start()
+    return run_pipeline(stages, max_workers=max_workers, force=force, refresh_sources=refresh_sources, loader=loader)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mise à jour complète de la cartographie des logiciels du CNRS.")
+    parser.add_argument('--stages', nargs='*', help="Étapes à exécuter (avec leurs dépendances). Par défaut : toutes.")
+    parser.add_argument('--workers', type=int, default=4, help="Nombre maximal d'étapes simultanées.")
+    parser.add_argument('--force', action='store_true', help="Exécute toutes les étapes, même inchangées.")
+    parser.add_argument('--no-refresh', action='store_true', help="Réutilise les sorties existantes des collecteurs sans entrée locale.")
+    parser.add_argument('--list', action='store_true', help="Affiche les étapes et leurs dépendances.")
+    parser.add_argument('--worker', metavar='STAGE', help="Exécute une seule étape, répartie par une file de travail.")
+    parser.add_argument('--queue', help="Nom de la file de travail de --worker (par défaut : étape et empreinte de ses entrées).")
+    parser.add_argument('--processes', type=int, default=1, help="Nombre de processus de --worker sur cette machine.")
+    parser.add_argument('--shard', metavar='STAGE', help="Exécute une seule étape, répartie entre plusieurs nœuds.")
+    parser.add_argument('--nodes', default='2', help="Nœuds de --shard : nombre, ou noms séparés par des virgules.")
+    parser.add_argument('--node', help="Nœud de --shard exécuté sur cette machine (par défaut, tous, localement).")
+    parser.add_argument('--merge-partitions', metavar='STAGE', help="Recombine les partitions des nœuds d'une étape.")
+    parser.add_argument('--stream-db', action='store_true', help="Charge la base pendant la collecte, au lieu de la fusion et du chargement final.")
+    parser.add_argument('--full-crawl', action='store_true', help="Collecte complète des étapes incrémentales (retire les dépôts supprimés).")
+    args = parser.parse_args()
+
+    try:
+        if args.shard:
+            seconds = run_shards(args.shard, args.nodes, args.node)
+            print(f"[{args.shard}] terminée en {seconds:.1f} s")
+            return
+        if args.merge_partitions:
+            merge_stage_partitions(args.merge_partitions)
+            return
+
+        if args.worker:
+            seconds = run_workers(args.worker, args.queue, args.processes)
+            print(f"[{args.worker}] terminée en {seconds:.1f} s")
+            return
+
+        if args.list:
+            for stage in STAGES:
+                print(f"{stage['name']:<20} <- {', '.join(stage['depends_on']) or '-'}")
+            return
+
+        stages = select_stages(args.stages) if args.stages else STAGES
+        if args.full_crawl:
+            stages = with_full_crawl(stages)
+        if args.stream_db:
+            report = run_streaming(stages, max_workers=args.workers, force=args.force, refresh_sources=not args.no_refresh)
+        else:
+            report = run_pipeline(stages, max_workers=args.workers, force=args.force, refresh_sources=not args.no_refresh)
+    except ValueError as e:
+        sys.exit(f"Erreur : {e}")
+    if any(entry["status"] in ("failed", "cancelled") for entry in report.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
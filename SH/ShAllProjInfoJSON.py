@@ -1,12 +1,68 @@
-import requests
 import logging
 import json
 import os
-import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.AdaptiveConcurrency import get_controller
+from Common.ProjectIO import ProjectStreamWriter, iter_projects, load_projects_file
+from Common.ProjectStore import ProjectStore
+from Common.Scheduler import RefreshScheduler
+from Common.Sharding import HashRing, partition_file
+from Common.WorkQueue import WorkQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SH_API = "https://archive.softwareheritage.org/api/1"
+SH_GRAPHQL_URL = "https://archive.softwareheritage.org/graphql/"
+# Number of origins fetched by one GraphQL query
+GRAPHQL_BATCH_SIZE = 50
+# Fields requested for each origin: latest visit, HEAD branch of its snapshot and the revision it points to
+GRAPHQL_ORIGIN_FIELDS = """{
+    latestVisit(requireSnapshot: true) {
+      date
+      latestStatus(requireSnapshot: true) {
+        snapshot {
+          headBranch {
+            target {
+              type
+              node {
+                ... on Revision { swhid message { text } date { date } committerDate { date } author { name { text } email { text } } }
+              }
+            }
+          }
+        }
+      }
+    }
+  }"""
+# Maximum number of SWHIDs accepted by the /known/ endpoint in one request
+KNOWN_BATCH_SIZE = 1000
+
+def sh_request(method, url, endpoint, headers, label, **kwargs):
+    """
+    Call the Software Heritage API, waiting and retrying while the rate limit is exceeded.
+    Concurrent calls are throttled by the shared adaptive concurrency controller of the API.
+
+    Args:
+        method: HTTP method.
+        url: URL of the API call.
+        endpoint: Endpoint name used in the metrics.
+        headers: HTTP headers with authorization token.
+        label: Description of the requested object, for the error messages.
+        **kwargs: Other arguments passed to requests.
+
+    Returns:
+        JSON response or None if an error occurs.
+    """
+    response = get_controller('sh').request(method, url, endpoint, headers=headers, **kwargs)
+    if response.status_code == 200:
+        return response.json()
+    logging.error(f"Error {response.status_code} when retrieving the {label}.")
+    return None
+
 # Function to get the latest visit information of a repository
 def get_last_visit_info(origin_url, headers):
     """
@@ -19,17 +75,7 @@ def get_last_visit_info(origin_url, headers):
     Returns:
         JSON response with the latest visit information or None if an error occurs.
     """
-    url_latest_visit = f"https://archive.softwareheritage.org/api/1/origin/{origin_url}/visit/latest/"
-    while True:
-        response = requests.get(url_latest_visit, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 429:
-            logging.error(f"Error 429: Rate limit exceeded. Waiting 60 seconds before retrying...")
-            time.sleep(60)
-        else:
-            logging.error(f"Error {response.status_code} when retrieving the latest visit.")
-            return None
+    return sh_request('GET', f"{SH_API}/origin/{origin_url}/visit/latest/", 'sh:visit_latest', headers, "latest visit")
 
 # Function to get snapshot information
 def get_snapshot_info(snapshot_id, headers):
@@ -43,17 +89,7 @@ def get_snapshot_info(snapshot_id, headers):
     Returns:
         JSON response with the snapshot information or None if an error occurs.
     """
-    url_snapshot = f"https://archive.softwareheritage.org/api/1/snapshot/{snapshot_id}/"
-    while True:
-        response = requests.get(url_snapshot, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 429:
-            logging.error(f"Error 429: Rate limit exceeded. Waiting 60 seconds before retrying...")
-            time.sleep(60)
-        else:
-            logging.error(f"Error {response.status_code} when retrieving the snapshot.")
-            return None
+    return sh_request('GET', f"{SH_API}/snapshot/{snapshot_id}/", 'sh:snapshot', headers, "snapshot")
 
 # Function to get revision information
 def get_revision_info(revision_id, headers):
@@ -67,66 +103,80 @@ def get_revision_info(revision_id, headers):
     Returns:
         JSON response with the revision information or None if an error occurs.
     """
-    url_revision = f"https://archive.softwareheritage.org/api/1/revision/{revision_id}/"
-    while True:
-        response = requests.get(url_revision, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 429:
-            logging.error(f"Error 429: Rate limit exceeded. Waiting 60 seconds before retrying...")
-            time.sleep(60)
-        else:
-            logging.error(f"Error {response.status_code} when retrieving the revision.")
-            return None
+    return sh_request('GET', f"{SH_API}/revision/{revision_id}/", 'sh:revision', headers, "revision")
 
-# Function to get detailed information about a project
-def get_project_info(origin_url, headers):
+# Function to get release information
+def get_release_info(release_id, headers):
     """
-    Get detailed information about a project.
-    
+    Get release information.
+
     Args:
-        origin_url: URL of the project repository.
+        release_id: ID of the release.
         headers: HTTP headers with authorization token.
-        
+
     Returns:
-        Dictionary with detailed project information.
+        JSON response with the release information or None if an error occurs.
     """
-    visit_info = get_last_visit_info(origin_url, headers)
-    if not visit_info:
-        return {}
+    return sh_request('GET', f"{SH_API}/release/{release_id}/", 'sh:release', headers, "release")
 
-    snapshot_id = visit_info.get('snapshot')
-    snapshot_info = get_snapshot_info(snapshot_id, headers)
-    if not snapshot_info:
-        return {}
+def pick_head_revision(branches):
+    """
+    Pick the revision of the default branch of a snapshot.
 
-    branches = snapshot_info.get('branches', {})
-    revision_id = None
-    if "refs/heads/main" in branches:
-        revision_id = branches['refs/heads/main']['target']
-    else:
-        for key in branches:
-            if key != 'HEAD':
-                revision_id = branches[key]['target']
-                break
+    The HEAD alias is followed when present; otherwise main, then master, then the first
+    branch pointing to a revision is used.
 
-    revision_info = get_revision_info(revision_id, headers) if revision_id else {}
-    
+    Args:
+        branches: Branches of the snapshot.
+
+    Returns:
+        ID of the revision, or None if no branch points to a revision.
+    """
+    candidates = []
+    head = branches.get('HEAD')
+    if head and head.get('target_type') == 'alias':
+        candidates.append(head.get('target'))
+    candidates += ['refs/heads/main', 'refs/heads/master']
+    for name in candidates:
+        branch = branches.get(name)
+        if branch and branch.get('target_type', 'revision') == 'revision':
+            return branch['target']
+    for name, branch in branches.items():
+        if name != 'HEAD' and branch and branch.get('target_type', 'revision') == 'revision':
+            return branch['target']
+    return None
+
+def build_project_info(origin_url, revision_id, revision_info):
+    """
+    Build the project information from the revision (or release) describing the project.
+
+    The updated date is the commit date of the revision (the date of a release), whichever way
+    it was reached: it only changes when the archived project changes, unlike the date of the
+    latest visit, and is the change signal of the refresh scheduler.
+
+    Args:
+        origin_url: URL of the project repository.
+        revision_id: ID of the revision.
+        revision_info: Revision (or release) information, possibly empty.
+
+    Returns:
+        Dictionary with detailed project information.
+    """
     title = os.path.basename(origin_url).replace('.git', '').replace('_', ' ').replace('-', ' ')
 
     authors = []
     if revision_info:
-        author_name = revision_info.get('author', {}).get('name', 'Unknown')
-        author_email = revision_info.get('author', {}).get('email', 'Unknown')
-        authors.append({"name": author_name, "mail": author_email})
+        author = revision_info.get('author') or {}
+        authors.append({"name": author.get('name') or 'Unknown', "mail": author.get('email') or 'Unknown'})
+    updated_date = (revision_info.get('committer_date') or revision_info.get('date')) if revision_info else None
 
-    project_info = {
+    return {
         "title": title,
         "authors": authors,
         "sh_id": revision_id,
         "abstract": revision_info.get('message', 'Unknown') if revision_info else 'Unknown',
         "submitted_date": revision_info.get('date', 'Unknown') if revision_info else 'Unknown',
-        "updated_date": visit_info.get('date', 'Unknown'),
+        "updated_date": updated_date or 'Unknown',
         "softCodeRepository": origin_url,
         "domain": "",  
         "language": "",
@@ -134,64 +184,434 @@ def get_project_info(origin_url, headers):
         "keyword": "",
         "source": "Software_heritage",
     }
+
+# Function to get detailed information about a project
+def get_project_info(origin_url, headers):
+    """
+    Get detailed information about a project.
     
-    return project_info
+    Args:
+        origin_url: URL of the project repository.
+        headers: HTTP headers with authorization token.
+        
+    Returns:
+        Dictionary with detailed project information.
+    """
+    visit_info = get_last_visit_info(origin_url, headers)
+    if not visit_info:
+        return {}
+
+    snapshot_id = visit_info.get('snapshot')
+    snapshot_info = get_snapshot_info(snapshot_id, headers)
+    if not snapshot_info:
+        return {}
+
+    revision_id = pick_head_revision(snapshot_info.get('branches', {}))
+    revision_info = get_revision_info(revision_id, headers) if revision_id else {}
+
+    return build_project_info(origin_url, revision_id, revision_info)
+
+def graphql_revision_info(revision):
+    """
+    Convert a revision of the GraphQL API to the format of the /revision/ endpoint.
+
+    Args:
+        revision: Revision node of a GraphQL response.
+
+    Returns:
+        Revision information (author, message, date, committer_date).
+    """
+    author = revision.get('author') or {}
+    if isinstance(author, list):
+        author = author[0] if author else {}
+    return {
+        "author": {"name": (author.get('name') or {}).get('text', 'Unknown'),
+                   "email": (author.get('email') or {}).get('text', 'Unknown')},
+        "message": (revision.get('message') or {}).get('text', 'Unknown'),
+        "date": (revision.get('date') or {}).get('date', 'Unknown'),
+        "committer_date": (revision.get('committerDate') or {}).get('date'),
+    }
+
+def get_projects_info_graphql(origin_urls, headers):
+    """
+    Get detailed information about a batch of projects with one query to the GraphQL API.
+
+    Produces the same dictionaries as get_project_info, without downloading the snapshots.
+
+    Args:
+        origin_urls: URLs of the project repositories.
+        headers: HTTP headers with authorization token.
+
+    Returns:
+        Dictionary origin URL -> project information. Origins the query could not resolve
+        (unknown origin, HEAD branch not pointing to a revision, query error) are missing.
+    """
+    fields = [f"  o{index}: origin(url: {json.dumps(origin_url)}) {GRAPHQL_ORIGIN_FIELDS}"
+              for index, origin_url in enumerate(origin_urls)]
+    query = "query {\n" + "\n".join(fields) + "\n}"
+    result = sh_request('POST', SH_GRAPHQL_URL, 'sh:graphql', headers, "GraphQL batch", json={"query": query})
+    data = (result or {}).get('data') or {}
 
-def main(input_file, output_file, token):
+    projects_info = {}
+    for index, origin_url in enumerate(origin_urls):
+        visit = (data.get(f"o{index}") or {}).get('latestVisit')
+        if not visit:
+            continue
+        snapshot = ((visit.get('latestStatus') or {}).get('snapshot') or {})
+        target = (snapshot.get('headBranch') or {}).get('target') or {}
+        revision = target.get('node')
+        if target.get('type') != 'revision' or not revision:
+            continue
+        revision_id = revision['swhid'].split(':')[-1]
+        projects_info[origin_url] = build_project_info(origin_url, revision_id, graphql_revision_info(revision))
+    return projects_info
+
+def parse_swhid(swhid):
+    """
+    Parse a SWHID with its qualifiers, e.g.
+    swh:1:dir:<hash>;origin=<url>;visit=swh:1:snp:<hash>;anchor=swh:1:rev:<hash>;path=/
+
+    Args:
+        swhid: SWHID, as found in the swhidId_s field of HAL.
+
+    Returns:
+        Dictionary with the object type, hash, core SWHID and qualifiers, or None if the SWHID is invalid.
+    """
+    core, *qualifiers = [part.strip() for part in (swhid or '').split(';')]
+    parts = core.split(':')
+    if len(parts) != 4 or parts[0] != 'swh' or len(parts[3]) != 40:
+        return None
+    return {
+        "type": parts[2],
+        "hash": parts[3].lower(),
+        "core": core.lower(),
+        "qualifiers": dict(qualifier.split('=', 1) for qualifier in qualifiers if '=' in qualifier),
+    }
+
+def swhid_target(swhid):
+    """
+    Find the revision or release a SWHID points to: the SWHID itself, or its anchor.
+
+    Args:
+        swhid: Parsed SWHID (see parse_swhid).
+
+    Returns:
+        Core SWHID of the revision or release, or None if the SWHID does not identify one.
+    """
+    if swhid["type"] in ('rev', 'rel'):
+        return swhid["core"]
+    anchor = parse_swhid(swhid["qualifiers"].get('anchor'))
+    if anchor and anchor["type"] in ('rev', 'rel'):
+        return anchor["core"]
+    return None
+
+def check_known(swhids, headers):
+    """
+    Check which SWHIDs are archived, in batches, with the bulk /known/ endpoint.
+
+    Args:
+        swhids: Core SWHIDs to check.
+        headers: HTTP headers with authorization token.
+
+    Returns:
+        Set of the archived SWHIDs.
+    """
+    swhids = list(dict.fromkeys(swhids))
+    known = set()
+    for start in range(0, len(swhids), KNOWN_BATCH_SIZE):
+        batch = swhids[start:start + KNOWN_BATCH_SIZE]
+        result = sh_request('POST', f"{SH_API}/known/", 'sh:known', headers, "known SWHIDs", json=batch)
+        if result is None:
+            # Unable to check: the SWHIDs are resolved anyway
+            known.update(batch)
+            continue
+        known.update(swhid for swhid, status in result.items() if status.get('known'))
+    return known
+
+def get_swhid_project_info(origin_url, swhid, headers, known=None):
+    """
+    Get detailed information about a project identified by a SWHID, without walking the latest visit.
+
+    The revision or release the SWHID points to is resolved directly (one call). A SWHID pointing to
+    a snapshot only costs the snapshot and the revision of its HEAD branch.
+
+    Args:
+        origin_url: URL of the project repository.
+        swhid: Parsed SWHID (see parse_swhid).
+        headers: HTTP headers with authorization token.
+        known: Set of the archived SWHIDs (see check_known), or None if not checked.
+
+    Returns:
+        Dictionary with detailed project information, or {} if the SWHID cannot be resolved.
+    """
+    target = swhid_target(swhid)
+    if target:
+        if known is not None and target not in known:
+            return {}
+        target_type, target_hash = target.split(':')[2:]
+        if target_type == 'rev':
+            revision_info = get_revision_info(target_hash, headers)
+            if not revision_info:
+                return {}
+            return build_project_info(origin_url, target_hash, revision_info)
+        release_info = get_release_info(target_hash, headers)
+        if not release_info:
+            return {}
+        revision_id = release_info.get('target') if release_info.get('target_type') == 'revision' else target_hash
+        return build_project_info(origin_url, revision_id, release_info)
+
+    snapshot = parse_swhid(swhid["qualifiers"].get('visit')) if swhid["type"] != 'snp' else swhid
+    if not snapshot or snapshot["type"] != 'snp':
+        return {}
+    snapshot_info = get_snapshot_info(snapshot["hash"], headers)
+    if not snapshot_info:
+        return {}
+    revision_id = pick_head_revision(snapshot_info.get('branches', {}))
+    revision_info = get_revision_info(revision_id, headers) if revision_id else {}
+    return build_project_info(origin_url, revision_id, revision_info)
+
+def normalize_origin(url):
+    return url.strip().lower().rstrip('/').removesuffix('.git')
+
+def load_swhid_index(swhid_file):
+    """
+    Index the SWHIDs of the HAL records by origin URL.
+
+    Args:
+        swhid_file: File of HAL projects (output of HalJSON.py, swhId and softCodeRepository_sh fields).
+
+    Returns:
+        Dictionary normalized origin URL -> SWHID.
+    """
+    index = {}
+    for project in iter_projects(swhid_file):
+        swhid = project.get('swhId')
+        parsed = parse_swhid(swhid)
+        origin = project.get('softCodeRepository_sh') or (parsed["qualifiers"].get('origin') if parsed else None)
+        if parsed and origin:
+            index[normalize_origin(origin)] = swhid
+    return index
+
+def fetch_projects_info(batch, headers, known, backend="rest"):
+    """
+    Fetch the information of a batch of origins: the origins identified by a SWHID are resolved
+    from it, the others are fetched with the GraphQL API (with the "graphql" backend) and, as a
+    last resort, with the REST API. The calls of the batch run concurrently.
+
+    Args:
+        batch: List of (origin URL, parsed SWHID or None) pairs.
+        headers: Headers of the API calls.
+        known: Set of the core SWHIDs known to the archive (see check_known).
+        backend: "rest" or "graphql".
+
+    Returns:
+        Dictionary origin URL -> project information (origins that could not be fetched are missing).
+    """
+    controller = get_controller('sh')
+    batch_info = {}
+    swhid_batch = [(origin_url, swhid) for origin_url, swhid in batch if swhid]
+    resolved = controller.map(lambda item: get_swhid_project_info(item[0], item[1], headers, known), swhid_batch)
+    for (origin_url, swhid), project_info in zip(swhid_batch, resolved):
+        Metrics.count('sh_swhid_resolutions_total', path='swhid' if project_info else 'origin')
+        if project_info:
+            batch_info[origin_url] = project_info
+    if backend == "graphql":
+        remaining = [origin_url for origin_url, swhid in batch if origin_url not in batch_info]
+        if remaining:
+            batch_info.update(get_projects_info_graphql(remaining, headers))
+
+    # The origins walked with the REST API are processed concurrently
+    remaining = [origin_url for origin_url, swhid in batch if origin_url not in batch_info]
+    batch_info.update(zip(remaining, controller.map(lambda origin_url: get_project_info(origin_url, headers), remaining)))
+    return batch_info
+
+def store_meta(output_file):
+    """
+    Describe the output file a project store is written to, to detect a store that no longer matches it.
+
+    Args:
+        output_file: Path to the output file.
+
+    Returns:
+        Path, size and modification time of the file (None if it does not exist).
+    """
+    state = None
+    if os.path.exists(output_file):
+        stat = os.stat(output_file)
+        state = [stat.st_size, stat.st_mtime_ns]
+    return {"output_file": os.path.abspath(output_file), "state": state}
+
+def main(input_file, output_file, token, store_dir="sh_store", swhid_file=None, backend="rest", batch_size=GRAPHQL_BATCH_SIZE, refresh_budget=None, work_queue=None,
+         shard_node=None, shard_nodes=None):
     """
     Main function to fetch project data and save it to a JSON file.
+
+    Fetched projects are appended to a persistent project store, which is used to skip
+    origins already processed (O(1) lookup by URL) and to resume an interrupted run.
+    The output file is written from the store at the end, then the store is compacted if
+    replaced versions make up most of it. The store remembers the output file it was written
+    to: if that file was changed or replaced since, the store is rebuilt from it.
+
+    Origins already in the store are fetched again only when the refresh scheduler
+    (Common.Scheduler) finds them due, based on their updated date (see build_project_info): dormant
+    origins are revisited at exponentially growing intervals.
+
+    Origins already identified by a SWHID (a swhId field in the input, or a HAL record of
+    swhid_file) are resolved directly from the SWHID: their revisions and releases are first
+    checked in bulk with the /known/ endpoint, then resolved with one call each.
+
+    With the "graphql" backend, the other origins are fetched by batches with the GraphQL
+    API (one query per batch instead of three calls per origin); the origins it cannot
+    resolve are fetched with the REST API.
+
+    Origins are processed by batches of batch_size; the calls of a batch run concurrently,
+    under the adaptive concurrency controller of the API (Common.AdaptiveConcurrency).
+
+    With work_queue, the origins to process are shared through a work queue (Common.WorkQueue)
+    by all the processes running main with the same arguments: each process fetches the batches
+    it leases, and adds all the results of the queue to its store once the queue is drained.
+
+    With shard_node, the origins are split by consistent hashing across the shard_nodes nodes
+    (Common.Sharding): this node only processes its own origins, keeps its own store and
+    writes its own partition of the output, to be recombined with JsonMerger.
     
     Args:
         input_file: Path to the input JSON file with project URLs.
         output_file: Path to the output JSON file to save project information.
         token: Authorization token for the Software Heritage API.
+        store_dir: Directory of the persistent project store of this output file.
+        swhid_file: Optional file of HAL projects (output of HalJSON.py) whose SWHIDs are used.
+        backend: "rest" (latest visit, snapshot and revision of each origin) or "graphql".
+        batch_size: Number of origins per batch (and per GraphQL query).
+        refresh_budget: Maximum number of origins already in the store to fetch again (None: all the due ones).
+        work_queue: Optional name of a work queue shared with other processes.
+        shard_node: Optional name of this node in a sharded run.
+        shard_nodes: Nodes of the sharded run (number, comma-separated names or list).
     """
     headers = {"Authorization": f"Bearer {token}"}
     
     # Load the input file
     try:
-        with open(input_file, "r", encoding='utf-8') as file:
-            input_data = json.load(file)
-            projects = input_data.get("projects", [])
-            logging.info(f"{len(projects)} projects loaded from input file.")
+        input_data = load_projects_file(input_file)
+        projects = input_data.get("projects", [])
+        logging.info(f"{len(projects)} projects loaded from input file.")
     except FileNotFoundError:
         logging.error(f"Input file {input_file} not found.")
         return
+
+    ring = None
+    if shard_node:
+        ring = HashRing(shard_nodes)
+        projects = [project for project in projects if ring.owns(shard_node, normalize_origin(project.get("url", "N/A")))]
+        logging.info(f"Node {shard_node}: {len(projects)} projects on {len(ring.nodes)} nodes.")
+        store_dir = partition_file(store_dir, shard_node)
+    # File written from the store at the end
+    export_file = partition_file(output_file, shard_node) if ring else output_file
     
-    # Load existing output file if it exists
-    if os.path.exists(output_file):
-        try:
-            with open(output_file, "r", encoding='utf-8') as file:
-                structured_data = json.load(file)
-                existing_urls = {project["softCodeRepository"] for project in structured_data["projects"]}
-        except json.JSONDecodeError:
-            logging.error("Error decoding output file, starting with a new file")
-            structured_data = {"number_of_projects": 0, "projects": []}
-            existing_urls = set()
-    else:
-        structured_data = {"number_of_projects": 0, "projects": []}
-        existing_urls = set()
-
-    # Process each project in the input file
-    for project in projects:
-        origin_url = project.get("url", "N/A")
-        if origin_url in existing_urls or origin_url == "N/A":
-            continue
-        
-        project_info = get_project_info(origin_url, headers)
-        if project_info:
-            structured_data["projects"].append(project_info)
-            structured_data["number_of_projects"] += 1
+    with ProjectStore(store_dir) as store:
+        # A store written to another file, or to a file modified since, no longer matches the output
+        if not store.is_empty() and store.read_meta() != store_meta(export_file):
+            logging.info(f"Project store {store_dir} does not match {export_file}, rebuilding it.")
+            store.clear()
+
+        # Import the existing output file into a new store
+        if store.is_empty() and os.path.exists(output_file):
+            try:
+                count = store.import_file(output_file)
+                logging.info(f"{count} projects imported from existing output file.")
+            except (json.JSONDecodeError, EOFError, OSError):
+                logging.error("Error decoding output file, starting with a new file")
+                store.clear()
+        store.write_meta(store_meta(export_file))
+
+        swhid_index = load_swhid_index(swhid_file) if swhid_file and os.path.exists(swhid_file) else {}
+
+        # Select the projects of the input file still to process: new origins and origins due for a refresh
+        scheduler = RefreshScheduler('sh_origins')
+        origin_urls = [project.get("url", "N/A") for project in projects if project.get("url", "N/A") != "N/A"]
+        stored = {origin_url: store.get("url", origin_url) for origin_url in origin_urls}
+        stored = {origin_url: project for origin_url, project in stored.items() if project}
+        scheduler.seed((origin_url, project.get("updated_date"), project.get("updated_date")) for origin_url, project in stored.items())
+        refresh = scheduler.plan(origin_urls, refresh_budget, required=[origin_url for origin_url in origin_urls if origin_url not in stored])
+
+        pending = []
+        for project in projects:
+            origin_url = project.get("url", "N/A")
+            if origin_url == "N/A":
+                continue
+            if origin_url in stored and origin_url not in refresh:
+                Metrics.cache_lookup('sh_store', hit=True)
+                continue
+            Metrics.cache_lookup('sh_store', hit=False)
+            swhid = parse_swhid(project.get("swhId") or swhid_index.get(normalize_origin(origin_url)))
+            pending.append((origin_url, swhid))
+
+        def process_batch(batch):
+            # Returns the project information of each origin of the batch (None if it could not be fetched)
+            batch_info = fetch_projects_info(batch, headers, known if known is not None else batch_known(batch), backend)
+            for origin_url, swhid in batch:
+                project_info = batch_info.get(origin_url)
+                if project_info:
+                    scheduler.observe(origin_url, project_info.get("updated_date"), changed_at=project_info.get("updated_date"))
+            return [batch_info.get(origin_url) for origin_url, swhid in batch]
+
+        def batch_known(batch):
+            targets = [swhid_target(swhid) for origin_url, swhid in batch if swhid]
+            return check_known([target for target in targets if target], headers) if targets else set()
+
+        def store_results(results):
+            for origin_url, project_info in results:
+                if project_info:
+                    store.put(project_info)
+                    logging.info(f"Project {project_info['title']} added to the project store.")
+
+        writer = True
+        if work_queue:
+            # The archived SWHIDs are checked by the process that leases each batch
+            known = None
+            with WorkQueue(work_queue) as queue:
+                queue.enqueue((origin_url, {"url": origin_url, "swhid": swhid}) for origin_url, swhid in pending)
+                queue.run_worker(lambda items: process_batch([(item["url"], item["swhid"]) for item in items]), batch_size=batch_size)
+                writer = queue.claim_output()
+                if writer:
+                    store_results(queue.results())
+                    dead = queue.dead_letters()
+                    if dead:
+                        logging.error(f"{len(dead)} origins could not be processed (see python Common/WorkQueue.py dead {work_queue}).")
+        else:
+            targets = [swhid_target(swhid) for origin_url, swhid in pending if swhid]
+            known = check_known([target for target in targets if target], headers)
+            logging.info(f"{len(targets)} projects identified by a SWHID, {len(known)} archived revisions or releases.")
+
+            # Process each remaining project
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                store_results(zip([origin_url for origin_url, swhid in batch], process_batch(batch)))
 
-            # Save output file after each project
-            with open(output_file, "w", encoding='utf-8') as file:
-                json.dump(structured_data, file, ensure_ascii=False, indent=4)
-            logging.info(f"Project {project_info['title']} added to output file.")
+        # Unless the output is written by another process of the work queue
+        if writer and ring:
+            # Partition of this node: its own origins only (the store may hold projects imported from the full output)
+            with ProjectStreamWriter(export_file) as partition:
+                for project in store.iter_projects():
+                    if ring.owns(shard_node, normalize_origin(project.get("softCodeRepository", ""))):
+                        partition.write(project)
+                count = partition.count
+            logging.info(f"Structured data saved in {export_file} ({count} projects)")
+        elif writer:
+            count = store.export_file(export_file)
+            logging.info(f"Structured data saved in {export_file} ({count} projects)")
+        if writer:
+            if store.needs_compaction():
+                count = store.compact()
+                logging.info(f"Project store {store_dir} compacted ({count} projects).")
+            store.write_meta(store_meta(export_file))
+        scheduler.close()
 
-    logging.info(f"Structured data saved in {output_file}")
+    Metrics.write_run_report('sh_info')
 
 if __name__ == "__main__":
     input_file = "SH_CNRS_PROJ.json" 
     output_file = "SH_CNRS.json"  
     token = "YOUR_PERSONAL_SH_TOKEN"
-    main(input_file, output_file, token)
+    with Profiling.profile_stage('sh_info'):
+        main(input_file, output_file, token)
@@ -1,68 +1,199 @@
 import requests
 import time
 import json
-from urllib.parse import urljoin
-
-def fetch_all_data(token):
-    state_file = "fetch_state.json"  # Nom du fichier d'état
-    base_url = "https://archive.softwareheritage.org/api/1/origin/search/cnrs/"
-    headers = {"Authorization": f"Bearer {token}"}
-    all_data = []
-    params = {'per_page': 2}
-
-    # Vérifier si le fichier d'état existe et charger l'état
-    try:
-        with open(state_file, "r") as file:
-            state = json.load(file)
-            base_url = state["next_url"]  # URL de la prochaine page à traiter
-            all_data = state["data"]  # Données déjà récupérées
-    except FileNotFoundError:
-        print("Aucun fichier d'état trouvé, démarrage d'une nouvelle récupération.")
-
-    def get_next_page_link(headers):
-        link_header = headers.get('Link', '')
-        links = [link.split(';') for link in link_header.split(',')]
-        next_link = [link for link in links if len(link) > 1 and 'rel="next"' in link[1]]
-        if next_link:
-            return next_link[0][0].strip('<> ')
-        return None
-
-    def handle_rate_limiting(headers):
-        remaining = int(headers.get('X-RateLimit-Remaining', 0))
-        reset_time = int(headers.get('X-RateLimit-Reset', 0))
-        if remaining == 0:
-            sleep_time = reset_time - int(time.time()) + 1
-            if sleep_time > 0:
-                print(f"Rate limit reached. Sleeping for {sleep_time} seconds.")
-                time.sleep(sleep_time)
-
-    while True:
-        try:
-            response = requests.get(base_url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-            all_data.extend(data)
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urljoin
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common import Metrics, Profiling
+from Common.ProjectIO import save_projects_file
+
+""" Découverte des origines Software Heritage correspondant à une liste de termes de recherche.
+
+    Les termes (par défaut "cnrs" ; sigles de laboratoires, noms d'établissements...) sont recherchés en parallèle,
+    avec la plus grande taille de page acceptée par l'API. Les origines sont dédoublonnées par URL au fur et à mesure
+    et ajoutées à un fichier de reprise (une origine JSON par ligne) ; le fichier d'état ne contient que la prochaine
+    page de chaque terme. Une récupération interrompue reprend là où chaque terme s'était arrêté. """
+
+SEARCH_URL = "https://archive.softwareheritage.org/api/1/origin/search/{term}/"
+DEFAULT_TERMS = ["cnrs"]
+# Taille de page maximale acceptée par /origin/search/
+PAGE_SIZE = 1000
+
+def get_next_page_link(headers):
+    link_header = headers.get('Link', '')
+    links = [link.split(';') for link in link_header.split(',')]
+    next_link = [link for link in links if len(link) > 1 and 'rel="next"' in link[1]]
+    if next_link:
+        return next_link[0][0].strip('<> ')
+    return None
+
+def handle_rate_limiting(headers):
+    remaining = int(headers.get('X-RateLimit-Remaining', 1))
+    reset_time = int(headers.get('X-RateLimit-Reset', 0))
+    if remaining == 0:
+        sleep_time = reset_time - int(time.time()) + 1
+        if sleep_time > 0:
+            print(f"Rate limit reached. Sleeping for {sleep_time} seconds.")
+            Metrics.rate_limit_sleep(sleep_time, 'sh')
+
+class OriginDiscovery:
+    def __init__(self, token, terms=None, state_file="fetch_state.json", origins_file="fetch_origins.jsonl",
+                 page_size=PAGE_SIZE, max_workers=4):
+        """
+        Initialise la découverte, en reprenant l'état d'une récupération interrompue s'il existe.
+        Args:
+            token (str): Jeton d'authentification Software Heritage.
+            terms (list): Termes de recherche (par défaut DEFAULT_TERMS).
+            state_file (str): Fichier d'état (prochaine page de chaque terme).
+            origins_file (str): Fichier des origines déjà trouvées, une par ligne.
+            page_size (int): Nombre d'origines par page.
+            max_workers (int): Nombre de termes recherchés simultanément.
+        """
+        self.terms = list(dict.fromkeys(terms or DEFAULT_TERMS))
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.state_file = state_file
+        self.origins_file = origins_file
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.state = {"terms": {}}
+        self.seen = set()
+
+        if os.path.exists(state_file):
+            with open(state_file, "r") as file:
+                state = json.load(file)
+            # Un fichier d'état de l'ancien format (une seule recherche) n'est pas repris
+            if "terms" in state:
+                self.state = state
+        if self.state["terms"]:
+            for origin in self.iter_origins():
+                self.seen.add(origin.get('url'))
+            print(f"Reprise de la récupération : {len(self.seen)} origines déjà trouvées.")
+        else:
+            print("Aucun fichier d'état trouvé, démarrage d'une nouvelle récupération.")
+            if os.path.exists(origins_file):
+                os.remove(origins_file)
+
+    def save_state(self):
+        with open(self.state_file, "w") as file:
+            json.dump(self.state, file)
+
+    def add_origins(self, origins):
+        """
+        Ajoute au fichier des origines celles qui n'ont pas encore été trouvées.
+        Args:
+            origins (list): Origines d'une page de résultats.
+        Returns:
+            int: Nombre de nouvelles origines.
+        """
+        with self.lock:
+            new_origins = [origin for origin in origins if origin.get('url') not in self.seen]
+            self.seen.update(origin.get('url') for origin in new_origins)
+            with open(self.origins_file, "a", encoding="utf-8") as file:
+                for origin in new_origins:
+                    file.write(json.dumps(origin, ensure_ascii=False) + "\n")
+        Metrics.count('sh_duplicate_origins_total', len(origins) - len(new_origins))
+        return len(new_origins)
+
+    def search_term(self, term):
+        """
+        Parcourt toutes les pages de résultats d'un terme, à partir de la dernière page traitée.
+        Args:
+            term (str): Terme de recherche.
+        """
+        with self.lock:
+            term_state = self.state["terms"].setdefault(term, {"next_url": None, "done": False, "origins": 0})
+        if term_state["done"]:
+            return
+        url = term_state["next_url"] or SEARCH_URL.format(term=quote(term, safe=''))
+        params = None if term_state["next_url"] else {'limit': self.page_size}
+
+        while True:
+            try:
+                response = Metrics.http_get(url, 'sh:origin_search', headers=self.headers, params=params)
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                print(f"Erreur HTTP pour le terme {term}: {e}")
+                if e.response.status_code == 429:
+                    wait = float(e.response.headers.get('Retry-After', 60))
+                    print(f"Limite de taux atteinte, attente de {wait:.0f} secondes avant de réessayer...")
+                    Metrics.rate_limit_sleep(wait, 'sh')
+                    continue
+                # Le terme reste inachevé : il sera repris à la prochaine exécution
+                return
+
+            new_origins = self.add_origins(response.json())
             handle_rate_limiting(response.headers)
             next_page_url = get_next_page_link(response.headers)
+            with self.lock:
+                term_state["origins"] += new_origins
+                term_state["next_url"] = urljoin(url, next_page_url) if next_page_url else None
+                term_state["done"] = not next_page_url
+                # Sauvegarder l'état après chaque page traitée
+                self.save_state()
             if not next_page_url:
-                break
-            base_url = urljoin(base_url, next_page_url)
-            params = {}
+                print(f"Terme {term} : {term_state['origins']} nouvelles origines.")
+                return
+            url, params = term_state["next_url"], None
+
+    def run(self):
+        """
+        Recherche tous les termes en parallèle.
+        Returns:
+            bool: True si tous les termes ont été entièrement parcourus.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self.search_term, self.terms))
+        return all(self.state["terms"].get(term, {}).get("done") for term in self.terms)
 
-            # Sauvegarder l'état après chaque page traitée
-            with open(state_file, "w") as file:
-                json.dump({"next_url": base_url, "data": all_data}, file)
+    def iter_origins(self):
+        """
+        Yields:
+            dict: Chaque origine trouvée, dans l'ordre de découverte.
+        """
+        if not os.path.exists(self.origins_file):
+            return
+        with open(self.origins_file, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
 
-        except requests.exceptions.HTTPError as e:
-            print(f"Erreur HTTP: {e}")
-            if e.response.status_code == 429:
-                print("Limite de taux atteinte, attente de 60 secondes avant de réessayer...")
-                time.sleep(60)
-                continue
-            else:
-                break
+    def cleanup(self):
+        for path in (self.state_file, self.origins_file):
+            if os.path.exists(path):
+                os.remove(path)
 
-    return all_data
+def load_terms(terms=None, terms_file=None):
+    """
+    Construit la liste des termes de recherche.
+    Args:
+        terms (str | list): Termes (liste ou chaîne séparée par des virgules) ; par défaut DEFAULT_TERMS.
+        terms_file (str): Fichier texte optionnel, un terme par ligne, ajouté aux termes.
+    Returns:
+        list: Termes de recherche.
+    """
+    if isinstance(terms, str):
+        terms = [term.strip() for term in terms.split(',')]
+    terms = [term for term in (terms or DEFAULT_TERMS) if term]
+    if terms_file:
+        with open(terms_file, "r", encoding="utf-8") as file:
+            terms += [line.strip() for line in file if line.strip() and not line.startswith('#')]
+    return terms
+
+def fetch_all_data(token, terms=None, max_workers=4):
+    discovery = OriginDiscovery(token, terms, max_workers=max_workers)
+    complete = discovery.run()
+    data = list(discovery.iter_origins())
+    if complete:
+        discovery.cleanup()
+    else:
+        print("Certains termes n'ont pas été entièrement parcourus ; relancez le script pour reprendre.")
+    return data
 
 # Transforme les données en un format structuré avec les clés appropriées
 def structure_data(data):
@@ -79,14 +210,28 @@ def structure_data(data):
         structured_data["projects"].append(project_info)
     return structured_data
 
-# Utilisez votre token ici
-token = "YOUR_PERSONAL_SH_TOKEN"
-data = fetch_all_data(token)
-structured_data = structure_data(data)
+def main(token, output_file="structured_data_cnrs.json", terms=None, terms_file=None, max_workers=4):
+    """
+    Recherche les origines Software Heritage et les enregistre dans un fichier de projets.
+    Args:
+        token (str): Jeton d'authentification Software Heritage.
+        output_file (str): Fichier de sortie (.json ou .jsonl.gz).
+        terms (str | list): Termes de recherche (par défaut DEFAULT_TERMS).
+        terms_file (str): Fichier texte optionnel de termes supplémentaires, un par ligne.
+        max_workers (int): Nombre de termes recherchés simultanément.
+    """
+    with Metrics.phase('collect'):
+        data = fetch_all_data(token, load_terms(terms, terms_file), max_workers)
+    structured_data = structure_data(data)
+
+    # Enregistrer les données structurées dans un fichier JSON
+    save_projects_file(structured_data, output_file, indent=2)
 
-# Enregistrer les données structurées dans un fichier JSON
-output_file = "structured_data_cnrs.json"
-with open(output_file, "w") as file:
-    json.dump(structured_data, file, indent=2)
+    print(f"Données structurées enregistrées dans {output_file}")
+    Metrics.write_run_report('sh_origins')
 
-print(f"Données structurées enregistrées dans {output_file}")
+if __name__ == "__main__":
+    # Utilisez votre token ici
+    token = "YOUR_PERSONAL_SH_TOKEN"
+    with Profiling.profile_stage('sh_origins'):
+        main(token)
@@ -0,0 +1,86 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ('', 'DB'):
+    sys.path.insert(0, os.path.join(ROOT_DIR, directory))
+
+from DataBase import DatabaseManager
+
+""" Un chargement interrompu au milieu d'une phase (DatabaseManager.fill_database) doit reprendre sans insérer
+    de nouveau les lignes déjà validées : la base reprise est comparée à une base chargée d'une traite.
+
+    Utilisation :
+        python -m unittest discover tests """
+
+TABLES = ['Project', 'Author', 'Source', 'Project_Author', 'Project_Source']
+
+def make_projects(count):
+    # Sources et auteurs partagés entre les tranches : ceux des tranches validées ne doivent pas être réinsérés
+    return [{
+        "title": f"Projet {i}", "softCodeRepository": f"https://github.com/owner{i}/repo{i}",
+        "source": "github", "github_id": 1000 + i % 4, "hal_id": "",
+        "authors": [{"name": f"Auteur {i % 7}"}],
+    } for i in range(count)]
+
+class DatabaseResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='database_resume_')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def load(self, name, fail_phase=None, fail_chunk=None):
+        manager = DatabaseManager({'backend': 'sqlite', 'database': os.path.join(self.work_dir, name)})
+        manager.connect()
+        if fail_phase:
+            insert_rows = getattr(manager, f'insert_{fail_phase}')
+            calls = []
+            def failing(chunk):
+                calls.append(chunk)
+                if len(calls) == fail_chunk:
+                    raise RuntimeError("interruption")
+                insert_rows(chunk)
+            setattr(manager, f'insert_{fail_phase}', failing)
+        try:
+            self.assertTrue(fail_phase is None or not manager.resumable_load('test'))
+            manager.fill_database(make_projects(10), [], chunk_size=3, load_id='test')
+        finally:
+            manager.close()
+
+    def counts(self, name):
+        conn = sqlite3.connect(os.path.join(self.work_dir, name))
+        try:
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+        finally:
+            conn.close()
+
+    def resume(self, name, fail_phase, fail_chunk):
+        with self.assertRaises(RuntimeError):
+            self.load(name, fail_phase, fail_chunk)
+        manager = DatabaseManager({'backend': 'sqlite', 'database': os.path.join(self.work_dir, name)})
+        manager.connect()
+        try:
+            self.assertTrue(manager.resumable_load('test'))
+            manager.fill_database(make_projects(10), [], chunk_size=3, load_id='test')
+        finally:
+            manager.close()
+
+    def test_resume_sources_phase(self):
+        self.load('full.db')
+        self.resume('resumed.db', 'sources', 3)
+        self.assertEqual(self.counts('resumed.db'), self.counts('full.db'))
+        self.assertEqual(self.counts('full.db')['Source'], 4)
+
+    def test_resume_relation_phase(self):
+        self.load('full.db')
+        self.resume('resumed.db', 'project_authors', 2)
+        self.assertEqual(self.counts('resumed.db'), self.counts('full.db'))
+        self.assertEqual(self.counts('full.db')['Project_Author'], 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ('', 'SH', 'Benchmarks'):
+    sys.path.insert(0, os.path.join(ROOT_DIR, directory))
+
+import Corpus
+import ShAllProjInfoJSON
+from Common import Metrics
+from FixtureServer import FixtureServer
+
+""" Les deux moyens de collecte de ShAllProjInfoJSON (API REST, origine par origine, et requêtes GraphQL par lots)
+    doivent produire les mêmes projets : ils sont comparés sur les réponses synthétiques de FixtureServer.
+
+    Utilisation :
+        python -m unittest discover tests """
+
+class ShBackendsTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FixtureServer(corpus_size=40).start()
+        Metrics.set_url_overrides(self.server.url_overrides())
+        self.headers = {"Authorization": "Bearer test"}
+
+    def tearDown(self):
+        Metrics.set_url_overrides({})
+        self.server.stop()
+
+    def test_graphql_matches_rest(self):
+        origin_urls = [Corpus.repo_url(i) for i in range(25)]
+        rest = {origin_url: ShAllProjInfoJSON.get_project_info(origin_url, self.headers) for origin_url in origin_urls}
+        graphql = {}
+        for start in range(0, len(origin_urls), 10):
+            graphql.update(ShAllProjInfoJSON.get_projects_info_graphql(origin_urls[start:start + 10], self.headers))
+
+        self.assertEqual(sorted(graphql), sorted(origin_urls))
+        for origin_url in origin_urls:
+            self.assertTrue(rest[origin_url], origin_url)
+            self.assertEqual(graphql[origin_url], rest[origin_url], origin_url)
+
+    def test_unknown_origins_are_missing(self):
+        origin_urls = [Corpus.repo_url(i) for i in (1, 100)]
+        graphql = ShAllProjInfoJSON.get_projects_info_graphql(origin_urls, self.headers)
+        self.assertEqual(list(graphql), [origin_urls[0]])
+        self.assertEqual(ShAllProjInfoJSON.get_project_info(origin_urls[1], self.headers), {})
+
+if __name__ == '__main__':
+    unittest.main()